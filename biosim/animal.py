@@ -5,8 +5,7 @@ Module for animal logic. This file contains:
     - class: animal
     - class (animal) : herbivore
     - class (animal) : carnivore
-Any global function must start and/or end with '__' to not be included
-in valid names.
+Every subclass of ``animal`` in this file is a species that can be simulated.
 """
 
 __author__ = "Mats Hoem olsen, Roy Erling Granheim"
@@ -14,6 +13,11 @@ __email__ = "mats.hoem.olsen@nmbu.no, roy.erling.granheim@nmbu.no"
 
 import numpy as np
 import random as ran
+from collections import ChainMap
+
+from .fitness import phi, phi_one, fitness_keys
+from .predation import Herd
+from .species import SpeciesParameters, AnimalView
 
 
 class animal:
@@ -21,7 +25,12 @@ class animal:
     This is the superclass of all the animals.
     Can be used to create other animals however can't be used
     by it self.
+
+    The state of an animal is kept in slots: ``a`` (age), ``w`` (weight), ``phi`` (fitness), ``life``,
+    ``coord`` (the cell) and ``name``. ``var`` gives the old dictionary access to the state and parameters.
+    A subclass must set ``__slots__ = ()`` to stay compact.
     """
+    __slots__ = ("name", "a", "w", "phi", "life", "coord", "params", "traits", "lookup", "dirty", "_version")
     default_var = {
         "w_birth": 10,
         "sigma_birth": 1,
@@ -44,58 +53,110 @@ class animal:
         'E': [0, 1]
     }
 
-    def __init__(self, a: int, w: float, coord=None, random_name=False):
+    def __init__(self, a: int, w: float, coord=None, random_name=False, params=None):
         """
         :param int a: age of animal.
         :param float w: weight of animal.
         :param list[int,int] coord: The coordinate of the animal.
+        :param SpeciesParameters params: parameters shared with the rest of the species,
+            by default ``species_parameters()``.
         """
         self.name = self.random_name() if random_name else None
-        self.var["coord"] = coord
-        self.var["w"] = w
-        self.var["a"] = a
-        self.var["life"] = True
-        self.var["phi"] = self.big_phi()
+        self.params = params if params is not None else self.species_parameters()
+        self.traits = None
+        self.lookup = self.params
+        self.coord = coord
+        self.w = w
+        self.a = a
+        self.life = True
+        self.dirty = True
+        self.phi = self.big_phi()
+
+    @property
+    def var(self):
+        """
+        Dictionary like view of the state and parameters of the animal, see ``AnimalView``.
+        """
+        return AnimalView(self)
+
+    def set_trait(self, key: str, value):
+        """
+        Gives this animal its own value of a parameter, the rest of the species keeps the shared value.
+
+
+        :param str key: name of the parameter.
+        :param value: the new value.
+        """
+        if self.traits is None:
+            self.traits = dict()
+            self.lookup = ChainMap(self.traits, self.params)
+        self.traits[key] = value
+        self.dirty = True
+
+    @classmethod
+    def species_parameters(cls):
+        """
+        The parameters used by animals that are made outside of a simulation, made from ``default_var``
+        the first time it is asked for.
+
+
+        :return: SpeciesParameters
+        """
+        if "_species_parameters" not in cls.__dict__:
+            cls._species_parameters = SpeciesParameters(cls.default_var)
+        return cls._species_parameters
 
     def big_phi(self):
         """
         'big_phi' calculates the fitness of the animal based on its age and weight. This value is
         crucial to this entire operation.
 
+        The fitness is only calculated again if the animal is ``dirty``, that is if its age, weight or
+        fitness parameters changed since ``phi`` was last set. If you change ``w`` or ``a`` by hand,
+        set ``dirty`` to True.
+
 
         :return: Fitness of animal.
         """
+        if self.dirty or self._version != self.params.version:
+            self.dirty = False
+            self._version = self.params.version
+            self.phi = phi_one(self.a, self.w, self.lookup)
+        return self.phi
 
-        def q(s: str):
-            """
-            Generates a function based on 'S'.
-
-
-            :param s: 'P' for a smaller value, other for bigger.
-            :return: function
-            """
-            k = 1 if s == "P" else -1
+    @staticmethod
+    def parameters(animals: list, keys):
+        """
+        The value of some parameters for every animal in ``animals``.
 
-            def new_q(x: float, xh: float, phi: float):
-                """
-                calculates the function
 
+        :param list animals: the animals.
+        :param keys: names of the parameters.
+        :return: dictionary with the value of each parameter if every animal uses the same parameters without
+            traits, else with an array of one value per animal.
+        """
+        params = animals[0].params
+        if all(a.lookup is params for a in animals):
+            return {key: params[key] for key in keys}
+        return {key: np.array([a.lookup[key] for a in animals], dtype=float) for key in keys}
 
-                :param x: number
-                :param xh: number
-                :param phi: number
-                :return: float
-                """
-                return 1 / (1 + np.e ** (k * phi * (x - xh)))
+    @staticmethod
+    def refit(animals: list):
+        """
+        Calculates the fitness of many animals at once with ``fitness.phi``, the same as ``big_phi``
+        would for each of them.
 
-            return new_q
 
-        if self.var["w"] <= 0:
-            return 0
-        else:
-            q_p = q("P")(self.var["a"], self.var["a_half"], self.var["phi_age"])
-            q_n = q("N")(self.var["w"], self.var["w_half"], self.var["phi_weight"])
-            return q_p * q_n
+        :param list animals: the animals to re-evaluate.
+        """
+        if not animals:
+            return
+        lookup = animal.parameters(animals, fitness_keys)
+        values = phi(np.array([a.a for a in animals]), np.array([a.w for a in animals], dtype=float), lookup)
+        for a, value in zip(animals, values.tolist()):
+            a.phi = value
+            a.dirty = False
+            a._version = a.params.version
 
     @staticmethod
     def n(w: float, p: float):
@@ -110,7 +171,8 @@ class animal:
         return ran.gauss(w, p)
 
     def age(self):
-        self.var["a"] += 1
+        self.a += 1
+        self.dirty = True
 
     def death(self):
         """
@@ -118,8 +180,8 @@ class animal:
                 - Its weight is equal to 0 or less.
                 - By random chance based on its fitness.
         """
-        if self.var["w"] <= 0 or (ran.random() < (self.var["omega"] * (1 - self.var["phi"]))):
-            self.var["life"] = False
+        if self.w <= 0 or (ran.random() < (self.lookup["omega"] * (1 - self.phi))):
+            self.life = False
 
     def birth(self, n: int):
         """
@@ -133,18 +195,20 @@ class animal:
         :param n: population number in cell.
         :return: either None or a new instance of itself.
         """
-        self.var["phi"] = self.big_phi()
-        test_w = self.var["w"] >= (self.var["zeta"] * (self.var["w_birth"] + self.var["sigma_birth"]))
-        test_chance = ran.random() < min(1, self.var["phi"] * self.var["gamma"] * (n - 1))
+        p = self.lookup
+        self.phi = self.big_phi()
+        test_w = self.w >= (p["zeta"] * (p["w_birth"] + p["sigma_birth"]))
+        test_chance = ran.random() < min(1, self.phi * p["gamma"] * (n - 1))
         if not (test_w and test_chance):
             return None
-        k = type(self)(a=0, w=self.n(self.var['w_birth'], self.var['sigma_birth']))
+        k = type(self)(a=0, w=self.n(p['w_birth'], p['sigma_birth']), params=self.params)
 
-        if self.var["w"] <= self.var["xi"] * k.var["w"]:
+        if self.w <= p["xi"] * k.w:
             return None
         else:
-            self.var["w"] -= self.var["xi"] * k.var["w"]
-            self.var["phi"] = self.big_phi()
+            self.w -= p["xi"] * k.w
+            self.dirty = True
+            self.phi = self.big_phi()
             return k
 
     def move(self, ild: list):
@@ -161,19 +225,19 @@ class animal:
         # knows, by that we need not worry about what it must
         # rather we let it do what it was born to do #
 
-        do_move = ran.random() < (self.var["mu"] * self.var["phi"])
+        do_move = ran.random() < (self.lookup["mu"] * self.phi)
         direct = ran.choice([k for k in animal.ret_moves.keys()])
         direct_list = animal.ret_moves[direct]
-        if ((self.var["coord"][0] + direct_list[0], self.var["coord"][1] + direct_list[1]) not in ild) and do_move:
-            self.var["coord"][0] += direct_list[0]
-            self.var["coord"][1] += direct_list[1]
+        if ((self.coord[0] + direct_list[0], self.coord[1] + direct_list[1]) not in ild) and do_move:
+            self.coord = [self.coord[0] + direct_list[0], self.coord[1] + direct_list[1]]
 
     def loss_weight(self):
         """
         calculates the new weight of the animal and
         reevaluates its fitness.
         """
-        self.var["w"] -= self.var["eta"] * self.var["w"]
+        self.w -= self.lookup["eta"] * self.w
+        self.dirty = True
 
     @staticmethod
     def random_name():
@@ -198,6 +262,7 @@ class Herbivore(animal):
     """
     This is the herbivore class that eats non-meat like vegans.
     """
+    __slots__ = ()
     default_var = {
         "w_birth": 8,
         "sigma_birth": 1.5,
@@ -214,9 +279,8 @@ class Herbivore(animal):
         "omega": 0.4,
         "F": 10}
 
-    def __init__(self, a: int, w: float, coord=None):
-        self.var = dict(self.default_var)
-        animal.__init__(self,a, w, coord=coord)
+    def __init__(self, a: int, w: float, coord=None, params=None):
+        animal.__init__(self, a, w, coord=coord, params=params)
 
     def eat(self, f_there):
         """
@@ -227,15 +291,18 @@ class Herbivore(animal):
         :return: returns eaten amount if `return_food` is true.
         """
         # We gain what is possible, which is what the animal want or get.#
-        self.var["w"] += self.var["beta"] * min(f_there.food, self.var["F"])
-        self.var["phi"] = self.big_phi()
-        f_there.food -= float(min(f_there.food, self.var["F"]))
+        eaten = min(f_there.food, self.lookup["F"])
+        self.w += self.lookup["beta"] * eaten
+        self.dirty = True
+        self.phi = self.big_phi()
+        f_there.food -= float(eaten)
 
 
 class Carnivore(animal):
     """
     This is the carnivore class that eat meat like non-vegans.
     """
+    __slots__ = ()
     default_var = {
         "w_birth": 6,
         "sigma_birth": 1,
@@ -253,29 +320,26 @@ class Carnivore(animal):
         "F": 50,
         "DeltaPhiMax": 10}
 
-    def __init__(self, a: int, w: float, coord=None):
-        self.var = dict(self.default_var)
-        animal.__init__(self,a, w, coord=coord)
+    def __init__(self, a: int, w: float, coord=None, params=None):
+        animal.__init__(self, a, w, coord=coord, params=params)
 
-    def _yield_life(self, fresh_meat: list):
+    def hunt(self, herd: Herd, draw=ran.random):
         """
-        Generator for life that is about to be murdered.
+        ``Carnivore`` hunts the prey in ``herd``. For the predator to have an chance to eat the prey
+        it must have better fitness than the prey. The killed prey is left in ``herd`` for the next predator.
 
 
-        :param fresh_meat: The heard to eat.
-        :yield: A soon to be dead animal.
+        :param Herd herd: the prey of the cell.
+        :param draw: function that returns a random number in ``[0, 1)``.
         """
-        for meat in fresh_meat:
-            # we know that the limits of the function is 0 and 1, and by analyzing the curve of the function
-            # with the limits we can see that on negative values we get 0, note 0 > than a negative number
-            # (excluding -0 for computers sake) and 1 when the function is greater than the max value
-            # (e.i. greater than 1) for that reason we can with comfort use max(1,min(0,f(x))) to determine
-            # the probability.
-            probability = max(0, min(1, (self.var["phi"] - meat.var["phi"]) / self.var["DeltaPhiMax"]))
-            # we agree that for a predator to eat a pray it must be alive and the predator must choose to accept
-            # the pray.#
-            if meat.var["life"] and (ran.random() < probability):
-                yield meat
+        def refit(gain):
+            self.w += gain
+            self.dirty = True
+            self.phi = self.big_phi()
+            return self.phi
+
+        # The appetite is kept apart from ``F`` so the animal does not get its own ``F``. #
+        herd.feed(self.phi, float(self.lookup["F"]), self.lookup["beta"], self.lookup["DeltaPhiMax"], refit, draw)
 
     def eat(self, cell):
         """
@@ -285,27 +349,18 @@ class Carnivore(animal):
 
         :param Cells cell: The entire cell
         """
-        # Every predator must try itself on all the pray available given it want to.
-        # We will therefore iterate over all the animals until it is feed up or have tried on all of them.#
-        herb_herd = list(cell.default["Herbivore"])
-        herb_herd.sort(key=lambda o: o.var["phi"])
-        default_f = float(self.var["F"])
-        for pray in self._yield_life(herb_herd):
-            f_got = min(self.var["F"], pray.var["w"])
-            self.var["w"] += self.var["beta"] * f_got
-            pray.var["life"] = False
-            self.var["F"] -= f_got
-            self.var["phi"] = self.big_phi()
-            if self.var["F"]:
-                self.var["F"] = default_f
-                break
+        herb_herd = cell.default["Herbivore"]
+        herd = Herd([h.phi for h in herb_herd], [h.w for h in herb_herd])
+        self.hunt(herd)
+        for n in herd.dead():
+            herb_herd[n].life = False
         # Since we don't care for dead animals we will discard all dead animals to the void
         # before returning them to the next predator.#
-        self.var["F"] = default_f
-        cell.default["Herbivore"] = [f for f in herb_herd if f.var["life"]]
+        cell.default["Herbivore"] = herd.survivors(herb_herd)
 
 
 class Snake(Carnivore):
+    __slots__ = ()
     default_var = {
         "w_birth": 4,
         "sigma_birth": 1,
@@ -322,9 +377,8 @@ class Snake(Carnivore):
         "omega": 0.8,
         "F": 30,
         "DeltaPhiMax": 5}
-    def __init__(self, a: int, w: float, coord = None):
-        self.var = dict(self.default_var)
-        animal.__init__(self,a, w, coord=coord)
+    def __init__(self, a: int, w: float, coord=None, params=None):
+        animal.__init__(self, a, w, coord=coord, params=params)
     
     def eat(self,cell):
         if "Herbivore" in cell.default:
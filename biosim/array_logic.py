@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+"""
+functioning logic of the island simulation on a column based ``Population``.
+
+The seasons do the same as the seasons in ``logic.py``, but works on every animal on the island at once
+instead of one ``animal`` object at a time.
+"""
+
+__author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
+__email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
+
+import sys
+import numpy as np
+
+from .animal import Herbivore, Carnivore
+from .fitness import phi, phi_one, fitness_keys
+from .grazing import intake
+from .island import Grid
+from .migration import directions
+from .population import Population
+from .predation import Herd, random_block
+from .streams import Streams, GRAZING, BREEDING, MIGRATION, AGEING
+
+
+def fitness(age, weight, species, params: dict):
+    """
+    Calculates the fitness of animals, the same way as ``animal.big_phi``. Each species is handed to
+    ``fitness.phi`` at once so the age lookup table of the species is used.
+
+
+    :param age: ages of the animals.
+    :param weight: weights of the animals.
+    :param species: species id of the animals.
+    :param dict params: parameter table from ``parameter_table``.
+    :return: fitness of the animals.
+    """
+    if np.ndim(species) == 0:
+        return phi(age, weight, {key: params[key][species] for key in fitness_keys})
+    age, weight, species = np.broadcast_arrays(age, weight, species)
+    result = np.empty(len(species))
+    for s in np.unique(species):
+        mask = species == s
+        result[mask] = phi(age[mask], weight[mask], {key: params[key][s] for key in fitness_keys})
+    return result
+
+
+def species_roles(names: list):
+    """
+    Finds which species graze and which species hunt.
+
+
+    :param list[str] names: names of the species, the position of a name is its species id.
+    :return: two boolean arrays indexed by species id, grazers and predators.
+    """
+    classes = [getattr(sys.modules["biosim.animal"], species) for species in names]
+    predators = np.array([issubclass(c, Carnivore) for c in classes], dtype=bool)
+    grazers = np.array([issubclass(c, Herbivore) for c in classes], dtype=bool) & ~predators
+    return grazers, predators
+
+
+def compile_island(island: Grid, shape: tuple):
+    """
+    Converts the ``Grid`` of an island into flat arrays indexed by cell index.
+
+
+    :param Grid island: the island.
+    :param tuple[int,int] shape: number of rows and columns of the map.
+    :return: dictionary with ``f_max``, ``food`` and ``legal`` arrays, the ``neighbour_table`` of the map
+        as ``neighbours`` and the map ``shape``.
+    """
+    f_max = island.f_max.ravel().copy()
+    return {"f_max": f_max, "food": f_max.copy(), "legal": island.legal.ravel().copy(),
+            "neighbours": island.neighbours, "shape": tuple(shape)}
+
+
+def _group(population: Population, rows, keys):
+    """
+    Sorts ``rows`` by cell and then ``keys`` and tells where each cell starts and stops.
+
+
+    :return: sorted rows, the cells in the order they appear, start and stop of each cell in the sorted rows.
+    """
+    rows = rows[np.lexsort(tuple(keys) + (population.cell[rows],))]
+    cells, start = np.unique(population.cell[rows], return_index=True)
+    stop = np.append(start[1:], len(rows))
+    return rows, cells, start, stop
+
+
+def season_feeding(population: Population, landscape: dict, params: dict, rng):
+    """
+    ``season_feeding`` lets the grazers eat off the cells in random order, and then lets the predators hunt
+    the grazers in their cell.
+
+    :param Population population: the animals of the island.
+    :param dict landscape: arrays from ``compile_island``.
+    :param dict params: parameter table from ``parameter_table``.
+    :param numpy.random.Generator rng: random number generator.
+    """
+    grazers, predators = species_roles(population.names)
+    food = landscape["food"]
+    herd = np.flatnonzero(grazers[population.species])
+    if len(herd):
+        # Sorting on a random key within each cell is the same as shuffling every cell. #
+        herd, cells, start, _ = _group(population, herd, [rng.random(len(herd))])
+        species = population.species[herd]
+        eaten, eats = intake(food[cells], params["F"][species], start)
+        population.weight[herd] += params["beta"][species] * eaten
+        population.fitness[herd[eats]] = fitness(population.age[herd[eats]], population.weight[herd[eats]],
+                                                 species[eats], params)
+        food[cells] -= np.add.reduceat(eaten, start)
+        np.maximum(food, 0, out=food)
+
+    prey = np.flatnonzero(grazers[population.species])
+    hunters = np.flatnonzero(predators[population.species])
+    if len(prey) and len(hunters):
+        season_predation(population, prey, hunters, params, rng)
+
+
+def season_predation(population: Population, prey, hunters, params: dict, rng):
+    """
+    The predators hunt the prey in their cell, the fittest predator of each species first. Every cell with
+    both prey and predators gets one ``Herd``, and the dead prey is removed once at the end.
+
+
+    :param Population population: the animals of the island.
+    :param prey: rows of the prey.
+    :param hunters: rows of the predators.
+    :param dict params: parameter table from ``parameter_table``.
+    :param numpy.random.Generator rng: random number generator.
+    """
+    prey, prey_cells, prey_start, prey_stop = _group(population, prey, [])
+    hunters, hunt_cells, hunt_start, hunt_stop = _group(
+        population, hunters, [-population.fitness[hunters], population.species[hunters]])
+    draw = random_block(rng).__next__
+    species_params = [{key: params[key][s] for key in fitness_keys} for s in range(len(population.names))]
+    weight, fitness_column = population.weight, population.fitness
+    for n in np.flatnonzero(np.isin(hunt_cells, prey_cells)):
+        m = np.searchsorted(prey_cells, hunt_cells[n])
+        herd_rows = prey[prey_start[m]:prey_stop[m]]
+        herd = Herd(fitness_column[herd_rows].tolist(), weight[herd_rows].tolist())
+        for predator in hunters[hunt_start[n]:hunt_stop[n]].tolist():
+            if not herd.n_alive:
+                break
+            species = population.species[predator]
+            age = int(population.age[predator])
+
+            def refit(gain):
+                weight[predator] += gain
+                fitness_column[predator] = phi_one(age, weight[predator], species_params[species])
+                return fitness_column[predator]
+
+            herd.feed(fitness_column[predator], params["F"][species], params["beta"][species],
+                      params["DeltaPhiMax"][species], refit, draw)
+        population.alive[herd_rows[herd.dead()]] = False
+    population.compact()
+
+
+def season_breeding(population: Population, landscape: dict, params: dict, rng):
+    """
+    ``season_breeding`` lets every animal try to give birth, newborns are added to the end of the population.
+
+    :param Population population: the animals of the island.
+    :param dict landscape: arrays from ``compile_island``.
+    :param dict params: parameter table from ``parameter_table``.
+    :param numpy.random.Generator rng: random number generator.
+    """
+    if not len(population):
+        return
+    n_cells = len(landscape["f_max"])
+    species = population.species
+    # Number of animals of the same species in the same cell, before any births. #
+    n = population.count(n_cells)[species, population.cell]
+    population.fitness = fitness(population.age, population.weight, species, params)
+    test_w = population.weight >= params["zeta"][species] * (params["w_birth"][species] +
+                                                             params["sigma_birth"][species])
+    test_chance = rng.random(len(population)) < np.minimum(1, population.fitness * params["gamma"][species] * (n - 1))
+    mothers = np.flatnonzero(test_w & test_chance)
+    w_child = rng.normal(params["w_birth"][species[mothers]], params["sigma_birth"][species[mothers]])
+    gives_birth = population.weight[mothers] > params["xi"][species[mothers]] * w_child
+    mothers, w_child = mothers[gives_birth], w_child[gives_birth]
+    if not len(mothers):
+        return
+    population.weight[mothers] -= params["xi"][species[mothers]] * w_child
+    population.fitness[mothers] = fitness(population.age[mothers], population.weight[mothers],
+                                          species[mothers], params)
+    population.append(species[mothers], population.cell[mothers], 0, w_child,
+                      fitness(0, w_child, species[mothers], params))
+
+
+def season_migration(population: Population, landscape: dict, params: dict, rng):
+    """
+    Every animal gets one chance to move one cell north, south, west or east. Moves into water are ignored.
+
+    :param Population population: the animals of the island.
+    :param dict landscape: arrays from ``compile_island``.
+    :param dict params: parameter table from ``parameter_table``.
+    :param numpy.random.Generator rng: random number generator.
+    """
+    if not len(population):
+        return
+    do_move = rng.random(len(population)) < params["mu"][population.species] * population.fitness
+    target = landscape["neighbours"][population.cell, rng.integers(0, len(directions), size=len(population))]
+    population.cell[do_move] = target[do_move]
+
+
+def season_ageing(population: Population, landscape: dict, params: dict, rng):
+    """
+    ``season_ageing`` makes every animal one year older, lose weight and maybe die.
+
+    :param Population population: the animals of the island.
+    :param dict landscape: arrays from ``compile_island``.
+    :param dict params: parameter table from ``parameter_table``.
+    :param numpy.random.Generator rng: random number generator.
+    """
+    if not len(population):
+        return
+    species = population.species
+    population.age += 1
+    population.weight -= params["eta"][species] * population.weight
+    # Like ``animal.death`` the fitness is not re-evaluated after losing weight. #
+    death = (population.weight <= 0) | (rng.random(len(population)) <
+                                        params["omega"][species] * (1 - population.fitness))
+    population.alive &= ~death
+    population.compact()
+
+
+def season_end(landscape: dict):
+    """
+    Does 'end of season' procedure, the food of every cell grows back.
+
+
+    :param dict landscape: arrays from ``compile_island``.
+    """
+    landscape["food"][:] = landscape["f_max"]
+
+
+def year_cycle(population: Population, landscape: dict, params: dict, rng, year: int = 0):
+    """
+    Simulates an entire year on the island. With ``streams.Streams`` every season draws from its own stream.
+
+
+    :param Population population: the animals of the island.
+    :param dict landscape: arrays from ``compile_island``.
+    :param dict params: parameter table from ``parameter_table``.
+    :param rng: ``streams.Streams`` of the simulation, or a ``numpy.random.Generator`` for every season.
+    :param int year: the year, key of the streams.
+    """
+    def season(key):
+        return rng.generator(year, key) if isinstance(rng, Streams) else rng
+    season_feeding(population, landscape, params, season(GRAZING))
+    season_breeding(population, landscape, params, season(BREEDING))
+    season_migration(population, landscape, params, season(MIGRATION))
+    season_ageing(population, landscape, params, season(AGEING))
+    season_end(landscape)
@@ -0,0 +1,612 @@
+# -*- coding: utf-8 -*-
+
+"""
+The file format of a saved simulation. This file contains:
+    - function: write
+    - function: read
+    - function: is_checkpoint
+    - function: snapshot
+    - function: save
+    - function: load
+    - class: LazyIsland
+    - class: LazyBioSim
+    - function: checkpoints_in
+    - function: resume
+    - class: Checkpoints
+
+A checkpoint is:
+    - ``magic``, 8 bytes, then the format ``version`` and the length of the header, as little endian uint32.
+    - The header, JSON: the map, the species parameters, the seed and state of the random numbers, the
+      settings of ``BioSim``, and the ``dtype``, ``shape`` and ``offset`` of every array.
+    - The arrays, raw, each starting at a multiple of ``align`` bytes after the header.
+
+The animals are one row per animal in the arrays ``species``, ``cell``, ``age``, ``weight`` and ``fitness``,
+sorted by species and then cell. The visualization is not saved.
+"""
+
+__author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
+__email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
+
+import glob
+import json
+import os
+import struct
+import sys
+import time
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .species import SpeciesParameters
+
+magic = b"\x89BIOSIM\n"
+version = 1
+align = 64
+
+
+def _padding(position: int):
+    return -position % align
+
+
+def write(file: str, header: dict, arrays: dict):
+    """
+    Writes a checkpoint.
+
+
+    :param str file: path of the file.
+    :param dict header: anything JSON can keep.
+    :param dict arrays: numpy arrays by name.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    table, offset = dict(), 0
+    for name, array in arrays.items():
+        table[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes + _padding(array.nbytes)
+    text = json.dumps(dict(header, arrays=table), default=lambda value: value.tolist()).encode()
+    with open(file, "wb") as out:
+        out.write(magic + struct.pack("<II", version, len(text)) + text)
+        out.write(bytes(_padding(len(magic) + 8 + len(text))))
+        for array in arrays.values():
+            out.write(memoryview(array).cast("B"))
+            out.write(bytes(_padding(array.nbytes)))
+
+
+def is_checkpoint(file: str):
+    """
+    :param str file: path of the file.
+    :return: True if the file starts like a checkpoint.
+    """
+    with open(file, "rb") as source:
+        return source.read(len(magic)) == magic
+
+
+def read(file: str, mmap: bool = False):
+    """
+    Reads a checkpoint.
+
+
+    :param str file: path of the file.
+    :param bool mmap: map the arrays to the file instead of reading them, see ``numpy.memmap``.
+    :return: the header and the arrays by name.
+    """
+    with open(file, "rb") as source:
+        if source.read(len(magic)) != magic:
+            raise ValueError("{} is not a BioSim checkpoint.".format(file))
+        file_version, length = struct.unpack("<II", source.read(8))
+        if file_version > version:
+            raise ValueError("{} is version {} of the checkpoint format, this BioSim reads up to version {}."
+                             .format(file, file_version, version))
+        header = json.loads(source.read(length).decode())
+        start = len(magic) + 8 + length + _padding(len(magic) + 8 + length)
+        arrays = dict()
+        for name, entry in header.pop("arrays").items():
+            dtype, shape = np.dtype(entry["dtype"]), tuple(entry["shape"])
+            if mmap and np.prod(shape):
+                arrays[name] = np.memmap(file, dtype=dtype, mode="r", offset=start + entry["offset"], shape=shape)
+            else:
+                source.seek(start + entry["offset"])
+                arrays[name] = np.frombuffer(source.read(int(np.prod(shape)) * dtype.itemsize),
+                                             dtype=dtype).reshape(shape).copy()
+    return header, arrays
+
+
+def _animals(sim, cells: set = None):
+    """
+    The rows of the animals of the ``"object"`` engine, in the order of the cells, their species and lists,
+    with the order of the species in every cell. Only the cells in ``cells``, if it is given.
+    """
+    species_id = {species: i for i, species in enumerate(sim.names)}
+    rows = {key: [] for key in ("species", "cell", "age", "weight", "fitness", "dirty", "current")}
+    views, keys, names, traits = [], [], dict(), dict()
+    for index, cell in sim.island.views():
+        if cells is not None and index not in cells:
+            continue
+        views.append(index)
+        keys.append([species_id[species] for species in cell.default] +
+                    [-1] * (len(sim.names) - len(cell.default)))
+        for species, herd in cell.default.items():
+            for A in herd:
+                if A.name is not None:
+                    names[len(rows["age"])] = A.name
+                if A.traits:
+                    traits[len(rows["age"])] = A.traits
+                rows["age"].append(A.a)
+                rows["weight"].append(A.w)
+                rows["fitness"].append(A.phi)
+                rows["dirty"].append(A.dirty)
+                rows["current"].append(getattr(A, "_version", None) == A.params.version)
+            rows["species"].extend([species_id[species]] * len(herd))
+            rows["cell"].extend([index] * len(herd))
+    rows = {key: np.array(values, dtype=dtype) for (key, values), dtype in
+            zip(rows.items(), (np.int8, np.int64, np.int64, np.float64, np.float64, np.bool_, np.bool_))}
+    rows["views"] = np.array(views, dtype=np.int64)
+    rows["keys"] = np.array(keys, dtype=np.int8).reshape(len(views), len(sim.names))
+    return rows, names, traits
+
+
+def snapshot(sim, cells=None):
+    """
+    The header and arrays of a checkpoint of a ``BioSim``. The arrays are copies, so they may be written while
+    the simulation goes on.
+
+    With ``cells``, only the animals of those cells are taken, see ``Checkpoints``. The checkpoint is then a
+    delta, the ``base`` of the header must be set to the name of the checkpoint it is a delta of.
+
+
+    :param BioSim sim: the simulation.
+    :param cells: the cell indices to take, only for the ``"object"`` engine.
+    :return: the header and the arrays, see ``write``.
+    """
+    header = {
+        "engine": sim.engine, "map": sim.str_map, "names": sim.names, "year": sim.year,
+        "island_year": sim.island.year,
+        "seed": {"entropy": np.asarray(sim.streams.seed.entropy).tolist(),
+                 "spawn_key": list(sim.streams.seed.spawn_key)},
+        "rng": sim.rng.bit_generator.state,
+        "parameters": {species: dict(params) for species, params in sim.default_values_species.items()},
+        "settings": {key: getattr(sim, key) for key in ("ymax_animals", "cmax_animals", "hist_specs", "_img_base",
+                                                        "_img_fmt", "tmean", "threads")},
+        "mean": dict(sim.mean) if hasattr(sim, "mean") else None}
+    arrays = {"f_max": sim.island.f_max.copy()}
+    if sim.engine == "array":
+        if cells is not None:
+            raise ValueError("Only the 'object' engine has delta checkpoints.")
+        population = sim.population
+        arrays["food"] = sim.landscape["food"].reshape(sim.island.shape).copy()
+        rows = {column: getattr(population, column) for column in ("species", "cell", "age", "weight", "fitness")}
+        rows["rank"] = np.arange(len(population))
+        names, traits = dict(), dict()
+    else:
+        arrays["food"] = sim.island.food.copy()
+        if cells is not None:
+            cells = set(cells)
+            arrays["cells"] = np.array(sorted(cells), dtype=np.int64)
+            # The other cells had no animals since the base, their food has grown back to ``f_max``. #
+            arrays["food"] = arrays["food"].ravel()[arrays["cells"]]
+        rows, names, traits = _animals(sim, cells)
+    order = np.lexsort((rows["cell"], rows["species"]))
+    place = np.empty_like(order)
+    place[order] = np.arange(len(order))
+    header["animal_names"] = {str(place[row]): name for row, name in names.items()}
+    header["traits"] = {str(place[row]): value for row, value in traits.items()}
+    for key in ("species", "cell", "age", "weight", "fitness", "dirty", "current", "rank"):
+        if key in rows:
+            arrays[key] = rows[key][order]
+    for key in ("views", "keys"):
+        if key in rows:
+            arrays[key] = rows[key]
+    return header, arrays
+
+
+def save(sim, file: str):
+    """
+    Saves a ``BioSim`` as a checkpoint.
+
+
+    :param BioSim sim: the simulation.
+    :param str file: path of the file.
+    """
+    write(file, *snapshot(sim))
+
+
+def _restore_animals(sim, header: dict, arrays: dict):
+    """
+    Makes the animals of the ``"object"`` engine again, with the species of every cell in the same order.
+    The counts and the statistics of ``Cells.record`` are set from the rows, not from the animals.
+    The animals of the ``cells`` of a delta replace those of the base.
+    """
+    island, names = sim.island, header["names"]
+    if "cells" in arrays:
+        counts = island.counts.reshape(len(names), -1)
+        for index in arrays["cells"].tolist():
+            cell = island.cell(index)
+            cell.default = dict()
+            for species in names:
+                cell.record(species, [], [], [])
+            counts[:, index] = 0
+    for index, keys in zip(arrays["views"].tolist(), arrays["keys"].tolist()):
+        island.cell(index).default = {names[i]: [] for i in keys if i >= 0}
+    species_ids, cells = arrays["species"], arrays["cell"]
+    np.add.at(island.counts.reshape(len(names), -1), (species_ids.astype(np.int64), cells), 1)
+    island.add_up()
+    bounds = (np.flatnonzero((np.diff(species_ids) != 0) | (np.diff(cells) != 0)) + 1).tolist()
+    made = []
+    for first, last in zip([0] + bounds, bounds + [len(cells)]) if len(cells) else ():
+        species = names[int(species_ids[first])]
+        cls, params = getattr(sys.modules["biosim.animal"], species), sim.default_values_species[species]
+        cell = island.cell(int(cells[first]))
+        age, weight, fitness = (arrays[key][first:last] for key in ("age", "weight", "fitness"))
+        cell.record(species, age, weight, fitness)
+        herd = cell.default.setdefault(species, [])
+        herd.extend(_herd(cls, params, list(cell.coord), arrays, first, last))
+        made.extend(herd)
+    for row, name in header["animal_names"].items():
+        made[int(row)].name = name
+    for row, traits in header["traits"].items():
+        _set_traits(made[int(row)], traits)
+
+
+def _herd(cls, params, coord: list, arrays: dict, first: int, last: int):
+    """
+    The animals of the rows ``first`` to ``last`` (not included), which are of one species and cell.
+    The animals share the list of their coordinate, an animal gets a new list when it moves.
+    """
+    herd, new = [], cls.__new__
+    # Rows of the ``"array"`` engine have a fitness that is up to date. #
+    dirty = arrays["dirty"][first:last].tolist() if "dirty" in arrays else [False] * (last - first)
+    current = arrays["current"][first:last].tolist() if "current" in arrays else [True] * (last - first)
+    # The animals are put back as they were, without ``__init__``, which would evaluate the fitness again. #
+    for a, w, phi, is_dirty, is_current in zip(arrays["age"][first:last].tolist(),
+                                               arrays["weight"][first:last].tolist(),
+                                               arrays["fitness"][first:last].tolist(), dirty, current):
+        A = new(cls)
+        A.params = A.lookup = params
+        A.name = A.traits = None
+        A.coord, A.a, A.w, A.phi, A.life, A.dirty = coord, a, w, phi, True, is_dirty
+        A._version = params.version if is_current else -1
+        herd.append(A)
+    return herd
+
+
+def _set_traits(A, traits: dict):
+    A.traits = traits
+    A.lookup = ChainMap(A.traits, A.params)
+
+
+def load(file: str, **kwargs):
+    """
+    Loads a checkpoint.
+
+
+    :param str file: path of the file.
+    :return: BioSim
+    """
+    from .simulation import BioSim
+    from .population import parameter_table
+    from . import array_logic
+
+    header, arrays = read(file, **kwargs)
+    if "base" in header:
+        sim = load(os.path.join(os.path.dirname(file), header["base"]), **kwargs)
+        _restore_state(sim, header, arrays)
+        _restore_animals(sim, header, arrays)
+        return sim
+    settings = {key.lstrip("_"): value for key, value in header["settings"].items()}
+    sim = BioSim(island_map=header["map"], ini_pop=[], engine=header["engine"], **settings)
+    _restore_state(sim, header, arrays)
+    if sim.engine == "array":
+        sim.params = parameter_table(sim.names, sim.default_values_species)
+        sim.landscape = array_logic.compile_island(sim.island, sim._map_shape())
+        sim.landscape["food"][...] = arrays["food"].ravel()
+        order = np.argsort(arrays["rank"])
+        sim.population.append(*(arrays[column][order] for column in ("species", "cell", "age", "weight",
+                                                                     "fitness")))
+    else:
+        _restore_animals(sim, header, arrays)
+    return sim
+
+
+def _restore_state(sim, header: dict, arrays: dict):
+    """
+    Sets the parameters, random numbers, year and food of a ``BioSim`` from a checkpoint.
+    """
+    for species, params in header["parameters"].items():
+        sim.default_values_species[species].update(params)
+    sim.streams.seed = np.random.SeedSequence(header["seed"]["entropy"], spawn_key=header["seed"]["spawn_key"])
+    sim.rng = sim.streams.generator()
+    sim.rng.bit_generator.state = header["rng"]
+    sim._year = header["year"]
+    if header["mean"] is not None:
+        sim.mean = header["mean"]
+    island = sim.island
+    if "f_max" in arrays:
+        island.f_max[...] = arrays["f_max"]
+    island.year = header["island_year"]
+    if "cells" in arrays:
+        island.food[...] = island.f_max
+        island.food.reshape(-1)[arrays["cells"]] = arrays["food"]
+    else:
+        island.food[...] = arrays["food"]
+
+
+class LazyIsland:
+    """
+    The ``LazyIsland`` class is the island of a ``LazyBioSim``. ``island[(y, x)]`` makes the ``Cells`` of the
+    coordinate from the rows of the checkpoint the first time it is asked for, with its own one-cell ``Grid``.
+
+    :param LazyBioSim sim: the checkpoint.
+    """
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.rows = sim.str_map.split()
+        self.shape = (len(self.rows), len(self.rows[0]))
+        self._cells = dict()
+
+    def __contains__(self, coord):
+        return len(coord) == 2 and 1 <= coord[0] <= self.shape[0] and 1 <= coord[1] <= self.shape[1]
+
+    def __len__(self):
+        return self.shape[0] * self.shape[1]
+
+    def __getitem__(self, coord):
+        if coord not in self:
+            raise KeyError(coord)
+        index = (coord[0] - 1) * self.shape[1] + coord[1] - 1
+        if index not in self._cells:
+            self._cells[index] = self._make(coord, index)
+        return self._cells[index]
+
+    def _make(self, coord, index: int):
+        from .island import Cells
+        from .visuals import standard_values
+
+        sim, arrays = self.sim, self.sim.arrays
+        cell = Cells(standard_values[self.rows[coord[0] - 1][coord[1] - 1]], list(coord), sim.names)
+        cell.f_max = float(sim.f_max.flat[index])
+        cell.food = sim.food_at(index)
+        for species in sim.species_order(index):
+            first, last = sim.rows_of(species, index)
+            cls = getattr(sys.modules["biosim.animal"], species)
+            herd = _herd(cls, sim.default_values_species[species], cell.coord, arrays, first, last)
+            for row, A in zip(range(first, last), herd):
+                if str(row) in sim.header["animal_names"]:
+                    A.name = sim.header["animal_names"][str(row)]
+                if str(row) in sim.header["traits"]:
+                    _set_traits(A, sim.header["traits"][str(row)])
+            cell.default[species] = herd
+        cell.count()
+        return cell
+
+
+class LazyBioSim:
+    """
+    The ``LazyBioSim`` class is a checkpoint opened to look at, with its arrays memory-mapped (see ``read``).
+    Opening costs about as much as reading the header, whatever the number of animals: a cell or species
+    only reads the pages of its own rows. The rows are sorted by species and then cell, so they are found by
+    binary search in ``species`` and ``cell``.
+
+    It cannot simulate, ``load`` gives the whole ``BioSim``.
+
+    :param str file: path of the checkpoint.
+    """
+
+    def __init__(self, file: str):
+        self.file = file
+        self.header, self.arrays = read(file, mmap=True)
+        self.engine = self.header["engine"]
+        self.names = self.header["names"]
+        self.year = self.header["year"]
+        self.str_map = self.header["map"]
+        self.default_values_species = {species: SpeciesParameters(params)
+                                       for species, params in self.header["parameters"].items()}
+        if "f_max" in self.arrays:
+            self.f_max = self.arrays["f_max"]
+        else:
+            self.f_max = read(os.path.join(os.path.dirname(file), self.header["base"]), mmap=True)[1]["f_max"]
+        self.bounds = np.searchsorted(self.arrays["species"], np.arange(len(self.names) + 1)).tolist()
+        self.island = LazyIsland(self)
+
+    @property
+    def num_animals_per_species(self):
+        """Number of animals per species."""
+        return {species: self.bounds[i + 1] - self.bounds[i] for i, species in enumerate(self.names)}
+
+    @property
+    def num_animals(self):
+        """Number of animals."""
+        return self.bounds[-1]
+
+    def species(self, species: str):
+        """
+        :param str species: name of the species.
+        :return: the columns ``cell``, ``age``, ``weight`` and ``fitness`` of the animals of the species,
+            memory-mapped, sorted by cell.
+        """
+        i = self.names.index(species)
+        return {column: self.arrays[column][self.bounds[i]:self.bounds[i + 1]]
+                for column in ("cell", "age", "weight", "fitness")}
+
+    def rows_of(self, species: str, index: int):
+        """
+        :param str species: name of the species.
+        :param int index: flat cell index.
+        :return: the first row of the animals of the species in the cell, and the row after the last.
+        """
+        i = self.names.index(species)
+        first, last = self.bounds[i], self.bounds[i + 1]
+        cells = self.arrays["cell"][first:last]
+        return first + int(np.searchsorted(cells, index)), first + int(np.searchsorted(cells, index, "right"))
+
+    def species_order(self, index: int):
+        """
+        :param int index: flat cell index.
+        :return: the species of the cell in the order ``Cells.default`` had them.
+        """
+        if "views" not in self.arrays:
+            spans = {species: self.rows_of(species, index) for species in self.names}
+            return [species for species, (first, last) in spans.items() if first < last]
+        views = self.arrays["views"]
+        at = int(np.searchsorted(views, index))
+        if at == len(views) or views[at] != index:
+            return []
+        return [self.names[i] for i in self.arrays["keys"][at].tolist() if i >= 0]
+
+    def food_at(self, index: int):
+        """
+        :param int index: flat cell index.
+        :return: the food left in the cell.
+        """
+        if "cells" not in self.arrays:
+            return float(self.arrays["food"].flat[index])
+        cells = self.arrays["cells"]
+        at = int(np.searchsorted(cells, index))
+        if at < len(cells) and cells[at] == index:
+            return float(self.arrays["food"][at])
+        return float(self.f_max.flat[index])
+
+    def load(self):
+        """
+        :return: the whole ``BioSim``, see ``load``.
+        """
+        return load(self.file)
+
+
+def _year_of(file: str):
+    return int(os.path.basename(file).split("-")[1].split(".")[0])
+
+
+def checkpoints_in(path: str):
+    """
+    :param str path: folder of the checkpoints of ``Checkpoints``.
+    :return: paths of the checkpoints in the folder, by year.
+    """
+    return sorted(glob.glob(os.path.join(path, "base-*.biosim")) + glob.glob(os.path.join(path, "delta-*.biosim")),
+                  key=_year_of)
+
+
+def resume(path: str, **kwargs):
+    """
+    Loads the latest checkpoint of a folder of ``Checkpoints``, e.g. after the run was killed. ``simulate``
+    goes on with the same random numbers as the run would have.
+
+
+    :param str path: folder of the checkpoints.
+    :return: BioSim
+    """
+    files = checkpoints_in(path)
+    if not files:
+        raise FileNotFoundError("There are no checkpoints in {}.".format(path))
+    return load(files[-1], **kwargs)
+
+
+class Checkpoints:
+    """
+    The ``Checkpoints`` class is a checkpoint policy for ``BioSim.simulate``: a checkpoint is written after
+    every year that is a multiple of ``years``, and when ``seconds`` seconds have gone since the last one.
+    Only the last ``keep`` are kept.
+
+    Every ``base_every`` checkpoint is a base, with the whole island. The others are deltas, with only the
+    cells whose animals may have changed since the base: the cells with animals at the base or now, and the
+    cells ``Grid.tally`` was called for. The animals of every other cell are those of the base: none, and their
+    food is ``f_max``. ``f_max`` is only in a delta if it is not the same as in the base.
+    The ``"array"`` engine only writes bases.
+
+    The snapshot is taken between two years, the file is written by a thread while the next years are
+    simulated. A file gets its name when it is whole, so a killed run leaves only whole checkpoints,
+    see ``resume``.
+
+    :param str path: folder of the checkpoints, made if it does not exist.
+    :param int years: years between checkpoints.
+    :param float seconds: seconds between checkpoints.
+    :param int keep: number of checkpoints to keep, with the bases they need.
+    :param int base_every: every how many checkpoints a base is written.
+    """
+
+    def __init__(self, path: str, years: int = None, seconds: float = None, keep: int = 3, base_every: int = 10):
+        if years is None and seconds is None:
+            raise ValueError("A checkpoint policy needs years or seconds.")
+        self.path = path
+        self.years = years
+        self.seconds = seconds
+        self.keep = keep
+        self.base_every = base_every
+        self.taken = 0
+        self.last_time = time.monotonic()
+        self.base = None
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+        os.makedirs(path, exist_ok=True)
+
+    def due(self, year: int):
+        """
+        :param int year: the year of the simulation.
+        :return: True if a checkpoint should be taken.
+        """
+        return (self.years is not None and year % self.years == 0 or
+                self.seconds is not None and time.monotonic() - self.last_time >= self.seconds)
+
+    def take(self, sim):
+        """
+        Takes a snapshot of a ``BioSim`` and writes it in the background.
+
+
+        :param BioSim sim: the simulation.
+        :return: path of the checkpoint.
+        """
+        island = sim.island
+        if (sim.engine == "array" or self.base is None or self.base[1] is not island or
+                self.taken % self.base_every == 0):
+            header, arrays = snapshot(sim)
+            name = "base-{:08d}.biosim".format(sim.year)
+            self.base = (name, island, set(island.active), arrays["f_max"])
+        else:
+            # The cells that may have changed since the base are kept up in the set of the base. #
+            self.base[2].update(island.touched)
+            header, arrays = snapshot(sim, self.base[2] | island.active)
+            header["base"] = self.base[0]
+            if np.array_equal(arrays["f_max"], self.base[3]):
+                del arrays["f_max"]
+            name = "delta-{:08d}.biosim".format(sim.year)
+        island.touched.clear()
+        self.wait()
+        self._pending = self._pool.submit(self._write, name, header, arrays)
+        self.taken += 1
+        self.last_time = time.monotonic()
+        return os.path.join(self.path, name)
+
+    def _write(self, name: str, header: dict, arrays: dict):
+        temporary = os.path.join(self.path, "." + name)
+        write(temporary, header, arrays)
+        os.replace(temporary, os.path.join(self.path, name))
+        self.rotate()
+
+    def rotate(self):
+        """
+        Removes all but the last ``keep`` checkpoints, and the bases none of them needs. A delta needs the
+        last base before it.
+        """
+        files = checkpoints_in(self.path)
+        kept = set(files[-self.keep:]) if self.keep > 0 else set()
+        base = None
+        for file in files:
+            if os.path.basename(file).startswith("base-"):
+                base = file
+            elif file in kept and base is not None:
+                kept.add(base)
+        for file in files:
+            if file not in kept:
+                os.remove(file)
+
+    def wait(self):
+        """
+        Waits until the checkpoint being written is done.
+        """
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+
+if __name__ == '__main__':
+    pass
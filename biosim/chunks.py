@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+"""
+The numbered ``.npz`` chunks of a folder, as written by ``sweep`` and ``recorder``. This file contains:
+    - function: next_chunk
+    - function: write_chunk
+
+A chunk is ``chunk-NNNNN.npz``. It is written under another name first and then gets its own, so a stopped
+run never leaves half a chunk.
+"""
+
+__author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
+__email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
+
+import glob
+import os
+
+import numpy as np
+
+
+def next_chunk(path: str):
+    """
+    :param str path: the folder of the chunks.
+    :return: the number after the highest chunk in ``path``, 0 if there is none. A chunk that went missing
+        does not make the next one replace another.
+    """
+    numbers = [int(os.path.basename(chunk)[6:-4])
+               for chunk in glob.glob(os.path.join(path, "chunk-[0-9][0-9][0-9][0-9][0-9].npz"))]
+    return 1 + max(numbers, default=-1)
+
+
+def write_chunk(path: str, arrays: dict):
+    """
+    Writes the arrays as the next chunk of ``path``, see ``next_chunk``.
+
+
+    :param str path: the folder of the chunks.
+    :param dict arrays: name and array of every column.
+    :return: the number of the chunk.
+    """
+    number = next_chunk(path)
+    temporary = os.path.join(path, ".chunk-{:05d}.npz".format(number))
+    np.savez(temporary, **arrays)
+    os.replace(temporary, os.path.join(path, "chunk-{:05d}.npz".format(number)))
+    return number
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+"""
+The number of animals per year, species and cell, as a compressed cube. This file contains:
+    - class: CubeWriter
+    - class: Cube
+
+The cube is cut into tiles of ``tile = (years, rows, columns)``. Every tile is kept as an array (year, species,
+row, column) of the smallest unsigned integer type its counts fit in, compressed with ``zlib`` or ``lzma``, and
+added to the end of the data file. The index, ``<file>.json``, has the map, species and tile size, and per
+block of years the place, length and type of every tile. It is replaced after every block, so a stopped run
+leaves a cube of the blocks written so far.
+
+Reading a year only decompresses the tiles of its block, reading a cell only the tile of the cell in every
+block.
+"""
+
+__author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
+__email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
+
+import json
+import lzma
+import os
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+from .recorder import densities
+
+codecs = {"zlib": (zlib.compress, zlib.decompress), "lzma": (lzma.compress, lzma.decompress)}
+
+
+class CubeWriter:
+    """
+    The ``CubeWriter`` class writes the cube of a ``BioSim``, it records every year it is given to
+    ``BioSim.simulate`` like a ``recorder.Recorder``::
+
+        with CubeWriter("run.cube", sim) as cube:
+            sim.simulate(10000, vis_years=0, recorder=cube)
+
+    A cube that was written before, with the same map, species, tiles and codec, is added to. A block ends
+    when it has ``tile[0]`` years, when a year is not the one after the last, and at ``close``. A year that is
+    not after the last one in the cube, e.g. after going back to a checkpoint, replaces that year and the years
+    after it.
+
+    :param str file: path of the data file.
+    :param BioSim sim: the simulation, for its map and species.
+    :param tuple tile: years, rows and columns of a tile.
+    :param str codec: ``"zlib"`` or ``"lzma"``.
+    """
+
+    def __init__(self, file: str, sim, tile=(256, 8, 8), codec: str = "zlib"):
+        if codec not in codecs:
+            raise ValueError("Got codec '{}'; needs one of {}".format(codec, tuple(codecs)))
+        self.file = file
+        self.compress = codecs[codec][0]
+        self.index = {"names": list(sim.names), "shape": list(sim.island.shape), "tile": list(tile),
+                      "codec": codec, "blocks": []}
+        if os.path.exists(file + ".json"):
+            with open(file + ".json") as index:
+                old = json.load(index)
+            if {key: old[key] for key in self.index if key != "blocks"} != \
+                    {key: value for key, value in self.index.items() if key != "blocks"}:
+                raise ValueError("The cube {} has another map, species, tile or codec.".format(file))
+            self.index = old
+        self.buffer = np.zeros((tile[0], len(sim.names)) + tuple(sim.island.shape), dtype=np.int64)
+        self.first = None
+        self.n = 0
+
+    def record(self, sim):
+        """
+        Puts the counts of the year that was just simulated into the block, and writes the block when it is
+        full.
+
+
+        :param BioSim sim: the simulation.
+        """
+        if self.n and sim.year != self.first + self.n:
+            self.flush()
+        if self.n == 0:
+            self.first = sim.year
+            self._drop_from(sim.year)
+        self.buffer[self.n] = densities(sim)
+        self.n += 1
+        if self.n == len(self.buffer):
+            self.flush()
+
+    def _drop_from(self, year: int):
+        """
+        Takes the years from ``year`` out of the index, their tiles stay in the data file unused.
+        """
+        blocks = []
+        for block in self.index["blocks"]:
+            if block["year"] < year:
+                blocks.append(dict(block, years=min(block["years"], year - block["year"])))
+        self.index["blocks"] = blocks
+
+    def flush(self):
+        """
+        Writes the tiles of the years in the block, and then the index.
+        """
+        if self.n == 0:
+            return
+        _, rows, columns = self.index["tile"]
+        y_length, x_length = self.index["shape"]
+        tiles = []
+        with open(self.file, "ab") as out:
+            for y in range(0, y_length, rows):
+                for x in range(0, x_length, columns):
+                    part = self.buffer[:self.n, :, y:y + rows, x:x + columns]
+                    dtype = np.min_scalar_type(int(part.max()))
+                    data = self.compress(np.ascontiguousarray(part, dtype=dtype).tobytes())
+                    tiles.append([out.tell(), len(data), dtype.str])
+                    out.write(data)
+        self.index["blocks"].append({"year": self.first, "years": self.n, "tiles": tiles})
+        with open(self.file + ".json.tmp", "w") as index:
+            json.dump(self.index, index)
+        os.replace(self.file + ".json.tmp", self.file + ".json")
+        self.n = 0
+
+    def close(self):
+        """
+        Writes the last years.
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Cube:
+    """
+    The ``Cube`` class reads a cube written by ``CubeWriter``. The last ``cache`` tiles read are kept
+    decompressed.
+
+    :param str file: path of the data file.
+    :param int cache: number of tiles to keep.
+    """
+
+    def __init__(self, file: str, cache: int = 64):
+        self.file = file
+        with open(file + ".json") as index:
+            self.index = json.load(index)
+        self.names = self.index["names"]
+        self.shape = tuple(self.index["shape"])
+        self.decompress = codecs[self.index["codec"]][1]
+        self.starts = np.array([block["year"] for block in self.index["blocks"]], dtype=np.int64)
+        ends = self.starts + [block["years"] for block in self.index["blocks"]]
+        if (self.starts[1:] < ends[:-1]).any():
+            raise ValueError("The blocks of the cube {} are not in the order of the years.".format(file))
+        self.tile = lru_cache(maxsize=cache)(self._tile)
+
+    @property
+    def years(self):
+        """The years in the cube."""
+        return np.concatenate([np.arange(block["year"], block["year"] + block["years"])
+                               for block in self.index["blocks"]] + [np.zeros(0, dtype=np.int64)])
+
+    def _tile(self, block: int, row: int, column: int):
+        """
+        :return: the tile of a block in the tile row and column (from 0), as an array (year, species, row,
+            column).
+        """
+        _, rows, columns = self.index["tile"]
+        per_row = -(-self.shape[1] // columns)
+        offset, length, dtype = self.index["blocks"][block]["tiles"][row * per_row + column]
+        with open(self.file, "rb") as source:
+            source.seek(offset)
+            data = self.decompress(source.read(length))
+        height = min(rows, self.shape[0] - row * rows)
+        width = min(columns, self.shape[1] - column * columns)
+        return np.frombuffer(data, dtype=dtype).reshape(-1, len(self.names), height, width)
+
+    def _block(self, year: int):
+        block = int(np.searchsorted(self.starts, year, side="right")) - 1
+        if block < 0 or year >= self.starts[block] + self.index["blocks"][block]["years"]:
+            raise KeyError(year)
+        return block
+
+    def year(self, year: int):
+        """
+        :param int year: a year in the cube.
+        :return: number of animals per species and cell of the year, as an array (species, y, x).
+        """
+        block = self._block(year)
+        _, rows, columns = self.index["tile"]
+        counts = np.zeros((len(self.names),) + self.shape, dtype=np.int64)
+        for y in range(0, self.shape[0], rows):
+            for x in range(0, self.shape[1], columns):
+                tile = self.tile(block, y // rows, x // columns)
+                counts[:, y:y + tile.shape[2], x:x + tile.shape[3]] = tile[year - self.starts[block]]
+        return counts
+
+    def cell(self, coord):
+        """
+        :param tuple[int,int] coord: ``(y, x)`` coordinate of the cell, from 1.
+        :return: number of animals per year and species of the cell, as an array (year, species), see
+            ``years``.
+        """
+        y, x = coord[0] - 1, coord[1] - 1
+        if not (0 <= y < self.shape[0] and 0 <= x < self.shape[1]):
+            raise KeyError(coord)
+        _, rows, columns = self.index["tile"]
+        parts = [self.tile(block, y // rows, x // columns)[:self.index["blocks"][block]["years"], :, y % rows,
+                                                            x % columns]
+                 for block in range(len(self.starts))]
+        return np.concatenate(parts + [np.zeros((0, len(self.names)))]).astype(np.int64)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+"""
+Runs the years of one island in many processes. This file contains:
+    - class: Stripes
+
+The island is cut into bands of rows, each owned by a worker process. Feeding, breeding and ageing only
+need the cell itself, so every worker does its own cells. Only the animals that migrate over the border of
+a band are sent to the worker that owns the cell they move to.
+"""
+
+__author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
+__email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
+
+import multiprocessing
+from collections import ChainMap
+
+import numpy as np
+
+from .logic import year_start, year_finish, departures, arrivals, season_end
+from .streams import MIGRATION
+
+
+def _adopt(herds, params: dict):
+    """
+    Animals that were sent from another process refer to a copy of the parameters of their species, they get
+    the parameters of this process back.
+
+
+    :param herds: ``(species, animals)`` pairs.
+    :param dict params: the parameters of every species.
+    """
+    for species, animals in herds:
+        for A in animals:
+            A.params = params[species]
+            A.lookup = A.params if A.traits is None else ChainMap(A.traits, A.params)
+
+
+def _work(connection):
+    """
+    The loop of a worker process, it does what the ``Stripes`` asks for until it is told to stop.
+    """
+    island, params, streams = connection.recv()
+    while True:
+        command, *args = connection.recv()
+        try:
+            if command == "start":
+                year, first, last = args
+                year_start(island.occupied(), streams, year)
+                leaving = departures(island, island.occupied(), streams.stripes(year, MIGRATION))
+                up, staying, down = dict(), dict(), dict()
+                for (to, species), animals in leaving.items():
+                    row = to // island.shape[1]
+                    (up if row < first else down if row >= last else staying)[(to, species)] = animals
+                connection.send((up, down))
+            elif command == "finish":
+                above, below = args
+                _adopt(((species, animals) for part in (above, below) for (_, species), animals in part.items()),
+                       params)
+                # In the order of the cells the animals come from, the same as ``season_migration``. #
+                arriving = dict()
+                for part in (above, staying, below):
+                    for key, animals in part.items():
+                        arriving.setdefault(key, []).extend(animals)
+                arrivals(island, arriving)
+                year_finish(island.occupied(), streams, year)
+                season_end(island)
+                connection.send(island.counts[:, first:last])
+            elif command == "cut":
+                connection.send(island.cut(*args))
+            elif command == "paste":
+                first, part = args
+                _adopt((herd for default in part["cells"].values() for herd in default.items()), params)
+                island.paste(first, part)
+                connection.send(None)
+            elif command == "stop":
+                connection.send(None)
+                return
+        except Exception as error:
+            connection.send(error)
+            raise
+
+
+class Stripes:
+    """
+    The ``Stripes`` class runs the years of the object engine of a ``BioSim`` in worker processes. Each
+    worker owns a band of rows of the island, the animals are handed back to the ``BioSim`` by ``close``.
+
+    The random numbers of every row come from its own stream (``streams.Streams``), and the moving animals
+    arrive in the same order as in ``season_migration``, so the result is the same as ``BioSim.simulate``
+    with the same seed, whatever the number of workers.
+
+    When the animals gather in some rows, the borders of the bands are moved so every worker has about as
+    many animals, see ``balance``.
+
+    :param BioSim sim: the simulation, it must use the ``"object"`` engine.
+    :param int workers: number of processes, by default one per CPU, at most one per row.
+    :param float tolerance: how much more animals than the mean a band may have before the borders are moved.
+    """
+
+    def __init__(self, sim, workers: int = None, tolerance: float = 0.25):
+        if sim.engine != "object":
+            raise ValueError("Stripes needs the 'object' engine, got '{}'".format(sim.engine))
+        self.sim = sim
+        self.tolerance = tolerance
+        y_length = sim.island.shape[0]
+        workers = min(workers or multiprocessing.cpu_count(), y_length)
+        self.borders = [round(y_length * n / workers) for n in range(workers + 1)]
+        # ``sim.island`` keeps counting the animals the workers have. #
+        counts = sim.island.counts.copy()
+        parts = [sim.island.cut(first, last) for first, last in self.bands]
+        sim.island.counts[...] = counts
+        sim.island.totals[...] = counts.reshape(len(sim.island.names), -1).sum(axis=1)
+        self.connections = []
+        self.processes = []
+        for part, (first, _) in zip(parts, self.bands):
+            connection, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_work, args=(child,), daemon=True)
+            process.start()
+            connection.send((sim.island, sim.default_values_species, sim.streams))
+            self.connections.append(connection)
+            self.processes.append(process)
+            self._ask(connection, "paste", first, part)
+
+    @property
+    def bands(self):
+        """``(first row, the row after the last)`` of every worker."""
+        return list(zip(self.borders[:-1], self.borders[1:]))
+
+    @staticmethod
+    def _ask(connection, *command):
+        connection.send(command)
+        reply = connection.recv()
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def _replies(self):
+        replies = [connection.recv() for connection in self.connections]
+        for reply in replies:
+            if isinstance(reply, Exception):
+                raise reply
+        return replies
+
+    def simulate(self, num_years: int):
+        """
+        Simulates ``num_years`` years, the counts of ``sim.island`` are updated after every year.
+
+
+        :param int num_years: number of years to simulate.
+        """
+        island = self.sim.island
+        for _ in range(num_years):
+            for connection, (first, last) in zip(self.connections, self.bands):
+                connection.send(("start", self.sim.year, first, last))
+            leaving = self._replies()
+            for n, connection in enumerate(self.connections):
+                above = leaving[n - 1][1] if n > 0 else dict()
+                below = leaving[n + 1][0] if n + 1 < len(leaving) else dict()
+                connection.send(("finish", above, below))
+            for counts, (first, last) in zip(self._replies(), self.bands):
+                island.counts[:, first:last] = counts
+            island.totals[...] = island.counts.reshape(len(island.names), -1).sum(axis=1)
+            self.sim._year += 1
+            self.balance()
+
+    def balance(self):
+        """
+        Moves the borders of the bands so each band has about as many animals, if a band has more than
+        ``1 + tolerance`` times the mean. Every band keeps at least one row.
+        """
+        load = self.sim.island.counts.sum(axis=(0, 2))
+        bands = np.add.reduceat(load, self.borders[:-1])
+        if load.sum() == 0 or bands.max() <= (1 + self.tolerance) * load.sum() / len(bands):
+            return
+        workers, y_length = len(bands), len(load)
+        borders = [0] + np.searchsorted(np.cumsum(load), load.sum() * np.arange(1, workers) / workers,
+                                        side="right").tolist() + [y_length]
+        for n in range(1, workers):
+            borders[n] = min(max(borders[n], borders[n - 1] + 1), y_length - (workers - n))
+        old = self.bands
+        self.borders = borders
+        for giver, (first, last) in enumerate(old):
+            for taker, (new_first, new_last) in enumerate(self.bands):
+                rows = max(first, new_first), min(last, new_last)
+                if giver != taker and rows[0] < rows[1]:
+                    part = self._ask(self.connections[giver], "cut", *rows)
+                    self._ask(self.connections[taker], "paste", rows[0], part)
+
+    def close(self):
+        """
+        Hands the animals back to the ``BioSim`` and stops the workers.
+        """
+        if not self.connections:
+            return
+        for connection, (first, last) in zip(self.connections, self.bands):
+            part = self._ask(connection, "cut", first, last)
+            _adopt((herd for default in part["cells"].values() for herd in default.items()),
+                   self.sim.default_values_species)
+            self.sim.island.paste(first, part)
+            self._ask(connection, "stop")
+        for process in self.processes:
+            process.join()
+        self.connections, self.processes = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == '__main__':
+    pass
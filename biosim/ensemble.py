@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+"""
+Runs one scenario over many seeds. This file contains:
+    - class: Quantile
+    - class: Trajectories
+    - function: run
+
+The runs are done in a ``concurrent.futures.ProcessPoolExecutor``. Every worker makes the island of the
+scenario once, and every run sends back only the number of animals per species and year, which is added
+to running means and quantile estimates, so no run is kept in memory.
+"""
+
+__author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
+__email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
+
+import copy
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from .simulation import BioSim
+from .streams import Streams
+
+
+class Quantile:
+    """
+    The ``Quantile`` class estimates a quantile of many quantities at once (e.g. one per year) with the P²
+    algorithm of Jain and Chlamtac (1985), which keeps five markers per quantity instead of every observation.
+
+    :param float p: the quantile, between 0 and 1.
+    :param int size: the number of quantities.
+    """
+
+    def __init__(self, p: float, size: int):
+        self.p = p
+        self.n = 0
+        self.heights = np.zeros((5, size))
+        self.positions = np.tile(np.arange(1., 6.)[:, None], (1, size))
+        self.desired = np.array([1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5])
+        self.increments = np.array([0, p / 2, p, (1 + p) / 2, 1])
+
+    def add(self, x):
+        """
+        :param x: one observation of every quantity.
+        """
+        x = np.asarray(x, dtype=float)
+        if self.n < 5:
+            self.heights[self.n] = x
+            self.n += 1
+            if self.n == 5:
+                self.heights.sort(axis=0)
+            return
+        self.n += 1
+        q, n = self.heights, self.positions
+        q[0] = np.minimum(q[0], x)
+        q[4] = np.maximum(q[4], x)
+        # The cell of ``x`` is the number of inner markers at or below it. #
+        k = (q[1:4] <= x).sum(axis=0)
+        n[1:] += np.arange(1, 5)[:, None] > k
+        desired = self.desired + (self.n - 5) * self.increments
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            adjust = ((d >= 1) & (n[i + 1] - n[i] > 1)) | ((d <= -1) & (n[i - 1] - n[i] < -1))
+            if not adjust.any():
+                continue
+            d = np.sign(d)
+            parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+            j = np.where(d > 0, i + 1, i - 1)
+            columns = np.arange(q.shape[1])
+            linear = q[i] + d * (q[j, columns] - q[i]) / (n[j, columns] - n[i])
+            new = np.where((q[i - 1] < parabolic) & (parabolic < q[i + 1]), parabolic, linear)
+            q[i] = np.where(adjust, new, q[i])
+            n[i] = np.where(adjust, n[i] + d, n[i])
+
+    @property
+    def value(self):
+        """The estimate of the quantile, exact for less than six observations."""
+        if self.n == 0:
+            return np.full(self.heights.shape[1], np.nan)
+        if self.n <= 5:
+            return np.quantile(self.heights[:self.n], self.p, axis=0)
+        return self.heights[2].copy()
+
+
+class Trajectories:
+    """
+    The ``Trajectories`` class keeps the mean and quantile bands of the number of animals per species and
+    year over the runs added to it.
+
+    :param list[str] names: names of the species.
+    :param int num_years: number of years of a run, the trajectory has one more value (the start).
+    :param tuple quantiles: the quantiles to estimate.
+    """
+
+    def __init__(self, names: list, num_years: int, quantiles=(0.05, 0.5, 0.95)):
+        self.names = list(names)
+        self.n = 0
+        self.mean = {species: np.zeros(num_years + 1) for species in self.names}
+        self.bands = {species: {p: Quantile(p, num_years + 1) for p in quantiles} for species in self.names}
+        self.animal_years = 0
+        self.seconds = 0.
+
+    def add(self, counts: dict):
+        """
+        :param dict counts: number of animals per year (array) of every species of one run.
+        """
+        self.n += 1
+        for species in self.names:
+            self.mean[species] += (counts[species] - self.mean[species]) / self.n
+            for band in self.bands[species].values():
+                band.add(counts[species])
+        # Every animal alive at the start of a year lives through that year. #
+        self.animal_years += int(sum(counts[species][:-1].sum() for species in self.names))
+
+    def quantile(self, species: str, p: float):
+        """
+        :param str species: name of the species.
+        :param float p: one of the quantiles.
+        :return: estimate of the quantile per year.
+        """
+        return self.bands[species][p].value
+
+    @property
+    def rate(self):
+        """Simulated animal-years per second."""
+        return self.animal_years / self.seconds if self.seconds else 0.
+
+
+_scenario = dict()
+
+
+def _set_parameters(sim: BioSim, animal_params: dict = None, landscape_params: dict = None):
+    for species, params in (animal_params or dict()).items():
+        sim.set_animal_parameters(species, params)
+    for landscape, params in (landscape_params or dict()).items():
+        sim.set_landscape_parameters(landscape, params)
+
+
+def _start_worker(island_map: str, ini_pop: list, engine: str, animal_params: dict, landscape_params: dict):
+    """
+    Makes the island of the scenario once per worker, without animals.
+    """
+    sim = BioSim(island_map=island_map, ini_pop=[], engine=engine)
+    _set_parameters(sim, animal_params, landscape_params)
+    _scenario.update(sim=sim, ini_pop=ini_pop)
+
+
+def _simulate(seed, num_years: int, animal_params: dict = None, landscape_params: dict = None):
+    """
+    :return: number of animals per year (array) of every species of the run with ``seed``, with the
+        parameters of the run on top of those of the scenario.
+    """
+    sim = copy.deepcopy(_scenario["sim"])
+    _set_parameters(sim, animal_params, landscape_params)
+    sim.streams = Streams(seed)
+    sim.rng = sim.streams.generator()
+    sim.add_population(_scenario["ini_pop"])
+    counts = np.zeros((len(sim.names), num_years + 1), dtype=np.int64)
+    counts[:, 0] = list(sim.num_animals_per_species.values())
+    for year in range(1, num_years + 1):
+        sim.simulate(1, vis_years=0)
+        counts[:, year] = list(sim.num_animals_per_species.values())
+    return dict(zip(sim.names, counts))
+
+
+def run(island_map: str, ini_pop: list, seeds, num_years: int, engine: str = "object", animal_params=None,
+        landscape_params=None, quantiles=(0.05, 0.5, 0.95), workers=None):
+    """
+    Runs a scenario once per seed, in ``workers`` processes.
+
+
+    :param str island_map: the map, as for ``BioSim``.
+    :param list ini_pop: the population of every run, as for ``BioSim``.
+    :param seeds: the seed of every run.
+    :param int num_years: number of years of every run.
+    :param str engine: ``"object"`` or ``"array"``.
+    :param dict animal_params: parameters per species, see ``BioSim.set_animal_parameters``.
+    :param dict landscape_params: parameters per landscape, see ``BioSim.set_landscape_parameters``.
+    :param tuple quantiles: the quantiles of the bands.
+    :param int workers: number of processes, by default one per CPU. With 0 the runs are done in this process.
+    :return: Trajectories
+    """
+    scenario = (island_map, ini_pop, engine, animal_params, landscape_params)
+    start = time.perf_counter()
+    if workers == 0:
+        _start_worker(*scenario)
+        trajectories = Trajectories(_scenario["sim"].names, num_years, quantiles)
+        for seed in seeds:
+            trajectories.add(_simulate(seed, num_years))
+    else:
+        # A wrong map or species is found here, not in every worker. #
+        trajectories = Trajectories(BioSim(island_map=island_map, ini_pop=ini_pop, engine=engine).names,
+                                    num_years, quantiles)
+        with ProcessPoolExecutor(workers, initializer=_start_worker, initargs=scenario) as pool:
+            # ``map`` gives the runs back in the order of the seeds, so the estimates do not depend on timing. #
+            for counts in pool.map(partial(_simulate, num_years=num_years), seeds, chunksize=4):
+                trajectories.add(counts)
+    trajectories.seconds = time.perf_counter() - start
+    return trajectories
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fitness evaluation of the animals. This file contains:
+    - class: AgeTable
+    - function: age_table
+    - function: phi
+    - function: phi_one
+
+The fitness of an animal is
+
+    phi = q(+1, a, a_half, phi_age) * q(-1, w, w_half, phi_weight),  q(k, x, xh, p) = 1 / (1 + e^(k * p * (x - xh)))
+
+and 0 if the weight is 0 or less. Since ages are integers, the age term is read from a lookup table
+that is made once per ``a_half`` and ``phi_age``.
+"""
+
+__author__ = "Mats Hoem olsen, Roy Erling Granheim"
+__email__ = "mats.hoem.olsen@nmbu.no, roy.erling.granheim@nmbu.no"
+
+import math
+from functools import lru_cache
+
+import numpy as np
+
+fitness_keys = ("a_half", "phi_age", "w_half", "phi_weight")
+
+
+class AgeTable:
+    """
+    Lookup table for the age term of the fitness, ``q(+1, a, a_half, phi_age)`` for ``a = 0, 1, 2, ...``.
+    The table grows by itself when an older animal is looked up.
+
+    :param float a_half: age where the age term is 0.5.
+    :param float phi_age: steepness of the age term.
+    :param int size: number of ages to calculate at first.
+    """
+
+    def __init__(self, a_half: float, phi_age: float, size: int = 128):
+        self.a_half = a_half
+        self.phi_age = phi_age
+        self.values = np.empty(0)
+        self._list = []
+        self._grow(size)
+
+    def _grow(self, size: int):
+        """
+        Calculates the table for the ages ``0`` to ``size - 1``.
+
+
+        :param int size: number of ages.
+        """
+        with np.errstate(over="ignore"):
+            self.values = 1 / (1 + np.exp(self.phi_age * (np.arange(size) - self.a_half)))
+        self._list = self.values.tolist()
+
+    def __len__(self):
+        return len(self._list)
+
+    def __getitem__(self, age: int):
+        """
+        Age term of one animal.
+
+
+        :param int age: age of the animal.
+        :return: float
+        """
+        if age >= len(self._list):
+            self._grow(2 * age + 1)
+        return self._list[age]
+
+    def take(self, ages):
+        """
+        Age term of many animals.
+
+
+        :param ages: integer array of ages.
+        :return: array of age terms.
+        """
+        if len(ages) and ages.max() >= len(self._list):
+            self._grow(2 * int(ages.max()) + 1)
+        return self.values[ages]
+
+
+@lru_cache(maxsize=64)
+def age_table(a_half: float, phi_age: float):
+    """
+    Gives the lookup table for ``a_half`` and ``phi_age``, the table is only made the first time it is asked for.
+    A table only depends on the values, so it is never out of date; the last 64 tables are kept.
+
+
+    :param float a_half: age where the age term is 0.5.
+    :param float phi_age: steepness of the age term.
+    :return: AgeTable
+    """
+    return AgeTable(a_half, phi_age)
+
+
+def phi_one(a: int, w: float, params: dict):
+    """
+    Fitness of one animal.
+
+
+    :param int a: age of the animal.
+    :param float w: weight of the animal.
+    :param dict params: dictionary with ``a_half``, ``phi_age``, ``w_half`` and ``phi_weight``.
+    :return: float
+    """
+    if w <= 0:
+        return 0
+    if isinstance(a, int):
+        q_p = age_table(params["a_half"], params["phi_age"])[a]
+    else:
+        q_p = _q(params["phi_age"] * (a - params["a_half"]))
+    return q_p * _q(-params["phi_weight"] * (w - params["w_half"]))
+
+
+def _q(x: float):
+    """
+    ``1 / (1 + e^x)`` without overflow for big ``x``.
+    """
+    return 0. if x > 700 else 1 / (1 + math.exp(x))
+
+
+def phi(ages, weights, params: dict):
+    """
+    Fitness of many animals at once, for example all the animals of one species in a cell.
+
+    The values of ``params`` can either be numbers, or arrays with one value per animal. Integer ages
+    with numbers as parameters uses the age lookup table.
+
+
+    :param ages: ages of the animals.
+    :param weights: weights of the animals.
+    :param dict params: dictionary with ``a_half``, ``phi_age``, ``w_half`` and ``phi_weight``.
+    :return: array of fitness.
+    """
+    ages = np.asarray(ages)
+    weights = np.asarray(weights, dtype=float)
+    with np.errstate(over="ignore"):
+        if ages.ndim == 1 and ages.dtype.kind in "iu" and np.ndim(params["a_half"]) == 0 \
+                and np.ndim(params["phi_age"]) == 0:
+            q_p = age_table(params["a_half"], params["phi_age"]).take(ages)
+        else:
+            q_p = 1 / (1 + np.exp(params["phi_age"] * (ages - params["a_half"])))
+        q_n = 1 / (1 + np.exp(-params["phi_weight"] * (weights - params["w_half"])))
+    return np.where(weights <= 0, 0., q_p * q_n)
+
+
+if __name__ == "__main__":
+    pass
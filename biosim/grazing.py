@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+"""
+Grazing of the herbivores. This file contains:
+    - function: intake
+
+Both ``logic.py`` and ``array_logic.py`` use ``intake``, so both engines share the food the same way.
+"""
+
+__author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
+__email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
+
+import numpy as np
+
+
+def intake(food, appetite, start):
+    """
+    Shares the food of the cells between the animals that graze there. The animals of a cell eat in turn,
+    each takes what it wants (``F``) or what is left, like ``Herbivore.eat`` one at a time.
+
+    The animals of one cell must be next to each other, in the order they eat. Every cell must have at least
+    one animal.
+
+
+    :param food: food of each cell.
+    :param appetite: ``F`` of each animal.
+    :param start: index of the first animal of each cell.
+    :return: what each animal ate, and if there was food left when it was its turn.
+    """
+    appetite = np.asarray(appetite, dtype=float)
+    start = np.asarray(start)
+    size = np.diff(np.append(start, len(appetite)))
+    # What the animals before it in the same cell wants to eat. #
+    demand = np.cumsum(appetite) - appetite
+    demand -= np.repeat(demand[start], size)
+    left = np.repeat(np.asarray(food, dtype=float), size) - demand
+    return np.clip(left, 0, appetite), left > 0
+
+
+if __name__ == '__main__':
+    pass
@@ -1,12 +1,327 @@
 # -*- coding: utf-8 -*-
 
+"""
+The island of the simulation. This file contains:
+    - class: Grid
+    - class: Cells
+"""
+
 __author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
 __email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
 
+import threading
+
+import numpy as np
+
+from .migration import neighbour_table
+from .population import bin_counts, bin_edges, hist_defaults
+
+
+class Grid:
+    """
+    The ``Grid`` class keeps the landscape of the island as 2-D arrays with the shape of the map:
+        - ``type``: the cell type, see ``Cells.default_food``.
+        - ``f_max``: the maximum food of every cell.
+        - ``food``: the food left in every cell.
+        - ``counts``: number of animals per species and cell.
+        - ``occupancy``: number of animals per cell.
+
+    ``totals`` is the number of animals per species on the whole island. The seasons of ``logic.py`` keep
+    ``counts`` and ``totals`` up to date with ``Cells.tally`` as animals are born, die and move, so reading
+    them costs nothing. ``count`` counts every animal again, after the animals of a cell were changed by hand.
+
+    The statistics recorded by ``Cells.record`` are kept up to date the same way:
+        - ``sums``: sum of the age, weight and fitness (``properties``) per species and cell, shape
+          ``(3, species, y, x)``.
+        - ``bins``: number of animals per species and bin of every property on the whole island, the bins are
+          ``edges``, made from ``hist_specs`` (see ``set_bins``).
+
+    The ``Grid`` works like the dictionary of ``Cells`` it replaces, with ``(y, x)`` as key starting at 1.
+    The ``Cells`` of a coordinate is only made the first time it is asked for, and it keeps the animals of the
+    cell. Water and cells nobody asked for costs nothing but their place in the arrays.
+
+    ``active`` is the set of cell indices that hold animals, the seasons only go through ``occupied``.
+    ``touched`` is the set of cell indices ``tally`` was called for, until it is cleared (see
+    ``checkpoint.Checkpoints``).
+    ``tally`` may be called by many threads at once, as long as each cell is done by one thread.
+    The food grows back lazily: ``reset_food`` only starts a new ``year``, and the food of a cell is put back
+    to ``f_max`` the first time the cell is used in the new year (``stamp`` is the last year it was used).
+
+    :param types: 2-D array of the cell types.
+    :param list[str] names: names of all the species on the island.
+    """
+
+    properties = ("age", "weight", "fitness")
+
+    def __init__(self, types, names: list = None):
+        self.type = np.array(types, dtype=np.int8, ndmin=2)
+        self.shape = self.type.shape
+        self.names = list(names) if names else []
+        food_table = np.zeros(max(Cells.default_food) + 1)
+        food_table[list(Cells.default_food)] = list(Cells.default_food.values())
+        self.f_max = food_table[self.type]
+        self._food = self.f_max.copy()
+        self.year = 0
+        self.stamp = np.zeros(self.shape, dtype=np.int64)
+        self.counts = np.zeros((len(self.names),) + self.shape, dtype=np.int64)
+        self.totals = np.zeros(len(self.names), dtype=np.int64)
+        self.occupancy = np.zeros(self.shape, dtype=np.int64)
+        self.active = set()
+        self.touched = set()
+        self.species_id = {species: i for i, species in enumerate(self.names)}
+        self.legal = self.type != 0
+        self.neighbours = neighbour_table(self.legal)
+        self._cells = dict()
+        self._lock = threading.Lock()
+        self.sums = np.zeros((len(self.properties), len(self.names)) + self.shape)
+        self.set_bins(hist_defaults)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def set_bins(self, specs: dict):
+        """
+        Sets the bins ``bins`` are counted in, and counts them again from what the cells recorded.
+
+
+        :param dict specs: ``{property: {"max": ..., "delta": ...}}`` for every property, as ``hist_specs``.
+        """
+        self.hist_specs = {key: dict(specs[key]) for key in self.properties}
+        self.edges = {key: bin_edges(spec) for key, spec in self.hist_specs.items()}
+        self.bins = {key: np.zeros((len(self.names), len(edges) - 1), dtype=np.int64)
+                     for key, edges in self.edges.items()}
+        for _, cell in self._cells.items():
+            cell.bins = dict()
+            for species in cell.count_age:
+                self.record(cell, species, (cell.count_age[species], cell.count_weight[species],
+                                            cell.count_fitness[species]))
+
+    def record(self, cell, species: str, values):
+        """
+        Replaces the statistics of a species in a cell, see ``Cells.record``.
+
+
+        :param Cells cell: the cell.
+        :param str species: name of the species.
+        :param values: the ages, weights and fitness of the animals.
+        """
+        if species not in self.species_id:
+            return
+        i = self.species_id[species]
+        new = [bin_counts(value, 0, 1, self.edges[key])[0] for key, value in zip(self.properties, values)]
+        old = cell.bins.get(species)
+        # Every cell has its own statistics, but the bins are shared by the threads. #
+        with self._lock:
+            for k, key in enumerate(self.properties):
+                self.bins[key][i] += new[k] - old[k] if old is not None else new[k]
+        cell.bins[species] = new
+        for k, value in enumerate(values):
+            self.sums[(k, i) + cell._at] = np.sum(value)
+
+    def index(self, coord):
+        """
+        :param tuple[int,int] coord: coordinate of the cell.
+        :return: the flat cell index, ``(y - 1) * x_length + x - 1``.
+        """
+        return (coord[0] - 1) * self.shape[1] + coord[1] - 1
+
+    def coord(self, index: int):
+        """
+        :param int index: flat cell index.
+        :return: the ``(y, x)`` coordinate of the cell.
+        """
+        return index // self.shape[1] + 1, index % self.shape[1] + 1
+
+    def cell(self, index: int):
+        """
+        The ``Cells`` of a cell index, made if it does not exist yet.
+
+
+        :param int index: flat cell index.
+        :return: Cells
+        """
+        if index not in self._cells:
+            y, x = self.coord(index)
+            self._cells[index] = Cells(int(self.type[y - 1, x - 1]), [y, x], self.names, grid=self)
+        return self._cells[index]
+
+    def views(self):
+        """
+        :return: list of ``(cell index, Cells)`` for the cells made so far, sorted by cell index.
+        """
+        return sorted(self._cells.items())
+
+    def occupied(self):
+        """
+        :return: list of ``(cell index, Cells)`` for the cells that hold animals, sorted by cell index.
+        """
+        return [(index, self.cell(index)) for index in sorted(self.active)]
+
+    def __getitem__(self, coord):
+        if coord not in self:
+            raise KeyError(coord)
+        return self.cell(self.index(coord))
+
+    def __contains__(self, coord):
+        return len(coord) == 2 and 1 <= coord[0] <= self.shape[0] and 1 <= coord[1] <= self.shape[1]
+
+    def __iter__(self):
+        for y in range(1, self.shape[0] + 1):
+            for x in range(1, self.shape[1] + 1):
+                yield y, x
+
+    def __len__(self):
+        return self.type.size
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        return (self[coord] for coord in self)
+
+    def items(self):
+        return ((coord, self[coord]) for coord in self)
+
+    @property
+    def food(self):
+        """The food left in every cell, with the food that has grown back since the cell was last used."""
+        stale = self.stamp < self.year
+        self._food[stale] = self.f_max[stale]
+        self.stamp[stale] = self.year
+        return self._food
+
+    def food_at(self, at: tuple):
+        """
+        :param tuple[int,int] at: row and column of the cell in the arrays.
+        :return: the food left in the cell.
+        """
+        if self.stamp[at] < self.year:
+            self._food[at] = self.f_max[at]
+            self.stamp[at] = self.year
+        return self._food[at]
+
+    def set_food(self, at: tuple, food: float):
+        """
+        :param tuple[int,int] at: row and column of the cell in the arrays.
+        :param float food: the food left in the cell.
+        """
+        self._food[at] = food
+        self.stamp[at] = self.year
+
+    def set_f_max(self, cell_type: int, f_max: float):
+        """
+        Sets the maximum food of every cell of a type. The food already in the cells is not changed.
+
+
+        :param int cell_type: the cell type.
+        :param float f_max: the new maximum food.
+        """
+        self.food  # The food that has grown back is of the old ``f_max``. #
+        self.f_max[self.type == cell_type] = float(f_max)
+
+    def reset_food(self):
+        """
+        The food of every cell grows back. This only starts a new ``year``, a cell gets its food back the next
+        time it is used.
+        """
+        self.year += 1
+
+    def tally(self, species: str, at: tuple, n: int):
+        """
+        Adds ``n`` animals of a species to the counts of a cell, ``n`` is negative when animals leave or die.
+
+
+        :param str species: name of the species.
+        :param tuple[int,int] at: row and column of the cell in the arrays.
+        :param int n: number of animals.
+        """
+        if species in self.species_id:
+            self.counts[(self.species_id[species],) + at] += n
+            # Every cell has its own counts, but the totals are shared by the threads. #
+            with self._lock:
+                self.totals[self.species_id[species]] += n
+            self.occupancy[at] += n
+            index = at[0] * self.shape[1] + at[1]
+            self.touched.add(index)
+            if self.occupancy[at] > 0:
+                self.active.add(index)
+            else:
+                self.active.discard(index)
+                # An empty cell is not aged, so what it recorded is taken away here. #
+                if index in self._cells:
+                    cell = self._cells[index]
+                    for name in list(cell.bins):
+                        cell.record(name, [], [], [])
+
+    def cut(self, first: int, last: int):
+        """
+        Takes the animals of the rows ``first`` to ``last`` (not included) out of the grid, e.g. to hand them
+        to another process. Only plain data is handed out, not the ``Cells``, which refer to the whole grid.
+
+
+        :param int first: first row, from 0.
+        :param int last: the row after the last row.
+        :return: dictionary with the ``year``, the ``food`` of the rows and the animals (``Cells.default``) of
+            every cell made in the rows.
+        """
+        cells = {index: cell.default for index, cell in self._cells.items()
+                 if first <= index // self.shape[1] < last}
+        for index in cells:
+            del self._cells[index]
+        part = {"year": self.year, "food": self.food[first:last].copy(), "cells": cells}
+        self.count()
+        return part
+
+    def paste(self, first: int, part: dict):
+        """
+        Puts the animals of ``cut`` back, into the rows from ``first``.
+
+
+        :param int first: first row, from 0.
+        :param dict part: the result of ``cut``.
+        """
+        self.year = part["year"]
+        self.food[first:first + len(part["food"])] = part["food"]
+        for index, default in part["cells"].items():
+            self.cell(index).default = default
+        self.count()
+
+    def count(self):
+        """
+        Counts the animals of every cell that has been made.
+        """
+        self.counts[...] = 0
+        self.sums[...] = 0
+        for key in self.bins:
+            self.bins[key][...] = 0
+        for _, cell in self._cells.items():
+            cell.bins = dict()
+            cell.count()
+        self.add_up()
+
+    def add_up(self):
+        """
+        Adds ``counts`` up to ``totals``, ``occupancy`` and ``active``, after ``counts`` was set at once.
+        """
+        self.totals[...] = self.counts.reshape(len(self.names), -1).sum(axis=1)
+        self.occupancy[...] = self.counts.sum(axis=0)
+        self.active = set(np.flatnonzero(self.occupancy).tolist())
+
 
 class Cells:
     """
     The ``Cells`` class keeps track of information of the cells on the island.
+
+    ``type``, ``f_max`` and ``food`` are read from and written to the ``Grid`` of the cell, ``default``
+    keeps the animals of the cell. ``count_age``, ``count_weight`` and ``count_fitness`` are recorded by
+    ``logic.season_ageing`` for the animals that survived the year, and ``bins`` has their counts per bin of
+    ``Grid.edges``, per species.
     """
     default_food = {
         0: 0,
@@ -15,23 +330,83 @@ class Cells:
         3: 800
     }
 
-    def __init__(self, cell_type: int, coord=None, names: list = None):
+    def __init__(self, cell_type: int, coord=None, names: list = None, grid: Grid = None):
         """
         :param int cell_type: Describes the cell type as an integer.
         :param list/None coord: Tells the cell where it is on the map. The default value is ``[0,0]``.
         :param list[str] names: ``names`` contain the names of all species on the island.
+        :param Grid grid: the island of the cell, by default a ``Grid`` of only this cell.
         """
         self.coord = coord if coord is not None else [0, 0]
-        self.count_species = dict() if not names else {species: 0 for species in names}
-        self.count_age = {species: [] for species in names}
-        self.count_weight = {species: [] for species in names}
-        self.count_fitness = {species: [] for species in names}
-        self.type = cell_type
-        self.f_max = float(Cells.default_food[self.type])
-        self.food = self.f_max
+        if grid is None:
+            grid = Grid([[cell_type]], names)
+            grid._cells[0] = self
+            self._at = (0, 0)
+        else:
+            self._at = (self.coord[0] - 1, self.coord[1] - 1)
+        self.grid = grid
+        self.count_age = {species: [] for species in grid.names}
+        self.count_weight = {species: [] for species in grid.names}
+        self.count_fitness = {species: [] for species in grid.names}
+        self.bins = dict()
         self.default = dict()
         self.migrate = dict()
 
+    @property
+    def type(self):
+        return int(self.grid.type[self._at])
+
+    @property
+    def f_max(self):
+        return float(self.grid.f_max[self._at])
+
+    @f_max.setter
+    def f_max(self, value):
+        self.grid.f_max[self._at] = value
+
+    @property
+    def food(self):
+        return float(self.grid.food_at(self._at))
+
+    @food.setter
+    def food(self, value):
+        self.grid.set_food(self._at, value)
+
+    @property
+    def stripe(self):
+        """The row of the cell in its ``Grid``, see ``streams.Streams.stripes``."""
+        return self._at[0]
+
+    @property
+    def count_species(self):
+        """Number of animals per species in the cell."""
+        return {species: int(self.grid.counts[(i,) + self._at]) for i, species in enumerate(self.grid.names)}
+
+    def tally(self, species: str, n: int):
+        """
+        Adds ``n`` animals of a species to the counts of the cell, see ``Grid.tally``.
+
+
+        :param str species: name of the species.
+        :param int n: number of animals.
+        """
+        self.grid.tally(species, self._at, n)
+
+    def record(self, species: str, ages, weights, fitness):
+        """
+        Keeps the age, weight and fitness of the animals of a species for ``BioSim.get_data``.
+
+
+        :param str species: name of the species.
+        :param ages: ages of the animals.
+        :param weights: weights of the animals.
+        :param fitness: fitness of the animals.
+        """
+        self.count_age[species] = ages
+        self.count_weight[species] = weights
+        self.count_fitness[species] = fitness
+        self.grid.record(self, species, (ages, weights, fitness))
+
     def migration(self, illegal_moves):
         """
         Animals in the cell get the opportunity to move to
@@ -43,35 +418,29 @@ class Cells:
         # We tell the animal to move to a reasonable spot#
         for species in self.default:
             for animals in self.default[species]:
-                animals.var["coord"] = list(self.coord)
+                animals.coord = list(self.coord)
                 animals.move(illegal_moves)
         # Now we check if it moves, if it does we move it, else ignore it.#
         for species in self.default:
-            len_animal = len(self.default[species])
-            for _ in range(len_animal):
-                animals = self.default[species].pop(0)
-                if tuple(animals.var["coord"]) != tuple(self.coord):
-                    if species in self.migrate:
-                        self.migrate[species].append(animals)
-                    else:
-                        self.migrate[species] = [animals]
+            staying = []
+            for animals in self.default[species]:
+                if tuple(animals.coord) != tuple(self.coord):
+                    self.migrate.setdefault(species, []).append(animals)
                 else:
-                    self.default[species].insert(-1, animals)
+                    staying.append(animals)
+            self.default[species] = staying
 
     def count(self):
         """
-        Counts the number of animals in the cell per species.
+        Counts the number of animals in the cell per species, by going through every animal.
         """
-        self.count_age = {species: [] for species in self.count_age}
-        self.count_weight = {species: [] for species in self.count_weight}
-        self.count_fitness = {species: [] for species in self.count_fitness}
         for species in self.default:
-            self.count_species[species] = len(self.default[species])
-            if len(self.default[species]) != 0:
-                for animals in self.default[species]:
-                    self.count_age[species].append(animals.var["a"])
-                    self.count_weight[species].append(animals.var["w"])
-                    self.count_fitness[species].append(animals.var["phi"])
+            if species in self.grid.species_id:
+                self.grid.counts[(self.grid.species_id[species],) + self._at] = len(self.default[species])
+        for species in self.count_age:
+            herd = self.default.get(species, [])
+            self.record(species, [animals.a for animals in herd], [animals.w for animals in herd],
+                        [animals.phi for animals in herd])
 
 
 if __name__ == '__main__':
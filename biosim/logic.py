@@ -7,8 +7,46 @@ functioning logic of the island simulation
 __author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
 __email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
 
-from .island import Cells
+from concurrent.futures import ThreadPoolExecutor
+
+from .island import Grid, Cells
 from .animal import *
+from .grazing import intake
+from .migration import directions
+from .predation import Herd, random_block
+from .streams import Streams, GRAZING, HUNTING, BREEDING, MIGRATION, AGEING
+
+
+def season_grazing(cells: list, rng=None):
+    """
+    ``season_grazing`` lets the ``Herbivore`` of every cell in ``cells`` eat off their cell, in random order.
+    What each herbivore eats is found for all the cells at once with ``grazing.intake``, and the herbivores
+    that got to eat have their fitness re-evaluated together.
+
+    :param list cells: list of Cells objects.
+    :param rng: random number generator, or function that gives the generator of a stripe (see
+        ``streams.Streams.stripes``), by default seeded from ``random``.
+    """
+    stripe = _stripes(rng)
+    herd, food, start, grazed = [], [], [], []
+    for cell in cells:
+        if "Herbivore" in cell.default and len(cell.default["Herbivore"]) != 0:
+            stripe(cell.stripe).shuffle(cell.default["Herbivore"])
+            start.append(len(herd))
+            herd.extend(cell.default["Herbivore"])
+            food.append(max(cell.food, 0))
+            grazed.append(cell)
+    if not herd:
+        return
+    eaten, ate = intake(food, [H.lookup["F"] for H in herd], start)
+    fed = []
+    for animals, f_got, got_food in zip(herd, eaten.tolist(), ate.tolist()):
+        if got_food:
+            animals.w += animals.lookup["beta"] * f_got
+            fed.append(animals)
+    animal.refit(fed)
+    for cell, f_eaten in zip(grazed, np.add.reduceat(eaten, start).tolist()):
+        cell.food = max(float(cell.food - f_eaten), 0.)
 
 
 def season_feeding(cell: Cells):
@@ -18,142 +56,339 @@ def season_feeding(cell: Cells):
 
     :param Cells cell: The cell of the island.
     """
+    season_grazing([cell])
+    season_hunting(cell)
+
+
+def season_hunting(cell: Cells, draw=None):
+    """
+    ``season_hunting`` is the rest of ``season_feeding`` after the ``Herbivore`` has eaten. Every predator
+    of the cell hunts the same ``Herd``, the dead herbivores are removed once at the end. Other species eat
+    off the cell.
+
+    :param Cells cell: The cell of the island.
+    :param draw: function that returns a random number in ``[0, 1)``, by default ``random.random``.
+    """
+    draw = draw if draw is not None else ran.random
     except_list = ["Herbivore", "Carnivore"]
     herb_test = "Herbivore" in cell.default and len(cell.default["Herbivore"]) != 0
     carn_test = "Carnivore" in cell.default and len(cell.default["Carnivore"]) != 0
 
-    # assumes single cell given, otherwise put in loop
+    others = [A for A in cell.default if A not in except_list]
     if herb_test:
-        ran.shuffle(cell.default["Herbivore"])
-        for animals in cell.default["Herbivore"]:
-            if cell.food > 0:
-                animals.eat(cell)
-            else:
-                cell.food = 0
-                break
-    if carn_test and herb_test:
-        # We need to sort the list so the fittest goes first. #
-        cell.default["Carnivore"].sort(key=lambda o: o.var["phi"], reverse=True)
-        for animals in cell.default["Carnivore"]:
-            if all(not H.var["life"] for H in cell.default["Herbivore"]):
-                break  # Time saver, but `predator` object can distinguish between dead animal and an alive one.
+        predators = []
+        if carn_test:
+            # We need to sort the list so the fittest goes first. #
+            cell.default["Carnivore"].sort(key=lambda o: o.phi, reverse=True)
+            predators.extend(cell.default["Carnivore"])
+        predators.extend(A for species in others for A in cell.default[species] if isinstance(A, Carnivore))
+        if predators:
+            # The herd is sorted once, and every predator hunts the same herd. #
+            herb_herd = cell.default["Herbivore"]
+            herd = Herd([H.phi for H in herb_herd], [H.w for H in herb_herd])
+            for animals in predators:
+                if not herd.n_alive:
+                    break
+                animals.hunt(herd, draw)
+            for n in herd.dead():
+                herb_herd[n].life = False
             # replace original list with new list with not dead animals#
-            animals.eat(cell)
+            cell.default["Herbivore"] = herd.survivors(herb_herd)
+            cell.tally("Herbivore", len(cell.default["Herbivore"]) - len(herb_herd))
     # Resets the food in the cell since we are done for the year. If 
     # feeding season happens multiple times per year, or irregularly
     # , it must either be done at the last iteration of feeding, or
     # create a 'end of the year' season that handles anything that must
     # be reset at the end of the year. #
-    for species in [A for A in cell.default if A not in except_list]:
+    for species in others:
         for animals in cell.default[species]:
-            animals.eat(cell)
+            if not isinstance(animals, Carnivore):
+                animals.eat(cell)
 
 
-def season_breeding(cell: Cells):
+def _generator(rng=None):
+    """
+    The random number generator of a season. Without ``rng`` a generator is seeded from ``random``, so
+    ``random.seed`` (and the seed of ``BioSim``) still decides the outcome.
+
+
+    :param numpy.random.Generator rng: random number generator, or None.
+    :return: numpy.random.Generator
+    """
+    return rng if rng is not None else np.random.default_rng(ran.getrandbits(64))
+
+
+def _stripes(rng=None):
+    """
+    The random number generators of the stripes of a season. A single generator is used for every stripe.
+
+
+    :param rng: random number generator, function that gives the generator of a stripe, or None.
+    :return: function that gives the ``numpy.random.Generator`` of a stripe.
+    """
+    if callable(rng):
+        return rng
+    rng = _generator(rng)
+    return lambda row: rng
+
+
+def season_breeding(cell: Cells, rng=None):
     """
     ``season_breeding`` goes through all of the species in the cell and tells them to give birth.
+    All the animals of a species are done at once, the same way as ``animal.birth`` does one animal.
 
     :param Cells cell: Cells object.
+    :param numpy.random.Generator rng: random number generator, by default seeded from ``random``.
     """
-
+    rng = _generator(rng)
     for species in cell.default:
-        new_born = []
+        herd = cell.default[species]
         # Since we are going do this multiple times, we're going
         # to just calculate the length once. #
-        len_species = len(cell.default[species])
-        for animals in cell.default[species]:
-            new_born.append(animals.birth(len_species))
-        new_born = [n for n in new_born if n is not None]  # N1
-        cell.default[species].extend(new_born)
+        len_species = len(herd)
+        if not len_species:
+            continue
+        animal.refit(herd)
+        p = animal.parameters(herd, ("zeta", "w_birth", "sigma_birth", "gamma", "xi"))
+        w = np.array([A.w for A in herd], dtype=float)
+        test_w = w >= p["zeta"] * (p["w_birth"] + p["sigma_birth"])
+        test_chance = rng.random(len_species) < np.minimum(1, np.array([A.phi for A in herd]) * p["gamma"] *
+                                                           (len_species - 1))
+        mothers = np.flatnonzero(test_w & test_chance)
+        if not len(mothers):
+            continue
+        p = {key: np.broadcast_to(value, len_species)[mothers] for key, value in p.items()}
+        w_child = rng.normal(p["w_birth"], p["sigma_birth"])
+        gives_birth = w[mothers] > p["xi"] * w_child
+        mothers = [herd[n] for n in mothers[gives_birth].tolist()]
+        new_born = []
+        for mother, w_new_born, w_loss in zip(mothers, w_child[gives_birth].tolist(),
+                                              (p["xi"] * w_child)[gives_birth].tolist()):
+            mother.w -= w_loss
+            new_born.append(type(mother)(a=0, w=w_new_born, params=mother.params))
+        animal.refit(mothers)
+        herd.extend(new_born)
+        cell.tally(species, len(new_born))
 
 
-def season_migration(cells: dict, illegal_moves: list):
+def season_migration(cells: Grid, illegal_moves: list, rng=None):
     """
     Animals moves to desired location if possible, else they don't move from cell and remain in ´´Cells.default´´.
 
+    Every animal on the island draws if it moves and where to at once, and the destination is looked up in
+    the neighbour table of the map. The animals that move are added to their new cell after every cell has
+    been gone through, so no animal moves twice. The animals of a stripe draw from the generator of the stripe.
 
-    :param Cells cells: dictionary with coordinates as key, and Cells objects as value
-    :param illegal_moves: list with coordinates values which animals can't move to
 
-    .. note::
-        N1: we pre-calculate the length since we manipulate the lists
-        N2: This is strictly not necessary, but if it happens; There is a bug somewhere.
-        N3: Just a safety precaution. Better safe than sorry.
+    :param Grid cells: the island.
+    :param illegal_moves: list with coordinates values which animals can't move to, the ``Grid`` already knows
+        where the water is.
+    :param rng: random number generator, or function that gives the generator of a stripe (see
+        ``streams.Streams.stripes``), by default seeded from ``random``.
     """
-    moving_animals = dict()
-    for cell in cells:
-        cells[cell].migration(illegal_moves)
-        mig_len = {species: len(cells[cell].migrate[species]) for species in cells[cell].migrate}  # N1
-        mig_n = 0
-        for species in cells[cell].migrate:
-            while mig_n < mig_len[species]:
-                try:
-                    moving_animal = cells[cell].migrate[species].pop(0)
-                except IndexError:  # N2
-                    raise ValueError(
-                        "IndexError in logic::season_migration::cells[cell].migrate, length of array changed.")
-                # if this is a new species, we will remember it in the future.#
-                if species not in moving_animals:
-                    moving_animals[species] = dict()
-
-                if tuple(moving_animal.var["coord"]) not in moving_animals[species]:
-                    moving_animals[species][tuple(moving_animal.var["coord"])] = [moving_animal]
-                else:
-                    moving_animals[species][tuple(moving_animal.var["coord"])].append(moving_animal)
-                mig_n += 1
-            mig_n = 0
-    for species in moving_animals:
-        for coord in moving_animals[species]:
-            if species not in cells[coord].default:
-                cells[coord].default[species] = moving_animals[species][coord]
+    arrivals(cells, departures(cells, cells.occupied(), _stripes(rng)))
+
+
+def departures(cells: Grid, occupied: list, stripe):
+    """
+    The first half of ``season_migration``: the animals of ``occupied`` that move are taken out of their cell.
+
+
+    :param Grid cells: the island.
+    :param list occupied: ``(cell index, Cells)`` of the cells to go through, sorted by cell index.
+    :param stripe: function that gives the random number generator of a stripe.
+    :return: dictionary with the moving animals per ``(cell index they move to, species)``, in the order of
+        the cells they come from.
+    """
+    table = cells.neighbours
+    herds, start, chance = [], [0], []
+    for index, cell in occupied:
+        for species in cell.default:
+            herd = cell.default[species]
+            if herd:
+                herds.append((index, species))
+                start.append(start[-1] + len(herd))
+                chance.append(animal.parameters(herd, ("mu",))["mu"] * np.array([A.phi for A in herd]))
+    if not herds:
+        return dict()
+    chance = np.concatenate(chance)
+    origin = np.repeat([index for index, _ in herds], np.diff(start))
+    direction, draw = np.empty(len(chance), dtype=np.int64), np.empty(len(chance))
+    rows = origin // cells.shape[1]
+    bounds = [0] + (np.flatnonzero(np.diff(rows)) + 1).tolist() + [len(rows)]
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        rng = stripe(int(rows[first]))
+        direction[first:last] = rng.integers(0, len(directions), size=last - first)
+        draw[first:last] = rng.random(last - first)
+    target = table[origin, direction]
+    moving = (draw < chance) & (target != origin)
+
+    leaving = dict()
+    for (index, species), first, last in zip(herds, start[:-1], start[1:]):
+        if not moving[first:last].any():
+            continue
+        herd = cells.cell(index).default[species]
+        staying = []
+        for animals, moves, to in zip(herd, moving[first:last].tolist(), target[first:last].tolist()):
+            if moves:
+                leaving.setdefault((to, species), []).append(animals)
             else:
-                cells[coord].default[species].extend(moving_animals[species][coord])
-            moving_animals[species][coord] = list()  # N3
+                staying.append(animals)
+        cells.cell(index).default[species] = staying
+        cells.cell(index).tally(species, len(staying) - len(herd))
+    return leaving
 
 
-def season_ageing(cell: Cells):
+def arrivals(cells: Grid, arriving: dict):
+    """
+    The second half of ``season_migration``: the moving animals are added to their new cell.
+
+
+    :param Grid cells: the island.
+    :param dict arriving: the moving animals, see ``departures``.
+    """
+    for (to, species), animals in arriving.items():
+        arrive = cells.cell(to)
+        for A in animals:
+            A.coord = list(arrive.coord)
+        arrive.default.setdefault(species, []).extend(animals)
+        arrive.tally(species, len(animals))
+
+
+def season_ageing(cell: Cells, rng=None):
     """
     ´´season_ageing´´ goes through all of the species and tells them to get old.
+    All the animals of a species are done at once, the same way as ``age``, ``loss_weight`` and ``death``
+    does one animal. The age, weight and fitness of the survivors are recorded in the cell (``Cells.record``),
+    so the statistics need no second pass over the animals.
 
     :param Cells cell: Cells object.
+    :param numpy.random.Generator rng: random number generator, by default seeded from ``random``.
     """
-
+    rng = _generator(rng)
     for species in cell.default:
-        for animals in cell.default[species]:
-            animals.age()
-            animals.loss_weight()
-            animals.death()
-        cell.default[species] = [animals for animals in cell.default[species] if animals.var["life"]]
+        herd = cell.default[species]
+        if not herd:
+            cell.record(species, [], [], [])
+            continue
+        p = animal.parameters(herd, ("eta", "omega"))
+        a = np.array([A.a for A in herd]) + 1
+        w = np.array([A.w for A in herd], dtype=float)
+        w -= p["eta"] * w
+        phi = np.array([A.phi for A in herd])
+        # Like ``animal.death`` the fitness is not re-evaluated after losing weight. #
+        death = (w <= 0) | (rng.random(len(herd)) < p["omega"] * (1 - phi))
+        for animals, w_new, dead in zip(herd, w.tolist(), death.tolist()):
+            animals.a += 1
+            animals.w = w_new
+            animals.dirty = True
+            if dead:
+                animals.life = False
+        cell.default[species] = [animals for animals in herd if animals.life]
+        cell.tally(species, len(cell.default[species]) - len(herd))
+        cell.record(species, a[~death], w[~death], phi[~death])
+
+
+def season_end(island: Grid):
+    """
+    Does 'end of season' procedure. Anything that needs manual wrap-up get done here.
 
 
-def season_end(island: dict):
+    :param Grid island: the entire island.
     """
-    Does 'end of season' procedure. Anything that needs manual wrap-up get done here.
+    island.reset_food()
 
 
-    :param island: the entire island.
+def _batches(occupied: list, n: int):
     """
-    for coord in island:
-        island[coord].food = float(island[coord].f_max)
-        island[coord].count()
+    Splits the occupied cells in up to ``n`` batches of whole stripes, with about as many cells each.
 
 
-def year_cycle(island, illegal_coords):
+    :param list occupied: ``(cell index, Cells)`` of the cells, sorted by cell index.
+    :param int n: number of batches.
+    :return: list of batches, each like ``occupied``.
     """
-    Simulates an entire year on the island.
+    batches, size = [[]], len(occupied) / n
+    for index, cell in occupied:
+        if len(batches[-1]) >= size and cell.stripe != batches[-1][-1][1].stripe:
+            batches.append([])
+        batches[-1].append((index, cell))
+    return batches
 
 
-    :param island: The map of the island.
-    :param illegal_coords: Every coordinates that an animal can't walk on.
+def _in_threads(season, occupied: list, streams: Streams, year: int, threads: int, pool):
+    """
+    Does ``season`` for batches of whole stripes in the ``ThreadPoolExecutor`` ``pool`` of ``threads`` threads.
     """
+    # ``list`` waits for every batch, and raises what a batch raised. #
+    list(pool.map(lambda batch: season(batch, streams, year), _batches(occupied, 4 * threads)))
 
-    for c in island:
-        season_feeding(island[c])
-        season_breeding(island[c])
 
-    season_migration(island, illegal_coords)
+def year_cycle(island: Grid, illegal_coords, rng=None, year: int = 0, threads: int = 0, pool=None):
+    """
+    Simulates an entire year on the island. The seasons only go through the cells that hold animals
+    (``Grid.occupied``), so empty land and water costs nothing.
+
+    Every season of every stripe (row of the map) draws from its own stream of ``rng`` (see
+    ``streams.Streams``), so the outcome of a stripe does not depend on the order the stripes are done in.
+    With ``threads`` the seasons before and after the migration are done for batches of stripes in threads,
+    with the same outcome. The migration waits for every batch, and is done in this thread.
+
 
-    for c in island:
-        season_ageing(island[c])
+    :param Grid island: The map of the island.
+    :param illegal_coords: Every coordinates that an animal can't walk on.
+    :param rng: ``streams.Streams`` of the simulation. A ``numpy.random.Generator``, or None to seed from
+        ``random``, gives the seed of the streams.
+    :param int year: the year, key of the streams.
+    :param int threads: number of threads, 0 to do every cell in this thread.
+    :param pool: a ``ThreadPoolExecutor`` of ``threads`` threads, owned by the caller (see
+        ``BioSim.simulate``). Without it, a pool is made for this year and shut down at the end of it.
+    """
+    streams = rng if isinstance(rng, Streams) else Streams(int(_generator(rng).integers(2 ** 63)))
+    if threads and pool is None:
+        with ThreadPoolExecutor(threads) as pool:
+            return year_cycle(island, illegal_coords, streams, year, threads, pool)
+
+    if threads:
+        _in_threads(year_start, island.occupied(), streams, year, threads, pool)
+    else:
+        year_start(island.occupied(), streams, year)
+    season_migration(island, illegal_coords, streams.stripes(year, MIGRATION))
+    if threads:
+        _in_threads(year_finish, island.occupied(), streams, year, threads, pool)
+    else:
+        year_finish(island.occupied(), streams, year)
 
     season_end(island=island)
+
+
+def year_start(occupied: list, streams: Streams, year: int):
+    """
+    The seasons before the migration, feeding and breeding, of some cells. Each cell only needs itself.
+
+
+    :param list occupied: ``(cell index, Cells)`` of the cells, sorted by cell index.
+    :param Streams streams: the random number streams.
+    :param int year: the year, key of the streams.
+    """
+    season_grazing([cell for _, cell in occupied], streams.stripes(year, GRAZING))
+    hunting, breeding, draws = streams.stripes(year, HUNTING), streams.stripes(year, BREEDING), dict()
+    for _, cell in occupied:
+        if cell.stripe not in draws:
+            draws[cell.stripe] = random_block(hunting(cell.stripe)).__next__
+        season_hunting(cell, draws[cell.stripe])
+        season_breeding(cell, breeding(cell.stripe))
+
+
+def year_finish(occupied: list, streams: Streams, year: int):
+    """
+    The seasons after the migration, ageing, of some cells.
+
+
+    :param list occupied: ``(cell index, Cells)`` of the cells, sorted by cell index.
+    :param Streams streams: the random number streams.
+    :param int year: the year, key of the streams.
+    """
+    ageing = streams.stripes(year, AGEING)
+    for _, cell in occupied:
+        season_ageing(cell, ageing(cell.stripe))
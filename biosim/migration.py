@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+"""
+Where the animals can migrate to. This file contains:
+    - function: neighbour_table
+
+The neighbour table is made once per map, so a move is looked up instead of checked against the water.
+"""
+
+__author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
+__email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
+
+import numpy as np
+
+# Same order as ``animal.ret_moves``: 'N', 'S', 'W', 'E', as steps in (y, x). #
+directions = ((1, 0), (-1, 0), (0, -1), (0, 1))
+
+
+def neighbour_table(legal):
+    """
+    Finds where an animal ends up when it tries to move from a cell in each direction. A move into water,
+    or off the map, is ignored, so the animal ends up in the cell it came from.
+
+
+    :param legal: 2-D boolean array with the shape of the map, True where animals can walk.
+    :return: integer array with one row per cell index (``(y - 1) * x_length + x - 1``) and one column per
+        direction, the cell index the animal ends up in.
+    """
+    legal = np.asarray(legal, dtype=bool)
+    y_length, x_length = legal.shape
+    cells = np.arange(legal.size)
+    y, x = np.divmod(cells, x_length)
+    table = np.empty((legal.size, len(directions)), dtype=np.int64)
+    for d, (dy, dx) in enumerate(directions):
+        to_y, to_x = y + dy, x + dx
+        inside = (to_y >= 0) & (to_y < y_length) & (to_x >= 0) & (to_x < x_length)
+        target = np.where(inside, to_y * x_length + to_x, cells)
+        table[:, d] = np.where(legal.ravel()[target], target, cells)
+    return table
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""
+Makes a movie of the frames of a run while they are drawn. This file contains:
+    - class: MovieWriter
+    - function: frames
+    - function: encode
+
+The frames are sent as raw RGB pixels to the standard input of an ``ffmpeg`` process, so no image file is
+written and read again. Without ``ffmpeg`` the pixels are added to a raw frame archive, ``<file>.rgb``, with
+the size, frame rate and number of frames in ``<file>.rgb.json``. The archive can be made into a movie later
+with ``encode``, where ``ffmpeg`` is installed.
+"""
+
+__author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
+__email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
+
+import json
+import os
+import shutil
+import subprocess
+
+import numpy as np
+
+formats = {"mp4": ['-profile:v', 'baseline', '-level', '3.0', '-pix_fmt', 'yuv420p'],
+           "gif": ['-loop', '0']}
+
+
+def _command(encoder: str, size: tuple, fps: int, source: str, file: str):
+    """
+    :return: the ``ffmpeg`` command that makes ``file`` of raw RGB frames of ``size = (height, width)`` read
+        from ``source`` (``'-'`` for the standard input).
+    """
+    movie_fmt = os.path.splitext(file)[1][1:]
+    return [encoder, '-loglevel', 'error', '-y', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+            '-s', '{}x{}'.format(size[1], size[0]), '-framerate', str(fps), '-i', source] + \
+        formats[movie_fmt] + [file]
+
+
+class MovieWriter:
+    """
+    The ``MovieWriter`` class makes a movie of the frames ``BioSim.simulate`` would save as images::
+
+        with MovieWriter("run.mp4") as movie:
+            sim.simulate(1000, vis_years=1, movie=movie)
+
+    :param str file: path of the movie, ending with ``.mp4`` or ``.gif``.
+    :param int fps: frames per second.
+    :param str encoder: the ``ffmpeg`` program, by default the one on the ``PATH``. With ``None``, or if there is
+        none, the frames are written to the archive ``<file>.rgb``.
+    """
+
+    def __init__(self, file: str, fps: int = 12, encoder: str = "ffmpeg"):
+        if os.path.splitext(file)[1][1:] not in formats:
+            raise ValueError('Unknown movie format: ' + file)
+        self.file = file
+        self.fps = fps
+        self.encoder = shutil.which(encoder) if encoder is not None else None
+        self.archive = None if self.encoder else file + ".rgb"
+        self.size = None
+        self.n = 0
+        self._out = None
+        self._process = None
+
+    def write(self, frame):
+        """
+        Adds a frame to the movie, the encoder is started at the first one.
+
+
+        :param frame: the pixels as an array (y, x, RGB or RGBA) of ``uint8``, e.g. ``Visualization.frame()``.
+        """
+        frame = np.asarray(frame)
+        if self.size is None:
+            self.size = frame.shape[:2]
+            if self.encoder:
+                self._process = subprocess.Popen(_command(self.encoder, self.size, self.fps, '-', self.file),
+                                                 stdin=subprocess.PIPE)
+                self._out = self._process.stdin
+            else:
+                self._out = open(self.archive, "wb")
+        elif frame.shape[:2] != self.size:
+            raise ValueError("Got a frame of {}; the movie has frames of {}".format(frame.shape[:2], self.size))
+        try:
+            self._out.write(np.ascontiguousarray(frame[:, :, :3]).data)
+        except BrokenPipeError:
+            self.close()
+            raise ValueError('RuntimeError: ERROR: ffmpeg stopped reading frames')
+        self.n += 1
+
+    def close(self):
+        """
+        Ends the movie, or writes the header of the archive.
+        """
+        if self._out is None:
+            return
+        try:
+            self._out.close()
+        except BrokenPipeError:
+            pass
+        self._out = None
+        if self._process is not None:
+            if self._process.wait():
+                raise ValueError('RuntimeError: ERROR: ffmpeg failed with: {}'.format(self._process.returncode))
+        else:
+            with open(self.archive + ".json", "w") as header:
+                json.dump({"height": self.size[0], "width": self.size[1], "fps": self.fps, "frames": self.n,
+                           "pix_fmt": "rgb24", "movie": self.file}, header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def frames(archive: str):
+    """
+    :param str archive: a raw frame archive of ``MovieWriter``.
+    :return: the frames, as a memory-mapped array (frame, y, x, RGB) of ``uint8``.
+    """
+    with open(archive + ".json") as file:
+        header = json.load(file)
+    return np.memmap(archive, dtype=np.uint8, mode="r",
+                     shape=(header["frames"], header["height"], header["width"], 3))
+
+
+def encode(archive: str, file: str = None, encoder: str = "ffmpeg"):
+    """
+    Makes the movie of a raw frame archive of ``MovieWriter``.
+
+
+    :param str archive: the archive.
+    :param str file: path of the movie, by default the one the archive was made for.
+    :param str encoder: the ``ffmpeg`` program.
+    :return: the path of the movie.
+    """
+    with open(archive + ".json") as header:
+        header = json.load(header)
+    file = file or header["movie"]
+    if os.path.splitext(file)[1][1:] not in formats:
+        raise ValueError('Unknown movie format: ' + file)
+    try:
+        subprocess.check_call(_command(encoder, (header["height"], header["width"]), header["fps"], archive,
+                                       file))
+    except (subprocess.CalledProcessError, OSError) as err:
+        raise ValueError('RuntimeError: ERROR: ffmpeg failed with: {}'.format(err))
+    return file
+
+
+if __name__ == '__main__':
+    pass
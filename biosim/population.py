@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+"""
+Column based storage of the animals on the island. This file contains:
+    - class: Population
+    - function: parameter_table
+    - function: bin_edges
+    - function: bin_counts
+
+``hist_defaults`` are the histograms shown when ``hist_specs`` of ``BioSim`` does not give them.
+"""
+
+__author__ = 'Mats Hoem Olsen, Roy Erling Granheim'
+__email__ = 'mats.hoem.olsen@nmbu.no, roy.erling.granheim@nmbu.no'
+
+import numpy as np
+
+hist_defaults = {"weight": {"max": 60, "delta": 2}, "fitness": {"max": 1.0, "delta": 0.05},
+                 "age": {"max": 60, "delta": 2}}
+
+
+class Population:
+    """
+    ``Population`` keeps every animal of the island as one row in a set of NumPy columns instead of
+    one ``animal`` object per animal. The columns are:
+        - ``species``: species id, the position of the species name in ``names``.
+        - ``cell``: flat index of the cell the animal stands in, ``(y - 1) * x_length + (x - 1)``.
+        - ``age``: age of the animal.
+        - ``weight``: weight of the animal.
+        - ``fitness``: last evaluated fitness of the animal.
+        - ``alive``: ``False`` for animals that died during the current season.
+
+    Dead animals are only flagged during a season and are removed by ``compact`` once the season is done.
+    ``totals`` is the number of animals per species, kept up to date by ``append`` and ``keep``.
+
+    :param list[str] names: names of the species, the position of a name is its species id.
+    """
+    columns = {
+        "species": np.int8,
+        "cell": np.int64,
+        "age": np.int64,
+        "weight": np.float64,
+        "fitness": np.float64,
+        "alive": np.bool_
+    }
+
+    def __init__(self, names: list):
+        self.names = list(names)
+        for column, dtype in Population.columns.items():
+            setattr(self, column, np.empty(0, dtype=dtype))
+        self.totals = np.zeros(len(self.names), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.species)
+
+    def append(self, species, cell, age, weight, fitness):
+        """
+        Appends new animals to the end of the columns.
+
+
+        :param species: species id of the new animals.
+        :param cell: flat cell index of the new animals.
+        :param age: age of the new animals.
+        :param weight: weight of the new animals.
+        :param fitness: fitness of the new animals.
+        """
+        new = {"species": species, "cell": cell, "age": age, "weight": weight, "fitness": fitness}
+        n = len(np.atleast_1d(weight))
+        for column, dtype in Population.columns.items():
+            values = np.ones(n, dtype=dtype) if column == "alive" else \
+                np.broadcast_to(np.asarray(new[column], dtype=dtype), (n,))
+            setattr(self, column, np.concatenate((getattr(self, column), values)))
+        self.totals += np.bincount(self.species[len(self) - n:], minlength=len(self.names))
+
+    def keep(self, mask):
+        """
+        Keeps only the rows selected by ``mask``.
+
+
+        :param mask: boolean array or index array over the rows.
+        """
+        for column in Population.columns:
+            setattr(self, column, getattr(self, column)[mask])
+        self.totals = np.bincount(self.species, minlength=len(self.names))
+
+    def compact(self):
+        """
+        Removes every animal that is flagged as dead.
+        """
+        if not self.alive.all():
+            self.keep(self.alive)
+
+    def count(self, n_cells: int):
+        """
+        Counts the animals per species and cell.
+
+
+        :param int n_cells: number of cells on the island.
+        :return: array with shape ``(len(names), n_cells)``.
+        """
+        flat = self.species.astype(np.int64) * n_cells + self.cell
+        return np.bincount(flat, minlength=len(self.names) * n_cells).reshape(len(self.names), n_cells)
+
+    def count_species(self):
+        """
+        Counts the animals per species.
+
+
+        :return: dictionary with species name as key and number of animals as value.
+        """
+        return {species: int(self.totals[i]) for i, species in enumerate(self.names)}
+
+    def histogram(self, column: str, edges):
+        """
+        Counts the animals per species and bin of a column, see ``bin_counts``.
+
+
+        :param str column: ``"age"``, ``"weight"`` or ``"fitness"``.
+        :param edges: edges of the bins, see ``bin_edges``.
+        :return: array with shape ``(len(names), len(edges) - 1)``.
+        """
+        return bin_counts(getattr(self, column), self.species, len(self.names), edges)
+
+
+def parameter_table(names: list, values: dict):
+    """
+    Converts the parameter dictionaries of the species into one array per parameter, indexed by species id.
+    Parameters a species does not have are set to ``nan``.
+
+
+    :param list[str] names: names of the species, the position of a name is its species id.
+    :param dict values: species name as key and parameter dictionary as value.
+    :return: dictionary with parameter name as key and array as value.
+    """
+    keys = {key for species in names for key in values[species]}
+    return {key: np.array([float(values[species].get(key, np.nan)) for species in names]) for key in keys}
+
+
+def bin_edges(spec: dict):
+    """
+    :param dict spec: ``{"max": ..., "delta": ...}`` of a histogram, as in ``hist_specs``.
+    :return: the edges of the bins, from 0 to ``max``, ``delta`` apart.
+    """
+    return np.linspace(0, spec["max"], max(1, int(round(spec["max"] / spec["delta"]))) + 1)
+
+
+def bin_counts(values, group, n_groups: int, edges):
+    """
+    Counts the values per group and bin with one ``numpy.bincount``, the bins are those of ``numpy.histogram``.
+    Values above the last edge are counted in the last bin, values below the first in the first bin.
+
+
+    :param values: the values.
+    :param group: the group of every value, from 0.
+    :param int n_groups: number of groups.
+    :param edges: edges of the bins.
+    :return: array with shape ``(n_groups, len(edges) - 1)``.
+    """
+    bins = len(edges) - 1
+    at = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, bins - 1)
+    flat = np.asarray(group, dtype=np.int64) * bins + at
+    return np.bincount(flat, minlength=n_groups * bins).reshape(n_groups, bins)
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""
+Predation on the prey of a cell. This file contains:
+    - class: Herd
+    - function: random_block
+
+Both ``logic.py`` and ``array_logic.py`` use ``Herd``, so both engines hunt the same way.
+"""
+
+__author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
+__email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
+
+
+class Herd:
+    """
+    The prey of one cell during one feeding season. The prey is sorted from weakest to fittest once, and
+    every predator of the cell takes its turn on the same ``Herd``:
+        - The predator tries itself on the living prey, weakest first, like ``Carnivore.eat``.
+        - A predator can only kill prey that is less fit than itself, so the predator stops looking as
+          soon as the prey is as fit as itself.
+        - Killed prey is skipped by the next predators without rebuilding the herd.
+
+    Which prey died is read with ``dead`` or ``survivors`` once every predator is done.
+
+    :param list phi: fitness of the prey.
+    :param list w: weight of the prey.
+    """
+
+    def __init__(self, phi, w):
+        self.order = sorted(range(len(phi)), key=phi.__getitem__)
+        self.phi = [phi[i] for i in self.order]
+        self.w = [w[i] for i in self.order]
+        self.n_alive = len(self.order)
+        # ``_skip[i]`` points towards the first living prey at or after ``i``, dead prey point past themselves. #
+        self._skip = list(range(len(self.order) + 1))
+
+    def _next_alive(self, i: int):
+        """
+        Finds the first living prey at or after ``i``, and shortens the path for the next search.
+
+
+        :param int i: position in the sorted herd.
+        :return: position of the prey, ``len(self.phi)`` if there is none.
+        """
+        skip = self._skip
+        root = i
+        while skip[root] != root:
+            root = skip[root]
+        while skip[i] != root:
+            skip[i], i = root, skip[i]
+        return root
+
+    def feed(self, phi: float, appetite: float, beta: float, delta_phi_max: float, refit, draw):
+        """
+        One predator hunts the herd.
+
+        As in ``Carnivore.eat`` the predator stops after a kill if it still has appetite left. A predator
+        that has eaten exactly its appetite keeps hunting, without gaining weight.
+
+
+        :param float phi: fitness of the predator.
+        :param float appetite: how much the predator wants to eat, ``F``.
+        :param float beta: how much of the meat becomes weight.
+        :param float delta_phi_max: ``DeltaPhiMax`` of the predator.
+        :param refit: function that adds the weight it is given to the predator and returns its new fitness.
+        :param draw: function that returns a random number in ``[0, 1)``.
+        """
+        prey_phi = self.phi
+        n = len(prey_phi)
+        i = self._next_alive(0)
+        while i < n and prey_phi[i] < phi:
+            if draw() < min(1, (phi - prey_phi[i]) / delta_phi_max):
+                f_got = min(appetite, self.w[i])
+                self._skip[i] = i + 1
+                self.n_alive -= 1
+                appetite -= f_got
+                phi = refit(beta * f_got)
+                if appetite:
+                    break
+            i = self._next_alive(i + 1)
+
+    def dead(self):
+        """
+        :return: indices of the killed prey, in the order the prey was given.
+        """
+        return sorted(self.order[i] for i in range(len(self.order)) if self._skip[i] != i)
+
+    def survivors(self, prey: list):
+        """
+        Removes the killed prey from ``prey``.
+
+
+        :param list prey: the prey in the order it was given.
+        :return: list of the living prey.
+        """
+        killed = set(self.dead())
+        return [p for i, p in enumerate(prey) if i not in killed]
+
+
+def random_block(rng, size: int = 1024):
+    """
+    Generator of random numbers in ``[0, 1)`` drawn ``size`` at a time from a ``numpy.random.Generator``.
+    Use ``random_block(rng).__next__`` where a ``draw`` function is needed.
+
+
+    :param numpy.random.Generator rng: random number generator.
+    :param int size: number of random numbers drawn at a time.
+    """
+    while True:
+        yield from rng.random(size).tolist()
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+"""
+Keeps the numbers of every year of a run on disk. This file contains:
+    - function: densities
+    - class: Recorder
+    - function: load_recording
+
+Every year the number of animals per species, the number of animals per species and cell, and if asked for,
+histograms of the age, weight and fitness are put into buffers of ``chunk_years`` years. A full buffer is
+written as the next ``.npz`` chunk of a folder, so the memory does not grow with the length of the run.
+"""
+
+__author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
+__email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
+
+import glob
+import json
+import os
+
+import numpy as np
+
+from .chunks import write_chunk
+from .population import bin_edges
+
+properties = {"age": "total_age", "weight": "total_weight", "fitness": "total_fitness"}
+
+
+def densities(sim):
+    """
+    :param BioSim sim: the simulation.
+    :return: the number of animals per species and cell, as an array (species, y, x).
+    """
+    if sim.engine == "array":
+        shape = sim.island.shape
+        return sim.population.count(shape[0] * shape[1]).reshape((len(sim.names),) + shape)
+    return sim.island.counts
+
+
+class Recorder:
+    """
+    The ``Recorder`` class records a ``BioSim`` every year it is given to ``BioSim.simulate``::
+
+        with Recorder("run", sim) as recorder:
+            sim.simulate(100000, vis_years=0, recorder=recorder)
+
+    A folder that was recorded into before goes on from its last chunk, if the map, species and histograms
+    are the same. Years recorded again, e.g. after going back to a checkpoint, replace those years and the
+    years after them, see ``load_recording``. The last years are only written by ``close``. The map is kept,
+    so a recording can be shown again without the simulation, see ``replay``.
+
+    :param str path: folder of the chunks, made if it does not exist.
+    :param BioSim sim: the simulation, for its map and species.
+    :param bool densities: record the number of animals per species and cell.
+    :param dict histograms: ``{property: {"max": ..., "delta": ...}}`` as ``hist_specs`` of ``BioSim``, for
+        ``"age"``, ``"weight"`` and ``"fitness"``. Values above ``max`` are counted in the last bin.
+    :param int chunk_years: number of years per chunk.
+    """
+
+    def __init__(self, path: str, sim, densities: bool = True, histograms: dict = None, chunk_years: int = 256):
+        for key in histograms or dict():
+            if key not in properties:
+                raise ValueError("Got histogram of '{}'; needs one of {}".format(key, tuple(properties)))
+        self.path = path
+        self.names = list(sim.names)
+        self.shape = tuple(sim.island.shape)
+        self.densities = densities
+        self.histograms = {key: dict(spec) for key, spec in (histograms or dict()).items()}
+        self.edges = {key: bin_edges(spec) for key, spec in self.histograms.items()}
+        self.chunk_years = chunk_years
+        manifest = {"names": self.names, "map": sim.str_map, "shape": list(self.shape), "densities": densities,
+                    "histograms": self.histograms}
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, "recorder.json")):
+            with open(os.path.join(path, "recorder.json")) as file:
+                if json.load(file) != json.loads(json.dumps(manifest)):
+                    raise ValueError("The recording in {} has another map, species or histograms.".format(path))
+        else:
+            with open(os.path.join(path, "recorder.json"), "w") as file:
+                json.dump(manifest, file)
+        self.n = 0
+        self.buffers = {"year": np.zeros(chunk_years, dtype=np.int64),
+                        "totals": np.zeros((chunk_years, len(self.names)), dtype=np.int64)}
+        if densities:
+            self.buffers["densities"] = np.zeros((chunk_years, len(self.names)) + self.shape, dtype=np.int32)
+        for key, edges in self.edges.items():
+            self.buffers[key] = np.zeros((chunk_years, len(self.names), len(edges) - 1), dtype=np.int64)
+
+    def record(self, sim):
+        """
+        Puts the numbers of the year that was just simulated into the buffers, and writes them when they
+        are full.
+
+
+        :param BioSim sim: the simulation.
+        """
+        if self.n and sim.year <= self.buffers["year"][self.n - 1]:
+            self.flush()
+        n = self.n
+        self.buffers["year"][n] = sim.year
+        self.buffers["totals"][n] = list(sim.num_animals_per_species.values())
+        if self.densities:
+            self.buffers["densities"][n] = densities(sim)
+        if self.histograms:
+            counts, _ = sim.histograms(self.histograms)
+            for key in self.histograms:
+                self.buffers[key][n] = [counts[key][species] for species in self.names]
+        self.n += 1
+        if self.n == self.chunk_years:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the years in the buffers as the next chunk. The chunk is written under another name first, so a
+        stopped run never leaves half a chunk.
+        """
+        if self.n == 0:
+            return
+        write_chunk(self.path, {key: buffer[:self.n] for key, buffer in self.buffers.items()})
+        self.n = 0
+
+    def close(self):
+        """
+        Writes the last years.
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_recording(path: str, densities: bool = True, years=None):
+    """
+    :param str path: the folder of the recording.
+    :param bool densities: also read the densities, which may be large.
+    :param tuple years: only the years from ``years[0]`` to ``years[1]`` (included), only the chunks with these
+        years are read.
+    :return: the arrays of every year written so far, by year (``year``, ``totals``, ``densities`` and one
+        per histogram), and the manifest (``names``, ``map``, ``shape``, ``densities`` and ``histograms``). A
+        chunk that begins at a year recorded before replaces that year and the years after it.
+    """
+    with open(os.path.join(path, "recorder.json")) as file:
+        manifest = json.load(file)
+    keys = ["year", "totals"] + (["densities"] if densities and manifest["densities"] else [])
+    keys += list(manifest["histograms"])
+    loaded = []
+    for chunk in sorted(glob.glob(os.path.join(path, "chunk-*.npz"))):
+        with np.load(chunk) as data:
+            year = data["year"]
+            if len(year) == 0:
+                continue
+            # A chunk that begins at a year recorded before replaces that year and the years after it. #
+            loaded = [{key: values[part["year"] < year[0]] for key, values in part.items()} for part in loaded]
+            keep = slice(None)
+            if years is not None:
+                keep = (year >= years[0]) & (year <= years[1])
+                if not keep.any():
+                    continue
+            loaded.append({key: data[key][keep] for key in keys})
+    loaded = [part for part in loaded if len(part["year"])]
+    if not loaded:
+        return {key: np.zeros(0) for key in keys}, manifest
+    return {key: np.concatenate([part[key] for part in loaded]) for key in keys}, manifest
+
+
+if __name__ == '__main__':
+    pass
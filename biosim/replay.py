@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+"""
+Makes the images of a run again from its recording, without simulating. This file contains:
+    - function: render
+
+The frames are cut into runs of frames that follow each other, each done by a worker process with its own
+``Visualization`` on the ``Agg`` backend. A worker only reads the chunks of the recording its frames are in;
+the years and totals for the population graph are read once, by ``render``.
+"""
+
+__author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
+__email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
+
+import os
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import matplotlib.pyplot as plt
+
+from .population import bin_edges
+from .recorder import load_recording
+from .visualization import Visualization
+
+
+def _start_worker():
+    plt.switch_backend("agg")
+
+
+def _render_frames(task: tuple, path: str, img_base: str, img_fmt: str, last_year: int, ymax_animals=None,
+                   cmax_animals=None, hist_specs=None):
+    """
+    Draws the frames of ``task``, and saves them as ``img_base_number.img_fmt``. ``task`` is the frames,
+    ``(number, year)`` pairs in the order of the years, with the years and totals of the recording up to the
+    last frame, for the population graph. ``last_year`` is the last year of the recording.
+    """
+    frames, years, totals = task
+    recording, manifest = load_recording(path, years=(frames[0][1], frames[-1][1]))
+    names = manifest["names"]
+    specs = dict(manifest["histograms"], **(hist_specs or dict()))
+    edges = {key: bin_edges(spec) for key, spec in manifest["histograms"].items()}
+    viz = Visualization(names, img_base, img_fmt, ymax_animals)
+    viz.convert_map(manifest["map"])
+    viz.setup_graphics(last_year + 1, cmax_animals, specs)
+    rows = {year: row for row, year in enumerate(recording["year"].tolist())}
+    done = 0
+    for number, year in frames:
+        # The population graph has every year up to the frame. #
+        while done < len(years) and years[done] <= year:
+            viz.pop_handler(years[done], dict(zip(names, totals[done])))
+            viz.update_ylim()
+            done += 1
+        row = rows[year]
+        viz.year.set_text('Year:{:5}'.format(year))
+        if manifest["densities"]:
+            viz.update_heatmaps({species: recording["densities"][row, i] for i, species in enumerate(names)})
+        viz.draw_histograms({key: {species: recording[key][row, i] for i, species in enumerate(names)}
+                             for key in manifest["histograms"]}, edges)
+        viz.fig.savefig('{}_{:05d}.{}'.format(img_base, number, img_fmt))
+    plt.close(viz.fig)
+    return len(frames)
+
+
+def render(path: str, img_base: str, img_fmt: str = "png", years=None, workers=None, chunk_frames: int = 50,
+           ymax_animals=None, cmax_animals=None, hist_specs=None):
+    """
+    Makes one image per recorded year (or per year of ``years``), numbered from 0 like ``BioSim.simulate``
+    numbers them, so ``BioSim.make_movie`` can make a movie of them.
+
+
+    :param str path: the folder of a ``recorder.Recorder``.
+    :param str img_base: beginning of the file names of the images, including the path.
+    :param str img_fmt: file type of the images, e.g. ``'png'``.
+    :param years: the years to draw, by default every recorded year.
+    :param int workers: number of processes, by default one per CPU. With 0 the frames are drawn in this
+        process.
+    :param int chunk_frames: number of frames per task of a worker.
+    :param ymax_animals: y-axis limit of the population graph, as for ``BioSim``.
+    :param dict cmax_animals: colour limits of the heat maps, as for ``BioSim``.
+    :param dict hist_specs: x-axis limits of the histograms, by default those of the recording.
+    :return: number of images.
+    """
+    everything = load_recording(path, densities=False)[0]
+    recorded, totals = everything["year"].tolist(), everything["totals"].tolist()
+    years = sorted(set(recorded) & set(years)) if years is not None else recorded
+    frames = list(enumerate(years))
+    # Every task gets the totals up to its last frame, so no worker reads the whole recording again. #
+    tasks = []
+    for n in range(0, len(frames), chunk_frames):
+        part = frames[n:n + chunk_frames]
+        end = bisect_right(recorded, part[-1][1])
+        tasks.append((part, recorded[:end], totals[:end]))
+    directory = os.path.dirname(img_base)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    draw = partial(_render_frames, path=path, img_base=img_base, img_fmt=img_fmt,
+                   last_year=max(recorded, default=0), ymax_animals=ymax_animals, cmax_animals=cmax_animals,
+                   hist_specs=hist_specs)
+    if workers == 0:
+        return sum(draw(task) for task in tasks)
+    with ProcessPoolExecutor(workers, initializer=_start_worker) as pool:
+        return sum(pool.map(draw, tasks))
+
+
+if __name__ == '__main__':
+    pass
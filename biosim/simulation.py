@@ -4,16 +4,21 @@ __author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
 __email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
 
 from .animal import *
-import random as ran
 from .visuals import string2map, set_param
 from .logic import year_cycle
 from .visualization import Visualization
+from .population import Population, parameter_table, bin_edges, bin_counts, hist_defaults
+from .species import SpeciesParameters
+from .streams import Streams
+from . import checkpoint
+from . import array_logic
+import numpy as np
 import sys
-import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 import subprocess
 import os
 import time
-import pickle
 
 
 class BioSim:
@@ -46,22 +51,41 @@ class BioSim:
         ``'{}_{:05d}.{}'.format(img_base, img_no, img_fmt)``
         where img_no are consecutive image numbers starting from 0.
         img_base should contain a path and beginning of a file name.
+
+        :param engine: ``'object'`` simulates one ``animal`` object per animal (see ``biosim.logic``),
+            ``'array'`` stores all animals as NumPy columns (see ``biosim.array_logic``).
+        :param threads: number of threads the ``'object'`` engine does the cells in, see ``logic.year_cycle``.
+            The result is the same as without threads.
     """
 
+    engines = ("object", "array")
+
     def __init__(self, island_map: str, ini_pop: list, seed: int = None, ymax_animals=None, cmax_animals=None,
-                 hist_specs=None, img_base=None, img_fmt='png', tmean=False):
-        # we set the random seed for future random number generation. In other words,
-        # we make a random simulation consistent.#
-        if seed:
-            ran.seed(seed)
+                 hist_specs=None, img_base=None, img_fmt='png', tmean=False, engine="object", threads=0):
+        if engine not in BioSim.engines:
+            raise ValueError("Got engine '{}'; needs one of {}".format(engine, BioSim.engines))
+        self.engine = engine
+        self.threads = threads
+        # The simulation owns its random numbers, every season of every year draws from its own
+        # stream, so two simulations in one process do not change each other.#
+        self.streams = Streams(seed)
+        self.rng = self.streams.generator()
 
         self.str_map = island_map.strip()
 
         # We look for possible animals in animals.py, meaning we don't need to add manually
-        # new animals. This is assuming no global function except in animal superclass. #
-        self.names = [n for n in dir(sys.modules["biosim.animal"]) if not re.match("(\w*__\w*)|(np)|(ran)|(animal)", n)]
-        self.default_values_species = {species: dict(eval("{}.default_var".format(species))) for species in self.names}
+        # new animals. Every subclass of ``animal`` is a species. #
+        self.names = sorted(n for n, c in vars(sys.modules["biosim.animal"]).items()
+                            if isinstance(c, type) and issubclass(c, animal) and c is not animal)
+        self.default_values_species = {species: SpeciesParameters(eval("{}.default_var".format(species)))
+                                       for species in self.names}
         self.island, self.illegal_coord = string2map(island_map, self.names)
+        # The island counts the bins of the histograms as the animals age, see ``Grid.record``. #
+        self.island.set_bins({**hist_defaults, **(hist_specs or {})})
+        if self.engine == "array":
+            self.population = Population(self.names)
+            self.params = parameter_table(self.names, self.default_values_species)
+            self.landscape = array_logic.compile_island(self.island, self._map_shape())
         self.add_population(ini_pop)
         self._year = 0
         self.viz = None
@@ -92,11 +116,10 @@ class BioSim:
                 raise ValueError("{} not in {}".format(key, species))
             if params[key] < 0:
                 raise ValueError("{} is less than zero".format(key))
+        # Every animal of the species refers to the same parameters, so this is all that is needed. #
         self.default_values_species[species].update(params)
-        for coord in self.island:
-            if species in self.island[coord].default:
-                for animals in self.island[coord].default[species]:
-                    animals.var.update(self.default_values_species[species])
+        if self.engine == "array":
+            self.params = parameter_table(self.names, self.default_values_species)
 
     def set_landscape_parameters(self, landscape: str, params: dict):
         """
@@ -107,7 +130,22 @@ class BioSim:
         :param dict params: Dict with valid parameter specification for landscape
         """
         set_param(self.island, landscape, params)
-    
+        if self.engine == "array":
+            self.landscape = array_logic.compile_island(self.island, self._map_shape())
+
+    def _map_shape(self):
+        """
+        Number of rows and columns of the current map.
+        """
+        rows = self.str_map.split()
+        return len(rows), len(rows[0])
+
+    def _cell_index(self, coord):
+        """
+        Converts a ``(y, x)`` coordinate into the flat cell index used by ``Population``.
+        """
+        return (coord[0] - 1) * self._map_shape()[1] + coord[1] - 1
+
     def re_map(self, new_map: str):
         """
         Changes the map to the new map.
@@ -122,17 +160,21 @@ class BioSim:
 
         self.str_map = new_map
 
-        for coord in self.island:
-            if coord not in new_illegal_coord:
-                new_map_list[coord].default.update(self.island[coord].default)
+        for _, cell in self.island.views():
+            if tuple(cell.coord) not in new_illegal_coord:
+                new_map_list[tuple(cell.coord)].default.update(cell.default)
             
         self.island = new_map_list
+        self.island.count()
         self.illegal_coord = new_illegal_coord
+        if self.engine == "array":
+            self.landscape = array_logic.compile_island(self.island, self._map_shape())
+            self.population.keep(self.landscape["legal"][self.population.cell])
 
         self.viz.convert_map(self.str_map)
         self.viz.island_map = self.viz.island_map_ax.imshow(self.viz.rgb_map)
 
-    def simulate(self, num_years, vis_years=1, img_years=None):
+    def simulate(self, num_years, vis_years=1, img_years=None, checkpoints=None, recorder=None, movie=None):
         """
         Run simulation while visualizing the result.
 
@@ -141,6 +183,9 @@ class BioSim:
         :param int vis_years: years between visualization updates
         :param img_years: years between visualizations saved to files (default: vis_years)
         Image files will be numbered consecutively.
+        :param checkpoints: a ``checkpoint.Checkpoints`` policy, checkpoints are written as it says.
+        :param recorder: a ``recorder.Recorder`` or ``cube.CubeWriter``, which records every year.
+        :param movie: a ``movie.MovieWriter``, which gets the frames instead of image files.
         """
         if img_years is None:
             img_years = vis_years
@@ -150,25 +195,37 @@ class BioSim:
                 self.viz.convert_map(self.str_map)
             self.viz.setup_graphics(num_years, self.cmax_animals, self.hist_specs)
         n = 0
-        while n < num_years:
-            year_cycle(self.island, self.illegal_coord)
-            if vis_years:
-                self.viz.pop_handler(self._year, self.num_animals_per_species)
-                if self._year % vis_years == 0:
-                    self.get_data()
-                    self.viz.update_data(
-                        self.num_animals_per_species, self.total_age,
-                        self.total_weight, self.total_fitness
-                    )
-                    self.viz.update_graphics(self.data)
-                if self._year % img_years == 0:
-                    self.viz.create_images()
-            self._year += 1
-            n += 1
-            if self.tmean:
-                for species in self.num_animals_per_species:
-                    self.mean[species] = self.mean[species] + (
-                                (self.num_animals_per_species[species] - self.mean[species]) / self._year)
+        # The threads of the ``"object"`` engine are kept for every year of this call, and shut down when it
+        # ends, also when a year raises. #
+        with ThreadPoolExecutor(self.threads) if self.engine == "object" and self.threads else nullcontext() as pool:
+            while n < num_years:
+                if self.engine == "array":
+                    array_logic.year_cycle(self.population, self.landscape, self.params, self.streams, self._year)
+                else:
+                    year_cycle(self.island, self.illegal_coord, self.streams, self._year, self.threads, pool)
+                if vis_years:
+                    self.viz.pop_handler(self._year, self.num_animals_per_species)
+                    if self._year % vis_years == 0:
+                        self.get_data(values=False)
+                        self.viz.update_counts(*self.histograms(self.viz.def_specs))
+                        self.viz.update_graphics(self.data)
+                    if self._year % img_years == 0:
+                        if movie is not None:
+                            movie.write(self.viz.frame())
+                        else:
+                            self.viz.create_images()
+                self._year += 1
+                n += 1
+                if self.tmean:
+                    for species in self.num_animals_per_species:
+                        self.mean[species] = self.mean[species] + (
+                                    (self.num_animals_per_species[species] - self.mean[species]) / self._year)
+                if recorder is not None:
+                    recorder.record(self)
+                if checkpoints is not None and checkpoints.due(self._year):
+                    checkpoints.take(self)
+        if checkpoints is not None:
+            checkpoints.wait()
 
     def add_population(self, population: list):
         """
@@ -182,6 +239,7 @@ class BioSim:
         }]
         """
         population = {pop["loc"]: pop["pop"] for pop in population}
+        new_rows = {"species": [], "cell": [], "age": [], "weight": []}
         for coord in population:
             if coord in self.illegal_coord:
                 raise ValueError("An animal was placed at {} which is an illegal placement.".format(coord))
@@ -193,49 +251,90 @@ class BioSim:
                 elif animal_["weight"] < 0:
                     raise ValueError("weight is less than zero")
                 if animal_name in self.names:
-                    if animal_name in cell.default:
-                        create_animal = eval("{}(a = animal_['age'], w = animal_['weight'])".format(animal_name))
-                        create_animal.var.update(self.default_values_species[animal_name])
+                    if self.engine == "array":
+                        new_rows["species"].append(self.names.index(animal_name))
+                        new_rows["cell"].append(self._cell_index(coord))
+                        new_rows["age"].append(animal_['age'])
+                        new_rows["weight"].append(animal_['weight'])
+                    elif animal_name in cell.default:
+                        create_animal = eval("{}(a = animal_['age'], w = animal_['weight'], "
+                                             "params = self.default_values_species[animal_name])".format(animal_name))
                         cell.default[animal_name].append(create_animal)
+                        cell.tally(animal_name, 1)
                     else:
-                        create_animal = eval("{}(a = animal_['age'], w = animal_['weight'])".format(animal_name))
-                        create_animal.var.update(self.default_values_species[animal_name])
+                        create_animal = eval("{}(a = animal_['age'], w = animal_['weight'], "
+                                             "params = self.default_values_species[animal_name])".format(animal_name))
                         cell.default[animal_name] = [create_animal]
+                        cell.tally(animal_name, 1)
                 else:
                     raise ValueError("Got '{}'; needs {}".format(animal_["species"], self.names))
+        if self.engine == "array" and new_rows["weight"]:
+            new_rows = {column: np.array(values) for column, values in new_rows.items()}
+            self.population.append(new_rows["species"], new_rows["cell"], new_rows["age"], new_rows["weight"],
+                                   array_logic.fitness(new_rows["age"], new_rows["weight"], new_rows["species"],
+                                                       self.params))
 
-    def get_data(self):
-        """Get data from the cells in self.island"""
-        columns = self.str_map.splitlines()
-        rows = list(columns[0])
-
-        for species in self.names:
-            z = list()
-            for y in range(len(columns)):
-                temp = list()
-                for x in range(len(rows)):
-                    v = self.island[(y + 1, x + 1)].count_species[species]
-                    temp.append(v)
-                z.append(temp)
-            self.data[species] = z
-
-        self.total_age = {species: [] for species in self.names}
-        for names in self.names:
-            for coord in self.island:
-                for units in self.island[coord].count_age[names]:
-                    self.total_age[names].append(units)
-
-        self.total_weight = {species: [] for species in self.names}
-        for names in self.names:
-            for coord in self.island:
-                for units in self.island[coord].count_weight[names]:
-                    self.total_weight[names].append(units)
-
-        self.total_fitness = {species: [] for species in self.names}
-        for names in self.names:
-            for coord in self.island:
-                for units in self.island[coord].count_fitness[names]:
-                    self.total_fitness[names].append(units)
+    def get_data(self, values: bool = True):
+        """
+        Get data from the cells in self.island
+
+
+        :param bool values: also gather the age, weight and fitness of every animal, else only ``data`` is made.
+        """
+        if self.engine == "array":
+            shape = self._map_shape()
+            counts = self.population.count(shape[0] * shape[1])
+            self.data = {species: counts[i].reshape(shape) for i, species in enumerate(self.names)}
+            if not values:
+                return
+            by_species = [self.population.species == i for i in range(len(self.names))]
+            self.total_age = {species: self.population.age[by_species[i]] for i, species in enumerate(self.names)}
+            self.total_weight = {species: self.population.weight[by_species[i]]
+                                 for i, species in enumerate(self.names)}
+            self.total_fitness = {species: self.population.fitness[by_species[i]]
+                                  for i, species in enumerate(self.names)}
+            return
+        self.data = {species: self.island.counts[i] for i, species in enumerate(self.names)}
+        if not values:
+            return
+        cells = [cell for _, cell in self.island.occupied()]
+        self.total_age = {species: np.concatenate([[]] + [cell.count_age[species] for cell in cells])
+                          for species in self.names}
+        self.total_weight = {species: np.concatenate([[]] + [cell.count_weight[species] for cell in cells])
+                             for species in self.names}
+        self.total_fitness = {species: np.concatenate([[]] + [cell.count_fitness[species] for cell in cells])
+                              for species in self.names}
+
+    def histograms(self, specs: dict):
+        """
+        Counts the animals per bin of their age, weight and fitness, without making lists of the values.
+
+
+        :param dict specs: ``{property: {"max": ..., "delta": ...}}`` as ``hist_specs``, for ``"age"``,
+            ``"weight"`` and ``"fitness"``. Values above ``max`` are counted in the last bin.
+        :return: the counts, ``{property: {species: counts}}``, and the edges of the bins, ``{property: edges}``.
+            With the ``"object"`` engine and the ``hist_specs`` of the simulation, the counts are copied from
+            those the island keeps.
+        """
+        for key in specs:
+            if key not in ("age", "weight", "fitness"):
+                raise ValueError("Got histogram of '{}'; needs one of {}".format(key, ("age", "weight", "fitness")))
+        edges = {key: bin_edges(spec) for key, spec in specs.items()}
+        if self.engine == "array":
+            counts = {key: self.population.histogram(key, edges[key]) for key in specs}
+        elif all(specs[key] == self.island.hist_specs[key] for key in specs):
+            # The island keeps the bins of ``hist_specs`` up to date, see ``Grid.record``. #
+            counts = {key: self.island.bins[key].copy() for key in specs}
+        else:
+            # The cells keep the values of their animals per species, see ``Cells.record``. #
+            cells = [cell for _, cell in self.island.occupied()]
+            counts = dict()
+            for key in specs:
+                parts = [np.concatenate([[]] + [getattr(cell, "count_" + key)[species] for cell in cells])
+                         for species in self.names]
+                group = np.repeat(np.arange(len(self.names)), [len(part) for part in parts])
+                counts[key] = bin_counts(np.concatenate(parts), group, len(self.names), edges[key])
+        return {key: dict(zip(self.names, counts[key])) for key in specs}, edges
 
     @property
     def year(self):
@@ -250,14 +349,9 @@ class BioSim:
     @property
     def num_animals_per_species(self):
         """Number of animals per species in island, as dictionary."""
-        dict_count = {species: 0 for species in self.names}
-        for coord in self.island:
-            for species in self.island[coord].default:
-                if species in dict_count:
-                    dict_count[species] += len(self.island[coord].default[species])
-                else:
-                    dict_count[species] = len(self.island[coord].default[species])
-        return dict_count
+        if self.engine == "array":
+            return self.population.count_species()
+        return {species: int(self.island.totals[i]) for i, species in enumerate(self.names)}
 
     def make_movie(self, movie_fmt):
         """Creates a movie of the simulation"""
@@ -298,12 +392,7 @@ class BioSim:
 
         :param str file: file to be loaded.
         """
-        if not file.endswith(".biosim"):
-            raise ValueError("Must be a '.biosim' file.")
-        try:
-            self.__dict__.update(pickle.load(open(file, "br")).__dict__)
-        except:
-            raise ValueError("This file is not a readable BioSim file.")
+        self.__dict__.update(load(file).__dict__)
 
     def save(self, path: str = "", name=None):
         """
@@ -322,13 +411,12 @@ class BioSim:
         else:
             direct = path + "/"
 
-        if not (os.path.isdir(direct)):
-            os.mkdir("./" + direct)
+        if direct and not os.path.isdir(direct):
+            os.makedirs(direct)
         if name:
-            save_file = open(direct + "{}.biosim".format(name), "bw")
+            checkpoint.save(self, direct + "{}.biosim".format(name))
         else:
-            save_file = open(direct + "save_{}.biosim".format(str(time.time())), "bw")
-        pickle.dump(self, save_file)
+            checkpoint.save(self, direct + "save_{}.biosim".format(str(time.time())))
 
     def print_random_name(self):
         """
@@ -336,30 +424,37 @@ class BioSim:
         """
         if self.num_animals == 0:
             print('All animals are dead.')
+        elif self.engine == "array":
+            print("You haven't enabled animals to have names!")
         else:
-            n = 0
-            while n == 0:
-                coord, cell = ran.choice(list(self.island.items()))
-                n = len(cell.default)
-            species, animal_list = ran.choice(list(cell.default.items()))
-            name = ran.choice(animal_list).name
+            cells = self.island.occupied()
+            _, cell = cells[self.rng.integers(len(cells))]
+            species = [species for species in cell.default if cell.default[species]]
+            species = species[self.rng.integers(len(species))]
+            coord = tuple(cell.coord)
+            name = cell.default[species][self.rng.integers(len(cell.default[species]))].name
             if name is None:
                 print("You haven't enabled animals to have names!")
             else:
                 print('Say hello to {}, {} from cell {}!'.format(species, name, str(coord)))
 
 
-def load(file):
+def load(file, lazy=False):
     """
     loads a biosim file.
 
 
     :param str file: a path to file.
-    :return: returns a new ``BioSim`` object.
+    :param bool lazy: only open the file, the animals of a cell are read when the cell is asked for, see
+        ``checkpoint.LazyBioSim``.
+    :return: returns a new ``BioSim`` object, or a ``checkpoint.LazyBioSim`` if ``lazy``.
         """
     if not file.endswith(".biosim"):
         raise ValueError("Must be a '.biosim' file.")
-    try:
-        return pickle.load(open(file, "br"))
-    except:
-        raise ValueError("This file is not a readable BioSim file.")
+    if not checkpoint.is_checkpoint(file):
+        # Files saved before the checkpoint format are a pickled ``BioSim`` of classes that no longer exist. #
+        raise ValueError("{} is not a BioSim checkpoint; files saved as a pickled BioSim (the legacy format) "
+                         "are not supported.".format(file))
+    if lazy:
+        return checkpoint.LazyBioSim(file)
+    return checkpoint.load(file)
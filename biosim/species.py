@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parameters shared by all animals of a species. This file contains:
+    - class: SpeciesParameters
+    - class: AnimalView
+"""
+
+__author__ = "Mats Hoem olsen, Roy Erling Granheim"
+__email__ = "mats.hoem.olsen@nmbu.no, roy.erling.granheim@nmbu.no"
+
+from .fitness import fitness_keys
+
+
+class SpeciesParameters(dict):
+    """
+    The parameters of one species, like ``default_var``. Every animal of the species refers to the same
+    ``SpeciesParameters``, so changing a parameter is done once for the whole species.
+
+    ``version`` goes up each time a fitness parameter changes, the animals use it to know that their
+    fitness must be calculated again.
+    """
+    version = 0
+
+    def __setitem__(self, key, value):
+        if key in fitness_keys and key in self and self[key] != value:
+            self.version += 1
+        dict.__setitem__(self, key, value)
+
+    def update(self, other=(), **kwargs):
+        """
+        Same as ``dict.update``, but goes through ``__setitem__``.
+        """
+        for key, value in dict(other, **kwargs).items():
+            self[key] = value
+
+    def copy(self):
+        return SpeciesParameters(self)
+
+
+class AnimalView:
+    """
+    The ``var`` of an animal. The animal keeps its state in slots, ``AnimalView`` lets old code read and
+    write it as the dictionary it used to be. ``coord``, ``w``, ``a``, ``life`` and ``phi`` are the
+    attributes of the animal, every other key is a parameter read from the ``SpeciesParameters`` of the species.
+
+    Setting a parameter, e.g. ``var["mu"] = 1``, gives this animal its own value (a trait) without changing
+    the rest of the species. Only animals with traits store them.
+
+    :param animal animal: the animal to view.
+    """
+    __slots__ = ("animal",)
+    state_keys = ("coord", "w", "a", "life", "phi")
+
+    def __init__(self, animal):
+        self.animal = animal
+
+    @property
+    def params(self):
+        """The ``SpeciesParameters`` of the animal."""
+        return self.animal.params
+
+    def __getitem__(self, key):
+        if key in AnimalView.state_keys:
+            return getattr(self.animal, key)
+        return self.animal.lookup[key]
+
+    def __setitem__(self, key, value):
+        if key in AnimalView.state_keys:
+            setattr(self.animal, key, value)
+            if key in ("a", "w"):
+                self.animal.dirty = True
+        else:
+            self.animal.set_trait(key, value)
+
+    def __contains__(self, key):
+        return key in AnimalView.state_keys or key in self.animal.lookup
+
+    def __iter__(self):
+        yield from AnimalView.state_keys
+        yield from self.traits()
+
+    def __len__(self):
+        return len(AnimalView.state_keys) + len(self.traits())
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def update(self, other=(), **kwargs):
+        """
+        Same as ``dict.update``.
+        """
+        for key, value in dict(other, **kwargs).items():
+            self[key] = value
+
+    def traits(self):
+        """
+        The parameters this animal does not share with its species.
+
+
+        :return: dictionary with the traits.
+        """
+        return dict(self.animal.traits) if self.animal.traits else dict()
+
+
+if __name__ == "__main__":
+    pass
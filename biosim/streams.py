@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+"""
+The random numbers of the simulation. This file contains:
+    - class: Streams
+
+Every season of every year, and every stripe (row of the map) in it, draws from its own stream, so the
+numbers do not depend on what was drawn before, nor on which thread or process does the work.
+"""
+
+__author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
+__email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
+
+import numpy as np
+
+# The seasons, as keys of the streams. #
+GRAZING, HUNTING, BREEDING, MIGRATION, AGEING = range(5)
+
+
+class Streams:
+    """
+    The ``Streams`` class owns the ``numpy.random.SeedSequence`` of a simulation, and gives the independent
+    ``numpy.random.Generator`` of a key, e.g. ``(year, season, stripe)``. The same seed and key always give
+    the same numbers.
+
+    :param seed: integer seed or ``numpy.random.SeedSequence``, None for a random seed.
+    """
+
+    def __init__(self, seed=None):
+        self.seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+    def generator(self, *key):
+        """
+        :param int key: the key of the stream, e.g. ``year, season, stripe``. Without a key the generator is
+            the same as ``numpy.random.default_rng(seed)``.
+        :return: numpy.random.Generator
+        """
+        return np.random.Generator(np.random.PCG64(
+            np.random.SeedSequence(self.seed.entropy, spawn_key=self.seed.spawn_key + key)))
+
+    def stripes(self, year: int, season: int):
+        """
+        The generators of every stripe of a season, each made the first time it is asked for.
+
+
+        :param int year: the year.
+        :param int season: the season, e.g. ``streams.MIGRATION``.
+        :return: function that gives the ``numpy.random.Generator`` of a stripe (row of the map).
+        """
+        made = dict()
+
+        def stripe(row: int):
+            if row not in made:
+                made[row] = self.generator(year, season, row)
+            return made[row]
+        return stripe
+
+
+if __name__ == '__main__':
+    pass
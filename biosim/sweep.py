@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""
+Runs a scenario over a grid of parameters. This file contains:
+    - function: expand
+    - function: sweep
+    - function: load_results
+
+The results are kept in a folder, as columns in ``.npz`` chunks with one row per (job, year, species).
+Chunks are only added, never changed, so a sweep that was stopped goes on from the jobs that are not done.
+"""
+
+__author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
+__email__ = 'roy.erling.granheim@nmbu.no, mats.hoem.olsen@nmbu.no'
+
+import glob
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from .chunks import write_chunk
+from .ensemble import _start_worker, _simulate
+from .simulation import BioSim
+
+columns = ("job", "year", "species", "count")
+
+
+def expand(animal_ranges: dict = None, landscape_ranges: dict = None, seeds=(None,)):
+    """
+    Every combination of the parameter values, once per seed.
+
+
+    :param dict animal_ranges: values per parameter per species, e.g. ``{"Herbivore": {"zeta": [3, 3.5]}}``.
+    :param dict landscape_ranges: values per parameter per landscape, e.g. ``{"L": {"f_max": [500, 800]}}``.
+    :param seeds: the seeds of every combination.
+    :return: list of jobs, dictionaries with ``seed``, ``animal_params`` and ``landscape_params``.
+    """
+    axes = [("animal_params", species, key, values)
+            for species, params in sorted((animal_ranges or dict()).items())
+            for key, values in sorted(params.items())]
+    axes += [("landscape_params", landscape, key, values)
+             for landscape, params in sorted((landscape_ranges or dict()).items())
+             for key, values in sorted(params.items())]
+    jobs = []
+    for point in itertools.product(*(values for _, _, _, values in axes)):
+        for seed in seeds:
+            job = {"seed": seed, "animal_params": dict(), "landscape_params": dict()}
+            for (kind, name, key, _), value in zip(axes, point):
+                job[kind].setdefault(name, dict())[key] = value
+            jobs.append(job)
+    return jobs
+
+
+def _plain(manifest: dict):
+    """
+    :return: the manifest as it is read back from JSON, numpy numbers (e.g. from ``numpy.linspace``) included.
+    """
+    return json.loads(json.dumps(manifest, default=lambda value: value.item()))
+
+
+def _run_job(job: dict, num_years: int):
+    """
+    :return: the rows of one job, as columns.
+    """
+    counts = _simulate(job["seed"], num_years, job["animal_params"], job["landscape_params"])
+    counts = np.array(list(counts.values()))
+    species, year = np.indices(counts.shape)
+    return {"job": np.full(counts.size, job["id"]), "year": year.ravel(), "species": species.ravel(),
+            "count": counts.ravel()}
+
+
+def _write_chunk(path: str, rows: list):
+    """
+    Writes the rows of some jobs as the next chunk, see ``chunks.write_chunk``.
+    """
+    write_chunk(path, {column: np.concatenate([row[column] for row in rows]) for column in columns})
+
+
+def load_results(path: str):
+    """
+    :param str path: the folder of the sweep.
+    :return: the columns of every row written so far, and the manifest of the sweep (``names``,
+        ``num_years`` and ``jobs``).
+    """
+    with open(os.path.join(path, "sweep.json")) as file:
+        manifest = json.load(file)
+    results = {column: [np.zeros(0, dtype=np.int64)] for column in columns}
+    for chunk in sorted(glob.glob(os.path.join(path, "chunk-*.npz"))):
+        with np.load(chunk) as data:
+            for column in columns:
+                results[column].append(data[column])
+    return {column: np.concatenate(values) for column, values in results.items()}, manifest
+
+
+def sweep(island_map: str, ini_pop: list, jobs: list, num_years: int, path: str, engine: str = "object",
+          workers=None, chunk_jobs: int = 16):
+    """
+    Runs every job that is not in ``path`` yet, and adds its rows to ``path``.
+
+
+    :param str island_map: the map, as for ``BioSim``.
+    :param list ini_pop: the population of every job, as for ``BioSim``.
+    :param list jobs: the jobs, see ``expand``.
+    :param int num_years: number of years of every job.
+    :param str path: the folder of the sweep, made if it does not exist.
+    :param str engine: ``"object"`` or ``"array"``.
+    :param int workers: number of processes, by default one per CPU. With 0 the jobs are done in this process.
+    :param int chunk_jobs: number of jobs per chunk.
+    :return: number of jobs that were run.
+    """
+    names = BioSim(island_map=island_map, ini_pop=ini_pop, engine=engine).names
+    manifest = _plain({"names": names, "num_years": num_years, "jobs": jobs})
+    os.makedirs(path, exist_ok=True)
+    if os.path.exists(os.path.join(path, "sweep.json")):
+        done, old = load_results(path)
+        if old != manifest:
+            raise ValueError("The sweep in {} has other jobs.".format(path))
+        done = set(done["job"].tolist())
+    else:
+        with open(os.path.join(path, "sweep.json"), "w") as file:
+            json.dump(manifest, file)
+        done = set()
+    todo = [dict(job, id=n) for n, job in enumerate(manifest["jobs"]) if n not in done]
+
+    scenario = (island_map, ini_pop, engine, None, None)
+    rows = []
+    if workers == 0:
+        _start_worker(*scenario)
+        results = (_run_job(job, num_years) for job in todo)
+    else:
+        pool = ProcessPoolExecutor(workers, initializer=_start_worker, initargs=scenario)
+        results = pool.map(partial(_run_job, num_years=num_years), todo, chunksize=max(1, chunk_jobs // 4))
+    try:
+        for row in results:
+            rows.append(row)
+            if len(rows) == chunk_jobs:
+                _write_chunk(path, rows)
+                rows = []
+        if rows:
+            _write_chunk(path, rows)
+    finally:
+        if workers != 0:
+            pool.shutdown(cancel_futures=True)
+    return len(todo)
+
+
+if __name__ == '__main__':
+    pass
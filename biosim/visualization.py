@@ -11,6 +11,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 import os
 
+from .population import bin_edges, bin_counts, hist_defaults
+
 
 class Visualization:
     """
@@ -67,12 +69,14 @@ class Visualization:
         self.year_current = 0
         self.axt = None
         self.def_cmax = {'Herbivore': 200, 'Carnivore': 50}
-        self.def_specs = {'weight': {'max': 60, 'delta': 2},
-                          'fitness': {'max': 1.0, 'delta': 0.05},
-                          'age': {'max': 60, 'delta': 2}}
-        self.age = dict()
-        self.weight = dict()
-        self.fitness = dict()
+        self.def_specs = {key: dict(spec) for key, spec in hist_defaults.items()}
+        self.hist_counts = dict()
+        self.hist_edges = dict()
+        self.stairs = dict()
+        self.headless = False
+        self._background = None
+        self._layout = None
+        self._fresh = False
 
         self._img_base = img_base
         self._img_ctr = 0
@@ -95,6 +99,8 @@ class Visualization:
 
         if self.fig is None:
             self.fig = plt.figure(figsize=(10, 10))
+            # A canvas without a display (e.g. Agg) is drawn by ``render``. #
+            self.headless = getattr(self.fig.canvas, "required_interactive_framework", None) is None
 
         if self.island_map_ax is None:
             self.island_map_ax = self.fig.add_axes([0.1, 0.55, 0.3, 0.45])
@@ -169,7 +175,9 @@ class Visualization:
                                       horizontalalignment='center',
                                       verticalalignment='center',
                                       transform=self.axt.transAxes)
-        plt.pause(1e-6)
+        self._background = None
+        if not self.headless:
+            plt.pause(1e-6)
 
     def pop_handler(self, current_year, n_species):
         """
@@ -187,42 +195,14 @@ class Visualization:
             data = self.n[species].get_ydata()
             data[self.year_current] = self.count[species]
             self.n[species].set_ydata(data)
+        self._fresh = False
 
     def update_histograms(self):
         """
-        Updates the histograms on the graphics interface
+        Updates the histograms on the graphics interface with the counts of ``update_counts``
         """
-        self.histogram_age.cla()
-        self.histogram_age.set_xlim(0, self.def_specs['age']['max'])
-        for species in self.weight:
-            self.histogram_age.hist(self.age[species],
-                                    bins=int((self.def_specs['age']['max']) / (self.def_specs['age']['delta'])),
-                                    histtype='step',
-                                    range=(0, self.def_specs['age']['max']),
-                                    color=self.meta_data[species]["colour"])
-        self.histogram_age.title.set_text("Age Distribution")
-
-        self.histogram_weight.cla()
-        self.histogram_weight.set_xlim(0, self.def_specs['weight']['max'])
-        for species in self.weight:
-            self.histogram_weight.hist(self.weight[species],
-                                       bins=int(
-                                           (self.def_specs['weight']['max']) / (self.def_specs['weight']['delta'])),
-                                       range=(0, self.def_specs['weight']['max']),
-                                       histtype='step',
-                                       color=self.meta_data[species]["colour"])
-        self.histogram_weight.title.set_text("Weight Distribution")
-
-        self.histogram_fitness.cla()
-        self.histogram_fitness.set_xlim(0, self.def_specs['fitness']['max'])
-        for species in self.weight:
-            self.histogram_fitness.hist(self.fitness[species],
-                                        bins=int(
-                                            (self.def_specs['fitness']['max']) / (self.def_specs['fitness']['delta'])),
-                                        histtype='step',
-                                        range=(0, self.def_specs['fitness']['max']),
-                                        color=self.meta_data[species]["colour"])
-        self.histogram_fitness.title.set_text("Fitness Distribution")
+        if self.hist_counts:
+            self.draw_histograms(self.hist_counts, self.hist_edges)
 
     def update_heatmaps(self, cells_map):
         """
@@ -256,20 +236,85 @@ class Visualization:
         """
         self.year.set_text('Year:{:5}'.format(self.year_current))
 
+        self.update_ylim()
+
+        self.update_histograms()
+
+        self.update_heatmaps(cells_map)
+
+        if self.headless:
+            self.render()
+        else:
+            self.fig.canvas.flush_events()
+            plt.pause(1e-6)
+
+    def render(self):
+        """
+        Draws the figure on a canvas without a display. The whole figure is only drawn when an axes was added
+        or its limits changed, else the drawing without the artists that change every year is put back, and
+        only those are drawn on it (blitting)
+        """
+        canvas = self.fig.canvas
+        artists = [artist for artist in list(self.n.values()) + list(self.stairs.values()) +
+                   [self.img_ax, self.img2_ax, self.year] if artist is not None]
+        layout = [tuple(ax.get_position().bounds) + ax.get_xlim() + ax.get_ylim() for ax in self.fig.axes]
+        if self._background is None or layout != self._layout:
+            # The artists are only left out of the background, so ``savefig`` still draws them. #
+            for artist in artists:
+                artist.set_animated(True)
+            canvas.draw()
+            for artist in artists:
+                artist.set_animated(False)
+            self._background = canvas.copy_from_bbox(self.fig.bbox)
+            self._layout = layout
+        else:
+            canvas.restore_region(self._background)
+        for artist in artists:
+            self.fig.draw_artist(artist)
+        self._fresh = True
+
+    def update_ylim(self):
+        """
+        Updates the y-axis limit of the population graph, from ``ymax_animals`` or the largest count so far.
+        The limit only moves when a count goes over it, with room to grow, so the axes are seldom drawn again
+        """
         if not self.y_set_lim:
-            if self.y_def_lim <= max(self.count['Herbivore'], self.count['Carnivore']):
-                self.y_def_lim = max(self.count['Herbivore'], self.count['Carnivore'])
+            if self.y_def_lim + 1000 <= max(self.count['Herbivore'], self.count['Carnivore']):
+                self.y_def_lim = 1.25 * max(self.count['Herbivore'], self.count['Carnivore'])
         else:
             self.y_def_lim = self.y_set_lim - 1000
 
         self.pop.set_ylim(0, self.y_def_lim + 1000)
 
-        self.update_histograms()
+    def draw_histograms(self, counts: dict, edges: dict):
+        """
+        Draws histograms that are already counted, e.g. by ``recorder.Recorder``
 
-        self.update_heatmaps(cells_map)
 
-        self.fig.canvas.flush_events()
-        plt.pause(1e-6)
+        :param counts: dictionary with for each property ('age', 'weight' or 'fitness') a dictionary
+                       with the counts per bin of each species
+        :param edges: dictionary with for each property the edges of the bins
+        """
+        axes = {'age': (self.histogram_age, "Age Distribution"),
+                'weight': (self.histogram_weight, "Weight Distribution"),
+                'fitness': (self.histogram_fitness, "Fitness Distribution")}
+        for key in counts:
+            ax, title = axes[key]
+            # The step artists are made once, and only get new counts after that. #
+            for species in counts[key]:
+                step = self.stairs.get((key, species))
+                if step is not None and np.array_equal(step.get_data().edges, edges[key]):
+                    step.set_data(counts[key][species])
+                    continue
+                if step is not None:
+                    step.remove()
+                self.stairs[(key, species)] = ax.stairs(counts[key][species], edges[key],
+                                                        color=self.meta_data[species]["colour"])
+                ax.set_xlim(0, self.def_specs[key]['max'])
+                ax.title.set_text(title)
+            top = max([1] + [int(np.max(values, initial=0)) for values in counts[key].values()])
+            if not ax.get_ylim()[1] / 4 <= top <= ax.get_ylim()[1]:
+                ax.set_ylim(0, 2 ** np.ceil(np.log2(top * 1.25)))
 
     def update_data(self, n_species: dict, l_ages, l_weights, l_fitness):
         """
@@ -281,13 +326,23 @@ class Visualization:
         :param l_weights: dictionary containing data for weights for each species
         :param l_fitness: dictionary containing data for fitness for each species
         """
-        for species in n_species:
-            self.age[species] = [a if a < self.def_specs['age']['max'] else
-                                 self.def_specs['age']['max'] for a in l_ages[species]]
-            self.weight[species] = [w if w < self.def_specs['weight']['max'] else
-                                    self.def_specs['weight']['max'] for w in l_weights[species]]
-            self.fitness[species] = [f if f < self.def_specs['fitness']['max'] else
-                                     self.def_specs['fitness']['max'] for f in l_fitness[species]]
+        counts, edges = dict(), dict()
+        for key, values in (('age', l_ages), ('weight', l_weights), ('fitness', l_fitness)):
+            edges[key] = bin_edges(self.def_specs[key])
+            counts[key] = {species: bin_counts(values[species], np.zeros(len(values[species]), dtype=int), 1,
+                                               edges[key])[0] for species in n_species}
+        self.update_counts(counts, edges)
+
+    def update_counts(self, counts: dict, edges: dict):
+        """
+        Updates the histogram data with counts made by the simulation, see ``BioSim.histograms``
+
+
+        :param counts: dictionary containing for each property a dictionary of the counts per bin of each species
+        :param edges: dictionary containing the edges of the bins of each property
+        """
+        self.hist_counts = counts
+        self.hist_edges = edges
 
     def convert_map(self, map_str: str):
         """
@@ -304,6 +359,18 @@ class Visualization:
         self.rgb_map = [[rgb_value[column] for column in row]
                         for row in map_str.split()]
 
+    def frame(self):
+        """
+        :return: the pixels of the figure as it is now, as an array (y, x, RGBA) of ``uint8``. It is a view of the
+            canvas, which is drawn over by the next update.
+        """
+        if self.headless:
+            if not self._fresh:
+                self.render()
+        else:
+            self.fig.canvas.draw()
+        return np.asarray(self.fig.canvas.buffer_rgba())
+
     def create_images(self):
         """
         saves images to file and creates directory if one doesn't exist
@@ -314,9 +381,12 @@ class Visualization:
         if not os.path.exists('../data'):
             os.makedirs('../data')
 
-        plt.savefig('{base}_{num:05d}.{type}'.format(base=self._img_base,
-                                                     num=self._img_ctr,
-                                                     type=self._img_fmt))
+        name = '{base}_{num:05d}.{type}'.format(base=self._img_base, num=self._img_ctr, type=self._img_fmt)
+        if self.headless and self._img_fmt == 'png':
+            # The canvas already has the picture, it only has to be written. #
+            plt.imsave(name, self.frame())
+        else:
+            plt.savefig(name)
         self._img_ctr += 1
 
 
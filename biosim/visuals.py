@@ -7,7 +7,10 @@ visuals.py handles the given map string into a functional map for simulation pur
 __author__ = 'Roy Erling Granheim, Mats Hoem Olsen'
 __email__ = 'roy.erling.granheim@nmbu.no, matshoemolsen@nmbu.no'
 
-from .island import Cells
+from .island import Grid
+
+# The cell type of every letter of a map, see ``Cells.default_food``. #
+standard_values = {"W": 0, "L": 3, "H": 2, "D": 1}
 
 
 def find_border(x_length, y_length):
@@ -42,7 +45,7 @@ def string2map(map_str: str, names: list):
 
     :param map_str: a string that represents the map.
     :param list names: a list of species names.
-    :return: a new map, and illegal coordinates
+    :return: a new map (``Grid``), and illegal coordinates
     """
     map_list = [list(map_r) for map_r in map_str.split()]
 
@@ -50,9 +53,8 @@ def string2map(map_str: str, names: list):
     if any((len(row) != x_length for row in map_list)):
         raise ValueError("Inconsistent row length")
 
-    standard_values = {"W": 0, "L": 3, "H": 2, "D": 1}
     border_coord = find_border(x_length, len(map_list))
-    newer_map = {}
+    types = [[0] * x_length for _ in map_list]
     illegal_coord = []
     for row in enumerate(map_list):
         for column in enumerate(row[1]):
@@ -60,15 +62,12 @@ def string2map(map_str: str, names: list):
             if column[1] != "W" and incoming_coord not in border_coord:
                 if column[1] not in standard_values:
                     raise ValueError("'{}' is not a standard value, expected {}".format(column[1], standard_values))
-                newer_map.update({incoming_coord: Cells(
-                    standard_values[column[1]], list(incoming_coord), names)})
+                types[row[0]][column[0]] = standard_values[column[1]]
             else:
                 if column[1] != "W" and incoming_coord in border_coord:
                     raise ValueError("expected 'W' on border, got {}".format(column[1]))
-                newer_map.update({incoming_coord: Cells(
-                    standard_values[column[1]], list(incoming_coord), names)})
                 illegal_coord.append(incoming_coord)
-    return [newer_map, illegal_coord]
+    return [Grid(types, names), illegal_coord]
 
 
 def set_param(island, _type: str, parm: dict):
@@ -76,12 +75,9 @@ def set_param(island, _type: str, parm: dict):
     This function adjust the cells of a given type (_type) with parameters (parm)
 
 
-    :param island: a list of cells
+    :param Grid island: the island.
     :param str _type: a string which is either 'L', 'H', 'D', 'W'
     :param parm: a Dict with param (f_max)
     """
     cell_types = {"W": 0, "L": 3, "H": 2, "D": 1}
-    cell_type = cell_types[_type]
-    for coord in island:
-        if island[coord].type == cell_type:
-            island[coord].f_max = float(parm["f_max"])
+    island.set_f_max(cell_types[_type], parm["f_max"])
@@ -0,0 +1,170 @@
+from biosim.array_logic import *
+from biosim.simulation import BioSim
+
+import numpy as np
+import pytest
+
+
+def make_sim(the_map, ini_pop, **kwargs):
+    return BioSim(island_map=the_map, ini_pop=ini_pop, seed=1234, engine="array", **kwargs)
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        BioSim(island_map="WWW\nWLW\nWWW", ini_pop=[], engine="abacus")
+
+
+def test_population_columns():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(10)] +
+                                      [{'species': 'Carnivore', 'age': 3, 'weight': 30} for _ in range(4)]}]
+    sim = make_sim("WWWW\nWLLW\nWWWW", ini_pop)
+    pop = sim.population
+    assert len(pop) == 14
+    assert all(pop.cell == 5)
+    assert sim.num_animals_per_species == {'Carnivore': 4, 'Herbivore': 10, 'Snake': 0}
+
+
+def test_fitness_same_as_animal():
+    sim = make_sim("WWW\nWLW\nWWW", [])
+    herb = Herbivore(a=12, w=33.)
+    carn = Carnivore(a=7, w=4.)
+    herb_id, carn_id = sim.names.index("Herbivore"), sim.names.index("Carnivore")
+    assert fitness(12, 33., herb_id, sim.params) == pytest.approx(herb.var["phi"])
+    assert fitness(7, 4., carn_id, sim.params) == pytest.approx(carn.var["phi"])
+    assert fitness(7, 0., carn_id, sim.params) == 0
+
+
+@pytest.mark.parametrize("n", [n for n in range(1, 6)])
+def test_ageing_animals(n):
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 0, 'weight': 100} for _ in range(15)]}]
+    sim = make_sim("WWW\nWLW\nWWW", ini_pop)
+    sim.set_animal_parameters("Herbivore", {"omega": 0})
+    for _ in range(n):
+        season_ageing(sim.population, sim.landscape, sim.params, sim.rng)
+    assert all(sim.population.age == n)
+
+
+def test_weight_loss():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)]}]
+    sim = make_sim("WWW\nWLW\nWWW", ini_pop)
+    sim.set_animal_parameters("Herbivore", {"omega": 0})
+    season_ageing(sim.population, sim.landscape, sim.params, sim.rng)
+    assert sim.population.weight == pytest.approx(19)
+
+
+@pytest.mark.parametrize("n_animals", [n for n in range(2, 6)])
+def test_death_multi_animal(n_animals):
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 0} for _ in range(n_animals)]}]
+    sim = make_sim("WWW\nWLW\nWWW", ini_pop)
+    season_ageing(sim.population, sim.landscape, sim.params, sim.rng)
+    assert len(sim.population) == 0
+
+
+def test_two_herbivore_eating_in_cell():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 100} for _ in range(2)]}]
+    sim = make_sim("WWW\nWLW\nWWW", ini_pop)
+    season_feeding(sim.population, sim.landscape, sim.params, sim.rng)
+    assert sim.landscape["food"][4] == 780
+    assert sim.population.weight == pytest.approx(109)
+
+
+def test_herbivores_share_last_food():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 100} for _ in range(5)]}]
+    sim = make_sim("WWW\nWLW\nWWW", ini_pop)
+    sim.set_landscape_parameters("L", {"f_max": 25})
+    season_feeding(sim.population, sim.landscape, sim.params, sim.rng)
+    assert sim.landscape["food"][4] == 0
+    assert sorted(sim.population.weight) == pytest.approx([100, 100, 104.5, 109, 109])
+
+
+def test_eating_carnivore():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 1, 'weight': 1},
+                                       {'species': 'Carnivore', 'age': 5, 'weight': 100}]}]
+    sim = make_sim("WWW\nWLW\nWWW", ini_pop)
+    sim.set_landscape_parameters("L", {"f_max": 0})
+    sim.set_animal_parameters("Carnivore", {"DeltaPhiMax": 0.001})
+    season_feeding(sim.population, sim.landscape, sim.params, sim.rng)
+    assert sim.num_animals_per_species["Herbivore"] == 0
+    assert sim.population.weight == pytest.approx([100.75])
+
+
+def test_birth_one_animal():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 100}]}]
+    sim = make_sim("WWW\nWLW\nWWW", ini_pop)
+    sim.set_animal_parameters("Herbivore", {"gamma": 100})
+    season_breeding(sim.population, sim.landscape, sim.params, sim.rng)
+    assert len(sim.population) == 1
+
+
+@pytest.mark.parametrize("n_animals", [n for n in range(2, 9)])
+def test_birth_two_animals(n_animals):
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 100} for _ in range(n_animals)]}]
+    sim = make_sim("WWW\nWLW\nWWW", ini_pop)
+    sim.set_animal_parameters("Herbivore", {"gamma": 1000})
+    season_breeding(sim.population, sim.landscape, sim.params, sim.rng)
+    assert len(sim.population) == 2 * n_animals
+    assert sum(sim.population.age == 0) == n_animals
+
+
+def test_migration_consistency():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 100} for _ in range(15)] +
+                                      [{'species': 'Carnivore', 'age': 5, 'weight': 100} for _ in range(15)]}]
+    sim = make_sim("WWWW\nWLLW\nWLLW\nWWWW", ini_pop)
+    for _ in range(30):
+        season_migration(sim.population, sim.landscape, sim.params, sim.rng)
+    assert len(sim.population) == 30
+    assert all(sim.landscape["legal"][sim.population.cell])
+
+
+def test_no_diagonal_movements():
+    ini_pop = [{"loc": (3, 3), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 100} for _ in range(40)]}]
+    sim = make_sim("WWWWW\nWLLLW\nWLLLW\nWLLLW\nWWWWW", ini_pop)
+    sim.set_animal_parameters("Herbivore", {'mu': 100, 'omega': 0, 'gamma': 0, 'a_half': 1000})
+    season_migration(sim.population, sim.landscape, sim.params, sim.rng)
+    moved = sim.population.cell != 12
+    assert moved.any()
+    assert set(sim.population.cell) <= {7, 11, 12, 13, 17}
+
+
+def test_remap_removes_drowned_animals():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 100} for _ in range(3)]},
+               {"loc": (2, 3), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 100} for _ in range(4)]}]
+    sim = make_sim("WWWW\nWLLW\nWWWW", ini_pop)
+    sim.simulate(1, vis_years=1)
+    sim.re_map("WWWW\nWLWW\nWWWW")
+    assert all(sim.population.cell == 5)
+    assert sim.landscape["f_max"][6] == 0
+
+
+def test_same_dynamics_as_object_engine():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]}]
+    mean = dict()
+    for engine in BioSim.engines:
+        counts = []
+        for seed in range(1, 6):
+            sim = BioSim(island_map="WWWW\nWLLW\nWWWW", ini_pop=ini_pop, seed=seed, engine=engine)
+            sim.simulate(20, vis_years=0)
+            for _ in range(40):
+                sim.simulate(1, vis_years=0)
+                counts.append(sim.num_animals_per_species["Herbivore"])
+        mean[engine] = np.mean(counts)
+    assert mean["array"] == pytest.approx(mean["object"], rel=0.1)
+
+
+def test_simulate_array_engine():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)] +
+                                      [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(10)]}]
+    sim = make_sim("WWWW\nWLHW\nWWWW", ini_pop)
+    sim.simulate(num_years=20, vis_years=100, img_years=100)
+    sim.get_data()
+    assert sim.data["Herbivore"].shape == (3, 4)
+    assert sum(len(sim.total_age[species]) for species in sim.names) == sim.num_animals
+
+
+def test_population_totals_follow_the_seasons():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)] +
+                                      [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(10)]}]
+    sim = make_sim("WWWW\nWLHW\nWWWW", ini_pop)
+    for _ in range(5):
+        sim.simulate(1, vis_years=0)
+        assert list(sim.population.totals) == list(np.bincount(sim.population.species, minlength=3))
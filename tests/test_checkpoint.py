@@ -0,0 +1,168 @@
+from biosim.checkpoint import *
+from biosim.simulation import BioSim, load as load_biosim
+
+import os
+import pickle
+import struct
+import numpy as np
+import pytest
+
+island_map = "WWWWWW\nWLLHLW\nWLHDLW\nWLLLLW\nWWWWWW"
+ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)] +
+                                  [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]}]
+
+
+def animals(sim):
+    if sim.engine == "array":
+        p = sim.population
+        return list(zip(p.species.tolist(), p.cell.tolist(), p.age.tolist(), p.weight.tolist()))
+    return {(coord, species): [(A.a, A.w, A.phi) for A in herd]
+            for coord, cell in sim.island.items() for species, herd in cell.default.items()}
+
+
+def test_write_read_arrays(tmp_path):
+    arrays = {"a": np.arange(5, dtype=np.int8), "b": np.ones((3, 2)), "empty": np.zeros(0)}
+    write(str(tmp_path / "x.biosim"), {"note": "hi"}, arrays)
+    assert is_checkpoint(str(tmp_path / "x.biosim"))
+    for mmap in (False, True):
+        header, read_back = read(str(tmp_path / "x.biosim"), mmap=mmap)
+        assert header == {"note": "hi"}
+        for name in arrays:
+            assert read_back[name].dtype == arrays[name].dtype
+            assert read_back[name].tolist() == arrays[name].tolist()
+
+
+def test_newer_version_is_refused(tmp_path):
+    write(str(tmp_path / "x.biosim"), {}, {})
+    with open(str(tmp_path / "x.biosim"), "r+b") as file:
+        file.seek(len(magic))
+        file.write(struct.pack("<I", version + 1))
+    with pytest.raises(ValueError):
+        read(str(tmp_path / "x.biosim"))
+
+
+@pytest.mark.parametrize("engine", BioSim.engines)
+def test_checkpoint_continues_the_same(tmp_path, engine):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=3, engine=engine)
+    sim.set_animal_parameters("Herbivore", {"zeta": 3})
+    sim.simulate(4, vis_years=0)
+    sim.save(str(tmp_path), "run")
+    loaded = load_biosim(str(tmp_path / "run.biosim"))
+    assert loaded.year == 4 and loaded.viz is None
+    assert loaded.default_values_species["Herbivore"]["zeta"] == 3
+    assert animals(loaded) == animals(sim)
+    assert loaded.num_animals_per_species == sim.num_animals_per_species
+    sim.simulate(4, vis_years=0)
+    loaded.simulate(4, vis_years=0)
+    assert animals(loaded) == animals(sim)
+
+
+def test_pickled_files_are_refused(tmp_path):
+    with open(str(tmp_path / "old.biosim"), "wb") as file:
+        pickle.dump({"island": {}, "names": ["Herbivore"]}, file)
+    with pytest.raises(ValueError, match="legacy format"):
+        load_biosim(str(tmp_path / "old.biosim"))
+    with pytest.raises(ValueError, match="legacy format"):
+        load_biosim(str(tmp_path / "old.biosim"), lazy=True)
+    with open(str(tmp_path / "bad.biosim"), "wb") as file:
+        file.write(b"not a simulation")
+    with pytest.raises(ValueError):
+        load_biosim(str(tmp_path / "bad.biosim"))
+
+
+def test_names_and_traits_are_kept(tmp_path):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=3)
+    herd = sim.island[(2, 2)].default["Herbivore"]
+    herd[3].name = "Herby McHerbface"
+    herd[7].set_trait("mu", 1)
+    sim.save(str(tmp_path), "traits")
+    herd = load_biosim(str(tmp_path / "traits.biosim")).island[(2, 2)].default["Herbivore"]
+    assert herd[3].name == "Herby McHerbface" and herd[3].traits is None
+    assert herd[7].var["mu"] == 1 and herd[8].var["mu"] == herd[8].params["mu"]
+
+
+@pytest.mark.parametrize("engine", BioSim.engines)
+def test_resume_is_the_same_as_going_on(tmp_path, engine):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=5, engine=engine)
+    policy = Checkpoints(str(tmp_path), years=2, keep=2, base_every=2)
+    sim.simulate(7, vis_years=0, checkpoints=policy)
+    # The delta of year 4 needs the base of year 2. #
+    assert [os.path.basename(file) for file in checkpoints_in(str(tmp_path))] == \
+           (["base-00000002.biosim", "delta-00000004.biosim", "base-00000006.biosim"] if engine == "object"
+            else ["base-00000004.biosim", "base-00000006.biosim"])
+    os.remove(checkpoints_in(str(tmp_path))[-1])
+    resumed = resume(str(tmp_path))
+    assert resumed.year == 4
+    resumed.simulate(3, vis_years=0)
+    assert animals(resumed) == animals(sim)
+    assert resumed.rng.bit_generator.state == sim.rng.bit_generator.state
+
+
+def test_delta_has_only_the_changed_cells(tmp_path):
+    big_map = "\n".join(["W" * 32] + ["W" + "L" * 30 + "W"] * 10 + ["W" * 32])
+    sim = BioSim(island_map=big_map, ini_pop=ini_pop, seed=5)
+    for index in range(sim.island.type.size):
+        sim.island.cell(index)
+    policy = Checkpoints(str(tmp_path), years=1, keep=5)
+    sim.simulate(3, vis_years=0, checkpoints=policy)
+    header, arrays = read(str(tmp_path / "delta-00000003.biosim"))
+    assert header["base"] == "base-00000001.biosim"
+    assert 0 < len(arrays["views"]) < sim.island.type.size
+    assert set(np.flatnonzero(sim.island.occupancy).tolist()) <= set(arrays["cells"].tolist())
+    assert "f_max" not in arrays
+    sim.set_landscape_parameters("L", {"f_max": 500})
+    sim.simulate(1, vis_years=0, checkpoints=policy)
+    resumed = resume(str(tmp_path))
+    assert animals(resumed) == animals(sim)
+    assert resumed.island.f_max.tolist() == sim.island.f_max.tolist()
+    assert resumed.island.food.tolist() == sim.island.food.tolist()
+
+
+def test_policy_needs_years_or_seconds(tmp_path):
+    with pytest.raises(ValueError):
+        Checkpoints(str(tmp_path))
+
+
+@pytest.mark.parametrize("engine", BioSim.engines)
+def test_lazy_cells_are_the_loaded_cells(tmp_path, engine):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=3, engine=engine)
+    sim.simulate(3, vis_years=0)
+    sim.save(str(tmp_path), "run")
+    lazy = load_biosim(str(tmp_path / "run.biosim"), lazy=True)
+    loaded = load_biosim(str(tmp_path / "run.biosim"))
+    assert lazy.year == 3 and lazy.num_animals_per_species == loaded.num_animals_per_species
+    for coord in ((2, 2), (2, 3), (3, 3), (1, 1)):
+        cell = lazy.island[coord]
+        made = {species: [(A.a, A.w, A.phi) for A in herd] for species, herd in cell.default.items()}
+        if engine == "object":
+            assert made == {species: [(A.a, A.w, A.phi) for A in herd]
+                            for species, herd in loaded.island[coord].default.items()}
+            assert cell.count_species == loaded.island[coord].count_species
+        else:
+            p, index = loaded.population, loaded.island.index(coord)
+            assert sorted((species, A) for species, herd in made.items() for A in herd) == sorted(
+                (loaded.names[s], (a, w, phi)) for s, c, a, w, phi in
+                zip(p.species.tolist(), p.cell.tolist(), p.age.tolist(), p.weight.tolist(), p.fitness.tolist())
+                if c == index)
+        assert cell.food == loaded.island[coord].food
+    herbivores = lazy.species("Herbivore")
+    assert len(herbivores["age"]) == lazy.num_animals_per_species["Herbivore"]
+    assert np.all(np.diff(herbivores["cell"]) >= 0)
+    with pytest.raises(KeyError):
+        lazy.island[(9, 9)]
+
+
+def test_lazy_delta_and_names(tmp_path):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=3)
+    sim.island[(2, 2)].default["Herbivore"][3].name = "Herby McHerbface"
+    sim.simulate(2, vis_years=0, checkpoints=Checkpoints(str(tmp_path), years=1))
+    lazy = load_biosim(str(tmp_path / "delta-00000002.biosim"), lazy=True)
+    assert lazy.num_animals == sim.num_animals
+    for coord in sim.island:
+        assert [(A.a, A.w) for herd in lazy.island[coord].default.values() for A in herd] == \
+               [(A.a, A.w) for herd in sim.island[coord].default.values() for A in herd]
+        assert lazy.island[coord].food == sim.island[coord].food
+    names = [A.name for cell in map(lazy.island.__getitem__, sim.island) for herd in cell.default.values()
+             for A in herd if A.name]
+    assert names == [A.name for _, cell in sim.island.views() for herd in cell.default.values() for A in herd
+                     if A.name]
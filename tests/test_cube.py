@@ -0,0 +1,96 @@
+from biosim.cube import *
+from biosim.simulation import BioSim, load
+
+import json
+
+import numpy as np
+import pytest
+
+ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)] +
+                                  [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(2)]}]
+island_map = "WWWWWWW\nWLHLLLW\nWLLDLLW\nWLLLHLW\nWWWWWWW"
+
+
+@pytest.mark.parametrize("codec", codecs)
+def test_years_and_cells_are_the_counts(tmp_path, codec):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2, engine="array")
+    counts = []
+    with CubeWriter(str(tmp_path / "run.cube"), sim, tile=(4, 2, 3), codec=codec) as writer:
+        for _ in range(10):
+            sim.simulate(1, vis_years=0, recorder=writer)
+            sim.get_data()
+            counts.append([sim.data[species] for species in sim.names])
+    counts = np.array(counts)
+    cube = Cube(str(tmp_path / "run.cube"))
+    assert cube.names == sim.names and cube.years.tolist() == list(range(1, 11))
+    assert len(cube.index["blocks"]) == 3 and len(cube.index["blocks"][0]["tiles"]) == 3 * 3
+    for year in (1, 5, 10):
+        assert cube.year(year).tolist() == counts[year - 1].tolist()
+    for coord in ((2, 2), (3, 4), (5, 7)):
+        assert cube.cell(coord).tolist() == counts[:, :, coord[0] - 1, coord[1] - 1].tolist()
+    with pytest.raises(KeyError):
+        cube.year(11)
+    with pytest.raises(KeyError):
+        cube.cell((6, 1))
+
+
+def test_cube_goes_on_after_a_gap(tmp_path):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2)
+    with CubeWriter(str(tmp_path / "run.cube"), sim) as writer:
+        sim.simulate(2, vis_years=0, recorder=writer)
+    sim.simulate(2, vis_years=0)
+    with CubeWriter(str(tmp_path / "run.cube"), sim) as writer:
+        sim.simulate(3, vis_years=0, recorder=writer)
+    cube = Cube(str(tmp_path / "run.cube"))
+    assert cube.years.tolist() == [1, 2, 5, 6, 7]
+    assert cube.year(7).tolist() == sim.island.counts.tolist()
+    assert len(cube.cell((2, 2))) == 5
+    with pytest.raises(KeyError):
+        cube.year(3)
+    with pytest.raises(ValueError):
+        CubeWriter(str(tmp_path / "run.cube"), sim, codec="lzma")
+
+
+def test_years_again_replace_the_years_after_them(tmp_path):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2)
+    sim.simulate(5, vis_years=0)
+    sim.save(str(tmp_path), "start")
+    with CubeWriter(str(tmp_path / "run.cube"), sim, tile=(2, 2, 3)) as writer:
+        sim.simulate(4, vis_years=0, recorder=writer)
+    sim = load(str(tmp_path / "start.biosim"))
+    counts = []
+    with CubeWriter(str(tmp_path / "run.cube"), sim, tile=(2, 2, 3)) as writer:
+        for _ in range(3):
+            sim.simulate(1, vis_years=0, recorder=writer)
+            counts.append(sim.island.counts.copy())
+    cube = Cube(str(tmp_path / "run.cube"))
+    assert cube.years.tolist() == [6, 7, 8]
+    assert [cube.year(year).tolist() for year in (6, 7, 8)] == np.array(counts).tolist()
+    assert cube.cell((2, 2)).tolist() == np.array(counts)[:, :, 1, 1].tolist()
+    with pytest.raises(KeyError):
+        cube.year(9)
+    cube.index["blocks"].reverse()
+    with open(str(tmp_path / "run.cube.json"), "w") as index:
+        json.dump(cube.index, index)
+    with pytest.raises(ValueError):
+        Cube(str(tmp_path / "run.cube"))
+
+
+def test_years_again_in_the_middle_of_a_block(tmp_path):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2)
+    sim.simulate(5, vis_years=0)
+    counts = []
+    with CubeWriter(str(tmp_path / "run.cube"), sim, tile=(2, 2, 2)) as writer:
+        sim.simulate(1, vis_years=0, recorder=writer)
+        counts.append(sim.island.counts.copy())
+        sim.save(str(tmp_path), "six")
+        sim.simulate(3, vis_years=0, recorder=writer)
+    sim = load(str(tmp_path / "six.biosim"))
+    with CubeWriter(str(tmp_path / "run.cube"), sim, tile=(2, 2, 2)) as writer:
+        for _ in range(2):
+            sim.simulate(1, vis_years=0, recorder=writer)
+            counts.append(sim.island.counts.copy())
+    cube = Cube(str(tmp_path / "run.cube"))
+    assert cube.years.tolist() == [6, 7, 8]
+    assert cube.cell((2, 2)).tolist() == np.array(counts)[:, :, 1, 1].tolist()
+    assert [cube.year(year).tolist() for year in (6, 7, 8)] == np.array(counts).tolist()
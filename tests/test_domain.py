@@ -0,0 +1,48 @@
+from biosim.domain import *
+from biosim.simulation import BioSim
+
+import pytest
+
+island_map = "WWWWWWW\nWLLLLLW\nWLHHLLW\nWLLDLLW\nWHHLLLW\nWLLLLHW\nWLLLLLW\nWWWWWWW"
+ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(60)] +
+                                  [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(6)]},
+           {"loc": (6, 5), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)]}]
+
+
+def animals(sim):
+    return {(coord, species): [(A.a, A.w) for A in herd]
+            for coord, cell in sim.island.items() for species, herd in cell.default.items() if herd}
+
+
+@pytest.mark.parametrize("workers, tolerance", [(2, 0.25), (3, 0.)])
+def test_stripes_same_as_serial(workers, tolerance):
+    serial = BioSim(island_map=island_map, ini_pop=ini_pop, seed=4)
+    serial.simulate(8, vis_years=0)
+
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=4)
+    with Stripes(sim, workers=workers, tolerance=tolerance) as stripes:
+        stripes.simulate(4)
+        assert sim.year == 4 and sim.num_animals > 0
+        stripes.simulate(4)
+        assert sim.num_animals_per_species == serial.num_animals_per_species
+    assert animals(sim) == animals(serial)
+    assert (sim.island.counts == serial.island.counts).all()
+    assert sim.island.food.tolist() == serial.island.food.tolist()
+    sim.simulate(2, vis_years=0)
+    serial.simulate(2, vis_years=0)
+    assert animals(sim) == animals(serial)
+
+
+def test_balance_moves_borders():
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=4)
+    with Stripes(sim, workers=2, tolerance=0.) as stripes:
+        assert stripes.bands == [(0, 4), (4, 8)]
+        stripes.balance()
+        assert stripes.bands != [(0, 4), (4, 8)]
+        assert all(first < last for first, last in stripes.bands)
+    assert sim.num_animals_per_species["Herbivore"] == 100
+
+
+def test_stripes_needs_object_engine():
+    with pytest.raises(ValueError):
+        Stripes(BioSim(island_map=island_map, ini_pop=ini_pop, seed=4, engine="array"))
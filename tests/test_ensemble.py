@@ -0,0 +1,42 @@
+from biosim.ensemble import *
+
+import numpy as np
+import pytest
+
+ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(30)] +
+                                  [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(3)]}]
+island_map = "WWWWW\nWLLHW\nWLDLW\nWWWWW"
+
+
+def test_quantile_close_to_exact():
+    x = np.random.default_rng(0).normal(size=(2000, 2)) * [1, 10] + [0, 100]
+    for p in (0.05, 0.5, 0.95):
+        quantile = Quantile(p, 2)
+        for row in x:
+            quantile.add(row)
+        assert quantile.value == pytest.approx(np.quantile(x, p, axis=0), abs=0.5)
+
+
+def test_quantile_exact_for_few_observations():
+    quantile = Quantile(0.5, 1)
+    for x in (3, 1, 2):
+        quantile.add([x])
+    assert quantile.value.tolist() == [2]
+
+
+def test_trajectories_mean_and_animal_years():
+    trajectories = Trajectories(["Herbivore"], 2)
+    trajectories.add({"Herbivore": np.array([10, 20, 30])})
+    trajectories.add({"Herbivore": np.array([20, 40, 0])})
+    assert trajectories.mean["Herbivore"].tolist() == [15, 30, 15]
+    assert trajectories.animal_years == 90
+
+
+def test_run_same_in_processes():
+    here = run(island_map, ini_pop, range(1, 5), 4, workers=0)
+    pool = run(island_map, ini_pop, range(1, 5), 4, workers=2)
+    assert here.n == pool.n == 4
+    for species in here.names:
+        assert here.mean[species].tolist() == pool.mean[species].tolist()
+        assert here.quantile(species, 0.5).tolist() == pool.quantile(species, 0.5).tolist()
+    assert here.mean["Herbivore"][0] == 30 and here.animal_years > 0 and here.rate > 0
@@ -0,0 +1,83 @@
+from biosim.fitness import *
+from biosim.animal import Herbivore, Carnivore
+from biosim.simulation import BioSim
+
+import numpy as np
+import pytest
+
+params = {"a_half": 40, "phi_age": 0.6, "w_half": 10, "phi_weight": 0.1}
+
+
+def formula(a, w, p):
+    if w <= 0:
+        return 0
+    return 1 / (1 + np.exp(p["phi_age"] * (a - p["a_half"]))) / (1 + np.exp(-p["phi_weight"] * (w - p["w_half"])))
+
+
+@pytest.mark.parametrize("a, w", [(0, 8), (5, 20), (40, 10), (300, 50), (1000, 3), (7, 0), (7, -2)])
+def test_phi_one_same_as_formula(a, w):
+    assert phi_one(a, w, params) == pytest.approx(formula(a, w, params))
+
+
+def test_age_table_grows():
+    table = AgeTable(40, 0.6, size=4)
+    assert len(table) == 4
+    assert table[10] == pytest.approx(1 / (1 + np.exp(0.6 * (10 - 40))))
+    assert len(table) > 10
+    table.take(np.array([1, 2, 500]))
+    assert len(table) > 500
+
+
+def test_age_table_cached():
+    assert age_table(40, 0.6) is age_table(40, 0.6)
+
+
+def test_phi_batch_same_as_phi_one():
+    ages = np.array([0, 3, 17, 40, 90])
+    weights = np.array([8., 0., 12.5, 33., 2.])
+    expected = [phi_one(int(a), w, params) for a, w in zip(ages, weights)]
+    assert phi(ages, weights, params) == pytest.approx(expected)
+    assert phi(ages.astype(float), weights, params) == pytest.approx(expected)
+
+
+def test_phi_batch_parameter_arrays():
+    ages = np.array([3, 3])
+    weights = np.array([10., 10.])
+    per_animal = {key: np.array([params[key], 2 * params[key]]) for key in params}
+    expected = [phi_one(3, 10., {key: per_animal[key][i] for key in params}) for i in range(2)]
+    assert phi(ages, weights, per_animal) == pytest.approx(expected)
+
+
+def test_clean_animal_is_not_evaluated():
+    herb = Herbivore(a=5, w=20)
+    assert not herb.dirty
+    herb.phi = 123
+    assert herb.big_phi() == 123
+
+
+@pytest.mark.parametrize("change", ["age", "loss_weight"])
+def test_changed_animal_is_evaluated(change):
+    herb = Herbivore(a=5, w=20)
+    getattr(herb, change)()
+    assert herb.dirty
+    assert herb.big_phi() == pytest.approx(formula(herb.var["a"], herb.var["w"], herb.var))
+    assert not herb.dirty
+
+
+def test_big_phi_is_kept():
+    herb = Herbivore(a=5, w=20)
+    herb.w = 40
+    herb.dirty = True
+    first = herb.big_phi()
+    assert herb.big_phi() == first == herb.phi
+    assert first == pytest.approx(formula(5, 40, herb.var))
+
+
+def test_set_parameters_invalidates():
+    sim = BioSim(island_map="WWW\nWLW\nWWW", ini_pop=[{"loc": (2, 2), "pop": [
+        {"species": "Carnivore", "age": 5, "weight": 20}]}], seed=1)
+    sim.set_animal_parameters("Carnivore", {"a_half": 2})
+    carn = sim.island[(2, 2)].default["Carnivore"][0]
+    assert carn.big_phi() == pytest.approx(formula(5, 20, carn.var))
+    sim.set_animal_parameters("Carnivore", {"a_half": 40})
+    assert carn.big_phi() == pytest.approx(formula(5, 20, carn.var))
@@ -0,0 +1,67 @@
+from biosim.grazing import *
+from biosim.logic import season_grazing, season_feeding
+from biosim.animal import Herbivore
+from biosim.simulation import BioSim
+
+import numpy as np
+import pytest
+
+
+def test_intake_takes_turns():
+    eaten, ate = intake([25], [10, 10, 10, 10], [0])
+    assert eaten == pytest.approx([10, 10, 5, 0])
+    assert list(ate) == [True, True, True, False]
+
+
+def test_intake_keeps_cells_apart():
+    eaten, ate = intake([15, 100, 0], [10, 10, 10, 10, 10], [0, 2, 4])
+    assert eaten == pytest.approx([10, 5, 10, 10, 0])
+    assert list(ate) == [True, True, True, True, False]
+
+
+class CellTest:
+    stripe = 0
+
+    def __init__(self, food, n):
+        self.food = food
+        self.default = {"Herbivore": [Herbivore(a=5, w=100) for _ in range(n)]}
+
+
+def test_grazing_shares_last_food():
+    cell = CellTest(25, 5)
+    season_feeding(cell)
+    assert cell.food == 0
+    assert sorted(h.w for h in cell.default["Herbivore"]) == pytest.approx([100, 100, 104.5, 109, 109])
+
+
+def test_grazing_many_cells_at_once():
+    cells = [CellTest(800, 3), CellTest(0, 2), CellTest(15, 2)]
+    season_grazing(cells)
+    assert [cell.food for cell in cells] == pytest.approx([770, 0, 0])
+    assert [w for cell in cells for w in sorted(h.w for h in cell.default["Herbivore"])] == \
+        pytest.approx([109, 109, 109, 100, 100, 104.5, 109])
+
+
+def test_grazers_fitness_is_re_evaluated():
+    cell = CellTest(800, 4)
+    season_grazing([cell])
+    for herb in cell.default["Herbivore"]:
+        assert herb.phi == pytest.approx(Herbivore(a=5, w=herb.w).phi)
+        assert not herb.dirty
+
+
+def test_refit_with_traits():
+    herbs = [Herbivore(a=5, w=20) for _ in range(3)]
+    herbs[1].set_trait("w_half", 40)
+    Herbivore.refit(herbs)
+    assert herbs[0].phi == pytest.approx(herbs[2].phi)
+    assert herbs[1].phi < herbs[0].phi
+
+
+def test_object_engine_grazes_whole_island():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 100} for _ in range(2)]},
+               {"loc": (2, 3), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 100} for _ in range(3)]}]
+    sim = BioSim(island_map="WWWW\nWLHW\nWWWW", ini_pop=ini_pop, seed=1234)
+    season_grazing(list(sim.island.values()))
+    assert sim.island[(2, 2)].food == 780
+    assert sim.island[(2, 3)].food == 270
@@ -0,0 +1,142 @@
+from biosim.island import *
+from biosim.logic import season_end
+from biosim.simulation import BioSim
+
+import numpy as np
+import pytest
+
+
+def test_cells_are_views_of_the_grid():
+    grid = Grid([[0, 0, 0], [0, 3, 0], [0, 0, 0]], ["Herbivore"])
+    cell = grid[(2, 2)]
+    assert cell is grid[(2, 2)]
+    cell.food = 12
+    assert grid.food[1, 1] == 12
+    grid.food[1, 1] = 30
+    assert cell.food == 30
+
+
+def test_grid_is_like_a_dict():
+    grid = Grid([[0, 0, 0], [0, 3, 0], [0, 0, 0]], ["Herbivore"])
+    assert len(grid) == 9
+    assert list(grid)[:2] == [(1, 1), (1, 2)]
+    assert (3, 3) in grid and (4, 1) not in grid
+    with pytest.raises(KeyError):
+        grid[(0, 1)]
+
+
+def test_season_end_resets_all_food():
+    sim = BioSim(island_map="WWWW\nWLHW\nWWWW", ini_pop=[], seed=1)
+    sim.island.food[...] = 0
+    season_end(sim.island)
+    assert sim.island.food.tolist() == sim.island.f_max.tolist()
+    assert sim.island.views() == []
+
+
+def test_counts_per_species():
+    ini_pop = [{"loc": (2, 3), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(4)] +
+                                      [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(2)]}]
+    sim = BioSim(island_map="WWWW\nWLHW\nWWWW", ini_pop=ini_pop, seed=1)
+    sim.island.count()
+    herb = sim.names.index("Herbivore")
+    assert sim.island.counts[herb].tolist() == [[0, 0, 0, 0], [0, 0, 4, 0], [0, 0, 0, 0]]
+    assert sim.island[(2, 3)].count_species["Carnivore"] == 2
+
+
+def test_standalone_cells():
+    cell = Cells(2, [4, 5], ["Herbivore"])
+    assert cell.f_max == 300 and cell.food == 300 and cell.type == 2
+
+
+def test_counts_follow_the_seasons():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)] +
+                                      [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]}]
+    sim = BioSim(island_map="WWWWW\nWLLHW\nWLLDW\nWWWWW", ini_pop=ini_pop, seed=3)
+    for _ in range(10):
+        sim.simulate(1, vis_years=0)
+        counts, totals = sim.island.counts.copy(), sim.num_animals_per_species
+        sim.island.count()
+        assert (counts == sim.island.counts).all()
+        assert totals == {species: sum(len(cell.default.get(species, [])) for _, cell in sim.island.views())
+                          for species in sim.names}
+
+
+def test_get_data_from_recorded_statistics():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)]}]
+    sim = BioSim(island_map="WWWW\nWLLW\nWWWW", ini_pop=ini_pop, seed=3)
+    sim.simulate(3, vis_years=0)
+    sim.get_data()
+    assert len(sim.total_age["Herbivore"]) == sim.num_animals_per_species["Herbivore"]
+    assert sorted(sim.total_weight["Herbivore"]) == pytest.approx(
+        sorted(h.w for _, cell in sim.island.views() for h in cell.default["Herbivore"]))
+    assert len(sim.total_age["Carnivore"]) == 0
+
+
+@pytest.mark.parametrize("engine", BioSim.engines)
+def test_histograms_are_the_counts_of_the_values(engine):
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)] +
+                                      [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]}]
+    sim = BioSim(island_map="WWWWW\nWLLLW\nWWWWW", ini_pop=ini_pop, seed=3, engine=engine)
+    sim.simulate(4, vis_years=0)
+    specs = {"age": {"max": 6, "delta": 1}, "weight": {"max": 30, "delta": 2}, "fitness": {"max": 1.0, "delta": 0.05}}
+    counts, edges = sim.histograms(specs)
+    sim.get_data()
+    for key, values in (("age", sim.total_age), ("weight", sim.total_weight), ("fitness", sim.total_fitness)):
+        assert len(edges[key]) == specs[key]["max"] / specs[key]["delta"] + 1
+        for species in sim.names:
+            expected = np.histogram(np.minimum(values[species], specs[key]["max"]), edges[key])[0]
+            assert counts[key][species].tolist() == expected.tolist()
+    with pytest.raises(ValueError):
+        sim.histograms({"length": {"max": 1, "delta": 1}})
+
+
+def test_bins_and_sums_follow_the_seasons():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)] +
+                                      [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]}]
+    specs = {"age": {"max": 6, "delta": 1}}
+    sim = BioSim(island_map="WWWWW\nWLLHW\nWLLDW\nWWWWW", ini_pop=ini_pop, seed=3, hist_specs=specs)
+    island = sim.island
+    for _ in range(10):
+        sim.simulate(1, vis_years=0)
+        bins, sums = {key: island.bins[key].copy() for key in island.properties}, island.sums.copy()
+        counts, edges = sim.histograms(island.hist_specs)
+        sim.get_data()
+        for key, values in (("age", sim.total_age), ("weight", sim.total_weight), ("fitness", sim.total_fitness)):
+            for i, species in enumerate(sim.names):
+                expected = np.histogram(np.minimum(values[species], island.hist_specs[key]["max"]), edges[key])[0]
+                assert bins[key][i].tolist() == counts[key][species].tolist() == expected.tolist()
+        island.count()
+        assert all((bins[key] == island.bins[key]).all() for key in island.properties)
+        assert sums == pytest.approx(island.sums)
+    assert len(edges["age"]) == 7
+    herd = island[(2, 2)].default["Herbivore"]
+    assert island.sums[:, sim.names.index("Herbivore"), 1, 1] == pytest.approx(
+        [sum(h.a for h in herd), sum(h.w for h in herd), sum(h.phi for h in herd)])
+    for species in sim.names:
+        island[(2, 2)].tally(species, -island[(2, 2)].count_species[species])
+    assert not island.sums[:, :, 1, 1].any()
+    assert island.bins["age"].sum(axis=1).tolist() == island.totals.tolist()
+
+
+def test_active_cells_follow_the_animals():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)]}]
+    sim = BioSim(island_map="WWWWW\nWLLLW\nWLLLW\nWWWWW", ini_pop=ini_pop, seed=3)
+    assert [cell.coord for _, cell in sim.island.occupied()] == [[2, 2]]
+    for _ in range(5):
+        sim.simulate(1, vis_years=0)
+        assert sim.island.active == set(np.flatnonzero(sim.island.counts.sum(axis=0)).tolist())
+    sim.island[(2, 2)].tally("Herbivore", -sim.island[(2, 2)].count_species["Herbivore"])
+    assert sim.island.index((2, 2)) not in sim.island.active
+
+
+def test_food_grows_back_lazily():
+    grid = Grid([[0, 2], [3, 3]], ["Herbivore"])
+    grid[(2, 1)].food = 10
+    grid.reset_food()
+    assert grid.stamp.tolist() == [[0, 0], [0, 0]]
+    assert grid[(2, 1)].food == 800 and grid.stamp[1, 0] == 1
+    grid[(2, 2)].food = 5
+    grid.set_f_max(3, 100)
+    assert grid.food.tolist() == [[0, 300], [800, 5]]
+    grid.reset_food()
+    assert grid.food.tolist() == [[0, 300], [100, 100]]
@@ -1,6 +1,8 @@
 from biosim.logic import *
 from biosim.simulation import *
 
+import numpy as np
+import threading
 import pytest
 
 
@@ -370,3 +372,59 @@ def test_death_multi_species(n_herb, n_carn):
     the_map = sim.island
     season_ageing(the_map[(2, 2)])
     assert len(the_map[(2, 2)].default["Herbivore"]) == 0 and len(the_map[(2, 2)].default["Carnivore"]) == 0
+
+
+def test_breeding_same_generator_same_births():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 40} for _ in range(50)]}]
+    sizes = []
+    for _ in range(2):
+        sim = BioSim(island_map="WWW\nWLW\nWWW", ini_pop=ini_pop)
+        season_breeding(sim.island[(2, 2)], np.random.default_rng(7))
+        sizes.append(sorted(herb.w for herb in sim.island[(2, 2)].default["Herbivore"]))
+    assert sizes[0] == sizes[1]
+    assert len(sizes[0]) > 50
+
+
+def test_mothers_lose_weight_of_child():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 100} for _ in range(2)]}]
+    sim = BioSim(island_map="WWW\nWLW\nWWW", ini_pop=ini_pop, seed=1234)
+    sim.set_animal_parameters("Herbivore", {"gamma": 1000})
+    season_breeding(sim.island[(2, 2)], np.random.default_rng(1))
+    mothers, new_born = sim.island[(2, 2)].default["Herbivore"][:2], sim.island[(2, 2)].default["Herbivore"][2:]
+    for mother, child in zip(mothers, new_born):
+        assert mother.w == pytest.approx(100 - 1.2 * child.w)
+        assert mother.phi == pytest.approx(Herbivore(a=5, w=mother.w).phi)
+        assert child.a == 0 and child.params is mother.params
+
+
+def test_ageing_uses_traits():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(3)]}]
+    sim = BioSim(island_map="WWW\nWLW\nWWW", ini_pop=ini_pop, seed=1234)
+    sim.set_animal_parameters("Herbivore", {"omega": 0})
+    sim.island[(2, 2)].default["Herbivore"][0].set_trait("eta", 0.5)
+    season_ageing(sim.island[(2, 2)], np.random.default_rng(1))
+    assert [herb.w for herb in sim.island[(2, 2)].default["Herbivore"]] == pytest.approx([10, 19, 19])
+    assert all(herb.a == 6 for herb in sim.island[(2, 2)].default["Herbivore"])
+
+
+def test_threads_same_as_serial():
+    island_map = "WWWWWWW\nWLLLLLW\nWLHHLLW\nWLLDLLW\nWHHLLLW\nWWWWWWW"
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(60)] +
+                                      [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(6)]},
+               {"loc": (5, 5), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(40)]}]
+    serial = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2)
+    threaded = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2, threads=3)
+    serial.simulate(10, vis_years=0)
+    threaded.simulate(10, vis_years=0)
+    assert threaded.num_animals_per_species == serial.num_animals_per_species
+    assert [sorted(A.w for A in cell.default.get("Herbivore", [])) for cell in threaded.island.values()] == \
+        [sorted(A.w for A in cell.default.get("Herbivore", [])) for cell in serial.island.values()]
+
+
+def test_threads_are_shut_down():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)]}]
+    sim = BioSim(island_map="WWWWW\nWLLLW\nWLLLW\nWWWWW", ini_pop=ini_pop, seed=2, threads=3)
+    before = set(threading.enumerate())
+    sim.simulate(3, vis_years=0)
+    year_cycle(sim.island, sim.illegal_coord, sim.streams, sim.year, threads=2)
+    assert set(threading.enumerate()) == before
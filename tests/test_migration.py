@@ -0,0 +1,50 @@
+from biosim.migration import *
+from biosim.logic import season_migration
+from biosim.simulation import BioSim
+
+import numpy as np
+import pytest
+
+
+def test_neighbour_table_ignores_water():
+    legal = np.array([[False, False, False],
+                      [False, True, True],
+                      [False, True, False]])
+    table = neighbour_table(legal)
+    # Cell index 4 is (2, 2): north is (3, 2), south and west are water, east is (2, 3). #
+    assert list(table[4]) == [7, 4, 4, 5]
+    assert list(table[5]) == [5, 5, 4, 5]
+
+
+def test_neighbour_table_stays_on_map():
+    table = neighbour_table(np.ones((2, 2), dtype=bool))
+    assert list(table[0]) == [2, 0, 0, 1]
+    assert list(table[3]) == [3, 1, 2, 3]
+
+
+def test_grid_neighbours():
+    sim = BioSim(island_map="WWWW\nWLLW\nWWWW", ini_pop=[], seed=1234)
+    assert sim.island.neighbours.shape == (12, 4)
+    assert list(sim.island.neighbours[5]) == [5, 5, 5, 6]
+
+
+def test_animals_move_at_most_once():
+    ini_pop = [{"loc": (4, 4), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 100} for _ in range(200)]}]
+    sim = BioSim(island_map="\n".join(["W" * 7] + ["W" + "L" * 5 + "W"] * 5 + ["W" * 7]), ini_pop=ini_pop, seed=1)
+    sim.set_animal_parameters("Herbivore", {'mu': 100, 'a_half': 1000})
+    season_migration(sim.island, sim.illegal_coord, np.random.default_rng(1))
+    counts = {coord: len(cell.default.get("Herbivore", [])) for coord, cell in sim.island.items()}
+    assert sum(counts.values()) == 200
+    assert {coord for coord in counts if counts[coord]} == {(5, 4), (3, 4), (4, 3), (4, 5)}
+    for coord, cell in sim.island.items():
+        assert all(tuple(herb.coord) == coord for herb in cell.default.get("Herbivore", []))
+
+
+def test_migration_only_makes_cells_it_moves_to():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 100} for _ in range(50)]}]
+    sim = BioSim(island_map="WWWWW\nWLLLW\nWWWWW", ini_pop=ini_pop, seed=1)
+    sim.set_animal_parameters("Herbivore", {'mu': 100, 'a_half': 1000})
+    season_migration(sim.island, sim.illegal_coord, np.random.default_rng(3))
+    assert [cell.coord for _, cell in sim.island.views()] == [[2, 2], [2, 3]]
+    assert 0 < len(sim.island[(2, 3)].default["Herbivore"]) < 50
+    assert sim.num_animals == 50
@@ -0,0 +1,49 @@
+from biosim.movie import *
+from biosim.simulation import BioSim
+
+import shutil
+
+import matplotlib.pyplot as plt
+import pytest
+
+ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)] +
+                                  [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(2)]}]
+island_map = "WWWWW\nWLHLW\nWLLLW\nWWWWW"
+
+
+def test_archive_has_the_frames_of_the_images(tmp_path):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2, img_base=str(tmp_path / "img"))
+    sim.simulate(3, vis_years=1, img_years=1)
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2)
+    with MovieWriter(str(tmp_path / "run.mp4"), encoder=None) as movie:
+        sim.simulate(3, vis_years=1, img_years=1, movie=movie)
+    assert sorted(path.name for path in tmp_path.iterdir()) == \
+        ["img_00000.png", "img_00001.png", "img_00002.png", "run.mp4.rgb", "run.mp4.rgb.json"]
+    archive = frames(str(tmp_path / "run.mp4.rgb"))
+    assert archive.shape == (3, 1000, 1000, 3)
+    for number in range(3):
+        image = plt.imread(str(tmp_path / "img_{:05d}.png".format(number)))[:, :, :3]
+        assert (archive[number] == (image * 255).round()).all()
+
+
+def test_frames_of_another_size(tmp_path):
+    with MovieWriter(str(tmp_path / "run.gif"), encoder=None) as movie:
+        movie.write(np.zeros((10, 10, 4), dtype=np.uint8))
+        with pytest.raises(ValueError):
+            movie.write(np.zeros((10, 12, 4), dtype=np.uint8))
+    assert frames(str(tmp_path / "run.gif.rgb")).shape == (1, 10, 10, 3)
+    with pytest.raises(ValueError):
+        MovieWriter(str(tmp_path / "run.avi"))
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_encoder_and_archive_make_a_movie(tmp_path):
+    frame = np.zeros((32, 48, 4), dtype=np.uint8)
+    with MovieWriter(str(tmp_path / "piped.mp4")) as movie:
+        for value in range(5):
+            movie.write(frame + value * 40)
+    with MovieWriter(str(tmp_path / "later.mp4"), encoder=None) as movie:
+        for value in range(5):
+            movie.write(frame + value * 40)
+    assert encode(str(tmp_path / "later.mp4.rgb")) == str(tmp_path / "later.mp4")
+    assert (tmp_path / "piped.mp4").stat().st_size > 0 and (tmp_path / "later.mp4").stat().st_size > 0
@@ -0,0 +1,114 @@
+from biosim.predation import *
+from biosim.logic import season_feeding
+from biosim.animal import Herbivore, Carnivore, Snake
+from biosim.island import Cells
+from biosim.simulation import BioSim
+
+import numpy as np
+import pytest
+
+
+class Counter:
+    def __init__(self, value=0.):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def test_herd_is_sorted_weakest_first():
+    herd = Herd([0.5, 0.1, 0.3], [10, 20, 30])
+    assert herd.phi == [0.1, 0.3, 0.5]
+    assert herd.w == [20, 30, 10]
+    assert herd.n_alive == 3
+
+
+def test_predator_stops_at_prey_as_fit_as_itself():
+    herd = Herd([0.1, 0.2, 0.6, 0.7, 0.8], [1] * 5)
+    draw = Counter(value=0.99)
+    herd.feed(0.6, 50, 0.75, 10, lambda gain: 0.6, draw)
+    assert draw.calls == 2
+    assert herd.n_alive == 5
+
+
+def test_kill_stops_hungry_predator():
+    herd = Herd([0.1, 0.2, 0.3], [10, 10, 10])
+    gained = []
+    herd.feed(0.9, 50, 0.75, 0.001, lambda gain: gained.append(gain) or 0.9, Counter())
+    assert gained == [7.5]
+    assert herd.dead() == [0]
+
+
+def test_full_predator_keeps_killing():
+    herd = Herd([0.1, 0.2, 0.3], [50, 10, 10])
+    gained = []
+    herd.feed(0.9, 50, 0.75, 0.001, lambda gain: gained.append(gain) or 0.9, Counter())
+    assert gained == [37.5, 0, 0]
+    assert herd.n_alive == 0
+
+
+def test_next_predator_skips_dead_prey():
+    herd = Herd([0.3, 0.1, 0.2], [10, 10, 10])
+    herd.feed(0.9, 50, 0.75, 0.001, lambda gain: 0.9, Counter())
+    draw = Counter(value=1.)
+    herd.feed(0.9, 50, 0.75, 0.001, lambda gain: 0.9, draw)
+    assert draw.calls == 2
+    assert herd.dead() == [1]
+    assert herd.survivors(["a", "b", "c"]) == ["a", "c"]
+
+
+def test_random_block_draws_numbers_in_order():
+    draw = random_block(np.random.default_rng(1), size=3).__next__
+    numbers = [draw() for _ in range(7)]
+    assert numbers == pytest.approx(np.random.default_rng(1).random(9)[:7])
+
+
+def make_cell(default):
+    cell = Cells(1, [2, 2], ["Carnivore", "Herbivore", "Snake"])
+    cell.default = default
+    cell.grid.count()
+    return cell
+
+
+def test_season_feeding_removes_dead_herbivores_once():
+    cell = make_cell({"Herbivore": [Herbivore(a=1, w=1) for _ in range(10)],
+                      "Carnivore": [Carnivore(a=5, w=100) for _ in range(3)]})
+    herbivores = list(cell.default["Herbivore"])
+    for carn in cell.default["Carnivore"]:
+        carn.set_trait("DeltaPhiMax", 0.001)
+    season_feeding(cell)
+    assert len(cell.default["Herbivore"]) == 7
+    assert cell.count_species["Herbivore"] == 7
+    assert all(herb.life for herb in cell.default["Herbivore"])
+    assert sum(not herb.life for herb in herbivores) == 3
+
+
+def test_snakes_hunt_the_same_herd():
+    cell = make_cell({"Herbivore": [Herbivore(a=1, w=1) for _ in range(4)],
+                      "Carnivore": [Carnivore(a=5, w=100)],
+                      "Snake": [Snake(a=5, w=100) for _ in range(2)]})
+    for predator in cell.default["Carnivore"] + cell.default["Snake"]:
+        predator.set_trait("DeltaPhiMax", 0.001)
+    season_feeding(cell)
+    assert len(cell.default["Herbivore"]) == 1
+    assert [snake.w for snake in cell.default["Snake"]] == pytest.approx([100.75, 100.75])
+
+
+def test_both_engines_hunt_alike():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(100)] +
+                                      [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(10)]}]
+    survivors = dict()
+    for engine in BioSim.engines:
+        survivors[engine] = []
+        for seed in range(1, 11):
+            sim = BioSim(island_map="WWW\nWLW\nWWW", ini_pop=ini_pop, seed=seed, engine=engine)
+            sim.set_landscape_parameters("L", {"f_max": 0})
+            if engine == "array":
+                from biosim.array_logic import season_feeding as array_feeding
+                array_feeding(sim.population, sim.landscape, sim.params, sim.rng)
+            else:
+                season_feeding(sim.island[(2, 2)])
+            survivors[engine].append(sim.num_animals_per_species["Herbivore"])
+    assert np.mean(survivors["array"]) == pytest.approx(np.mean(survivors["object"]), rel=0.1)
@@ -0,0 +1,61 @@
+from biosim.recorder import *
+from biosim.simulation import BioSim, load
+
+import numpy as np
+import pytest
+
+ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)] +
+                                  [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(2)]}]
+island_map = "WWWWW\nWLHLW\nWWWWW"
+
+
+@pytest.mark.parametrize("engine", BioSim.engines)
+def test_every_year_is_recorded_in_chunks(tmp_path, engine):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2, engine=engine)
+    totals, densities = [], []
+    with Recorder(str(tmp_path), sim, histograms={"weight": {"max": 60, "delta": 2}}, chunk_years=4) as recorder:
+        for _ in range(10):
+            sim.simulate(1, vis_years=0, recorder=recorder)
+            totals.append(list(sim.num_animals_per_species.values()))
+            sim.get_data()
+            densities.append([np.array(sim.data[species]) for species in sim.names])
+        assert recorder.n == 2
+    assert len(list(tmp_path.glob("chunk-*.npz"))) == 3
+    recording, manifest = load_recording(str(tmp_path))
+    assert manifest["names"] == sim.names and manifest["shape"] == [3, 5]
+    assert recording["year"].tolist() == list(range(1, 11))
+    assert recording["totals"].tolist() == totals
+    assert recording["densities"].tolist() == np.array(densities).tolist()
+    assert recording["weight"].shape == (10, len(sim.names), 30)
+    assert recording["weight"].sum(axis=2).tolist() == totals
+
+
+def test_recording_goes_on_in_the_same_folder(tmp_path):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2)
+    with Recorder(str(tmp_path), sim, densities=False) as recorder:
+        sim.simulate(3, vis_years=0, recorder=recorder)
+    with Recorder(str(tmp_path), sim, densities=False) as recorder:
+        sim.simulate(2, vis_years=0, recorder=recorder)
+    assert load_recording(str(tmp_path))[0]["year"].tolist() == [1, 2, 3, 4, 5]
+    os.remove(str(tmp_path / "chunk-00000.npz"))
+    with Recorder(str(tmp_path), sim, densities=False) as recorder:
+        sim.simulate(1, vis_years=0, recorder=recorder)
+    assert load_recording(str(tmp_path))[0]["year"].tolist() == [4, 5, 6]
+    with pytest.raises(ValueError):
+        Recorder(str(tmp_path), sim)
+    with pytest.raises(ValueError):
+        Recorder(str(tmp_path / "other"), sim, histograms={"colour": {"max": 1, "delta": 1}})
+
+
+def test_years_again_replace_the_years_after_them(tmp_path):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2)
+    sim.simulate(5, vis_years=0)
+    sim.save(str(tmp_path), "start")
+    with Recorder(str(tmp_path / "run"), sim, chunk_years=2) as recorder:
+        sim.simulate(4, vis_years=0, recorder=recorder)
+        sim = load(str(tmp_path / "start.biosim"))
+        sim.simulate(3, vis_years=0, recorder=recorder)
+    recording, _ = load_recording(str(tmp_path / "run"))
+    assert recording["year"].tolist() == [6, 7, 8]
+    assert recording["totals"][-1].tolist() == list(sim.num_animals_per_species.values())
+    assert load_recording(str(tmp_path / "run"), years=(7, 9))[0]["year"].tolist() == [7, 8]
@@ -0,0 +1,36 @@
+from biosim.recorder import Recorder
+from biosim.replay import *
+from biosim.simulation import BioSim
+
+import matplotlib.pyplot as plt
+
+ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)] +
+                                  [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(2)]}]
+island_map = "WWWWW\nWLHLW\nWLLLW\nWWWWW"
+
+
+def test_frames_are_the_same_in_workers(tmp_path):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2, engine="array")
+    with Recorder(str(tmp_path / "run"), sim, histograms={"weight": {"max": 60, "delta": 2}}) as recorder:
+        sim.simulate(5, vis_years=0, recorder=recorder)
+    assert render(str(tmp_path / "run"), str(tmp_path / "serial" / "img"), workers=0, chunk_frames=2) == 5
+    assert render(str(tmp_path / "run"), str(tmp_path / "pool" / "img"), workers=2, chunk_frames=2) == 5
+    for number in range(5):
+        serial = plt.imread(str(tmp_path / "serial" / "img_{:05d}.png".format(number)))
+        assert (serial == plt.imread(str(tmp_path / "pool" / "img_{:05d}.png".format(number)))).all()
+    assert render(str(tmp_path / "run"), str(tmp_path / "some" / "img"), years=[2, 4, 9], workers=0) == 2
+    assert sorted(path.name for path in (tmp_path / "some").iterdir()) == ["img_00000.png", "img_00001.png"]
+
+
+def test_workers_only_read_their_years(tmp_path, monkeypatch):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2, engine="array")
+    with Recorder(str(tmp_path / "run"), sim, chunk_years=2) as recorder:
+        sim.simulate(6, vis_years=0, recorder=recorder)
+    read = []
+
+    def recording(path, densities=True, years=None):
+        read.append(years)
+        return load_recording(path, densities, years)
+    monkeypatch.setattr("biosim.replay.load_recording", recording)
+    assert render(str(tmp_path / "run"), str(tmp_path / "img"), workers=0, chunk_frames=2) == 6
+    assert read == [None, (1, 2), (3, 4), (5, 6)]
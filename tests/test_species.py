@@ -0,0 +1,94 @@
+from biosim.species import *
+from biosim.animal import Herbivore, Carnivore
+from biosim.logic import season_breeding
+from biosim.simulation import BioSim
+
+import pytest
+
+
+@pytest.fixture
+def sim():
+    ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 100} for _ in range(5)] +
+                                      [{'species': 'Carnivore', 'age': 5, 'weight': 100} for _ in range(3)]}]
+    return BioSim(island_map="WWW\nWLW\nWWW", ini_pop=ini_pop, seed=1234)
+
+
+def test_animals_share_parameters(sim):
+    herds = sim.island[(2, 2)].default["Herbivore"]
+    assert all(herb.var.params is sim.default_values_species["Herbivore"] for herb in herds)
+
+
+def test_only_state_is_stored(sim):
+    herb = sim.island[(2, 2)].default["Herbivore"][0]
+    assert set(herb.var) == {"coord", "w", "a", "life", "phi"}
+    assert herb.var["beta"] == 0.9
+
+
+def test_set_parameters_reaches_every_animal(sim):
+    sim.set_animal_parameters("Herbivore", {"beta": 20, "mu": 0.5})
+    assert all(herb.var["beta"] == 20 and herb.var["mu"] == 0.5
+               for herb in sim.island[(2, 2)].default["Herbivore"])
+    assert all(carn.var["beta"] == 0.75 for carn in sim.island[(2, 2)].default["Carnivore"])
+
+
+def test_newborns_use_species_parameters(sim):
+    sim.set_animal_parameters("Herbivore", {"gamma": 1000, "beta": 3})
+    season_breeding(sim.island[(2, 2)])
+    herds = sim.island[(2, 2)].default["Herbivore"]
+    assert len(herds) == 10
+    assert all(herb.var["beta"] == 3 for herb in herds)
+
+
+def test_trait_only_on_one_animal(sim):
+    first, second = sim.island[(2, 2)].default["Herbivore"][:2]
+    first.var["mu"] = 1
+    assert first.var.traits() == {"mu": 1}
+    assert second.var.traits() == {}
+    assert second.var["mu"] == 0.25
+
+
+def test_simulations_do_not_share_parameters(sim):
+    other = BioSim(island_map="WWW\nWLW\nWWW", ini_pop=[], seed=1)
+    other.set_animal_parameters("Herbivore", {"beta": 20})
+    assert sim.default_values_species["Herbivore"]["beta"] == 0.9
+    assert Herbivore(a=1, w=10).var["beta"] == 0.9
+
+
+def test_fitness_parameter_bumps_version():
+    params = SpeciesParameters(Herbivore.default_var)
+    params.update({"beta": 2})
+    assert params.version == 0
+    params.update({"a_half": 2})
+    assert params.version == 1
+
+
+def test_carnivore_keeps_appetite_to_itself():
+    class HerbTest:
+        def __init__(self):
+            self.default = {"Herbivore": [Herbivore(a=1, w=1)]}
+
+    pred = Carnivore(a=5, w=100)
+    pred.var["phi"] = 20
+    pred.eat(HerbTest())
+    assert pred.var.traits() == {}
+
+
+def test_animals_have_no_dict():
+    for species in (Herbivore, Carnivore):
+        assert not hasattr(species(a=1, w=10), "__dict__")
+
+
+def test_var_view_writes_state():
+    herb = Herbivore(a=1, w=10)
+    herb.var["w"] += 5
+    assert herb.w == 15 and herb.dirty
+    herb.var["phi"] = 0.5
+    assert herb.phi == 0.5
+
+
+def test_trait_used_by_animal():
+    herb = Herbivore(a=1, w=10)
+    herb.var["eta"] = 0.5
+    herb.loss_weight()
+    assert herb.w == 5
+    assert Herbivore(a=1, w=10).var["eta"] == 0.05
@@ -0,0 +1,41 @@
+from biosim.streams import *
+from biosim.simulation import BioSim
+
+import random
+import numpy as np
+import pytest
+
+ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)] +
+                                  [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]}]
+island_map = "WWWWW\nWLLHW\nWLDLW\nWWWWW"
+
+
+def test_same_key_same_numbers():
+    streams = Streams(12)
+    assert streams.generator(3, MIGRATION, 1).random(5).tolist() == \
+        Streams(12).generator(3, MIGRATION, 1).random(5).tolist()
+    assert streams.generator(3, MIGRATION, 1).random() != streams.generator(3, MIGRATION, 2).random()
+    assert streams.generator().random() == np.random.default_rng(12).random()
+
+
+def test_stripes_are_made_once():
+    stripe = Streams(1).stripes(0, AGEING)
+    assert stripe(4) is stripe(4)
+    assert stripe(4).random() == Streams(1).generator(0, AGEING, 4).random()
+
+
+@pytest.mark.parametrize("engine", BioSim.engines)
+def test_simulations_do_not_share_random_numbers(engine):
+    alone = BioSim(island_map=island_map, ini_pop=ini_pop, seed=5, engine=engine)
+    alone.simulate(5, vis_years=0)
+
+    random.seed(1)
+    expected = random.random()
+    random.seed(1)
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=5, engine=engine)
+    other = BioSim(island_map=island_map, ini_pop=ini_pop, seed=6, engine=engine)
+    for _ in range(5):
+        sim.simulate(1, vis_years=0)
+        other.simulate(1, vis_years=0)
+    assert random.random() == expected
+    assert sim.num_animals_per_species == alone.num_animals_per_species
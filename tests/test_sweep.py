@@ -0,0 +1,54 @@
+from biosim.sweep import *
+
+import numpy as np
+import pytest
+
+ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)] +
+                                  [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(2)]}]
+island_map = "WWWW\nWLHW\nWWWW"
+
+
+def test_expand_every_combination():
+    jobs = expand({"Herbivore": {"zeta": [3, 4], "xi": [1.2]}}, {"L": {"f_max": np.linspace(500, 800, 3)}},
+                  seeds=[1, 2])
+    assert len(jobs) == 2 * 3 * 2
+    assert jobs[0] == {"seed": 1, "animal_params": {"Herbivore": {"xi": 1.2, "zeta": 3}},
+                       "landscape_params": {"L": {"f_max": 500}}}
+    assert jobs[-1]["landscape_params"]["L"]["f_max"] == 800 and jobs[-1]["seed"] == 2
+
+
+def test_sweep_rows_per_job_year_and_species(tmp_path):
+    jobs = expand({"Herbivore": {"zeta": [3, 4]}}, seeds=[1, 2])
+    assert sweep(island_map, ini_pop, jobs, 3, str(tmp_path), workers=0, chunk_jobs=3) == 4
+    results, manifest = load_results(str(tmp_path))
+    n_species = len(manifest["names"])
+    assert len(results["job"]) == 4 * 4 * n_species
+    assert len(list(tmp_path.glob("chunk-*.npz"))) == 2
+    start = results["count"][(results["year"] == 0) &
+                             (results["species"] == manifest["names"].index("Herbivore"))]
+    assert start.tolist() == [20] * 4
+
+
+def test_sweep_resumes(tmp_path):
+    jobs = expand({"Carnivore": {"F": [10, 50]}}, seeds=[1, 2, 3])
+    sweep(island_map, ini_pop, jobs[:4], 2, str(tmp_path / "all"), workers=0)
+    sweep(island_map, ini_pop, jobs, 2, str(tmp_path / "part"), workers=0, chunk_jobs=2)
+    # A stopped sweep: the last chunk was never written. #
+    os.remove(str(tmp_path / "part" / "chunk-00002.npz"))
+    assert sweep(island_map, ini_pop, jobs, 2, str(tmp_path / "part"), workers=2, chunk_jobs=2) == 2
+    results, _ = load_results(str(tmp_path / "part"))
+    assert sorted(set(results["job"].tolist())) == list(range(6))
+    first, _ = load_results(str(tmp_path / "all"))
+    assert results["count"][:len(first["count"])].tolist() == first["count"].tolist()
+    with pytest.raises(ValueError):
+        sweep(island_map, ini_pop, jobs[:2], 2, str(tmp_path / "part"), workers=0)
+
+
+def test_sweep_does_not_replace_chunks(tmp_path):
+    jobs = expand({"Carnivore": {"F": [10, 50]}}, seeds=[1, 2])
+    sweep(island_map, ini_pop, jobs, 2, str(tmp_path), workers=0, chunk_jobs=1)
+    os.remove(str(tmp_path / "chunk-00000.npz"))
+    assert sweep(island_map, ini_pop, jobs, 2, str(tmp_path), workers=0, chunk_jobs=1) == 1
+    assert sorted(path.name for path in tmp_path.glob("chunk-*.npz")) == \
+        ["chunk-00001.npz", "chunk-00002.npz", "chunk-00003.npz", "chunk-00004.npz"]
+    assert sorted(set(load_results(str(tmp_path))[0]["job"].tolist())) == list(range(4))
@@ -0,0 +1,37 @@
+from biosim.simulation import BioSim
+
+import matplotlib.pyplot as plt
+
+ini_pop = [{"loc": (2, 2), "pop": [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)] +
+                                  [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(2)]}]
+island_map = "WWWWW\nWLHLW\nWLLLW\nWWWWW"
+
+
+def test_blitted_frames_are_the_whole_figure(tmp_path):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2, img_base=str(tmp_path / "img"))
+    sim.simulate(3, vis_years=1, img_years=1)
+    viz = sim.viz
+    assert viz.headless
+    stairs = dict(viz.stairs)
+    sim.simulate(1, vis_years=1, img_years=1)
+    assert all(viz.stairs[key] is step for key, step in stairs.items())
+    viz.fig.savefig(str(tmp_path / "whole.png"))
+    blitted, whole = plt.imread(str(tmp_path / "img_00003.png")), plt.imread(str(tmp_path / "whole.png"))
+    # Only the frames of the axes, under the artists drawn on top, may differ. #
+    assert (blitted != whole).any(axis=2).mean() < 0.01
+
+
+def test_other_formats_have_every_panel(tmp_path):
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=2, img_base=str(tmp_path / "img"), img_fmt="tiff")
+    sim.simulate(3, vis_years=1, img_years=1)
+    viz = sim.viz
+    artists = list(viz.n.values()) + list(viz.stairs.values()) + [viz.year]
+    assert not any(artist.get_animated() for artist in artists)
+    saved = plt.imread(str(tmp_path / "img_00002.tiff"))
+    viz.render()
+    frame = viz.frame()
+    # Inside the axes the saved image and the blitted frame are the same, lines and steps included. #
+    for ax in (viz.pop, viz.histogram_age, viz.histogram_weight, viz.histogram_fitness):
+        x0, y0, x1, y1 = (int(round(value)) for value in ax.bbox.extents)
+        inside = (slice(frame.shape[0] - y1 + 3, frame.shape[0] - y0 - 3), slice(x0 + 3, x1 - 3))
+        assert (saved[inside] == frame[inside]).all()
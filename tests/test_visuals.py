@@ -63,3 +63,18 @@ def test_border_not_center():
     expected = [(2, 2)]
     for coord in coords:
         assert coord not in expected
+
+
+def test_string2map_makes_a_grid():
+    island, illegal = string2map("WWWW\nWLHW\nWWWW", ["Herbivore", "Carnivore"])
+    assert island.type.tolist() == [[0, 0, 0, 0], [0, 3, 2, 0], [0, 0, 0, 0]]
+    assert island.f_max[1].tolist() == [0, 800, 300, 0]
+    assert len(illegal) == 10
+    assert island.views() == []
+
+
+def test_set_param_sets_every_cell_of_type():
+    island, _ = string2map("WWWWW\nWLHLW\nWWWWW", ["Herbivore"])
+    set_param(island, "L", {"f_max": 100})
+    assert island.f_max[1].tolist() == [0, 100, 300, 100, 0]
+    assert island[(2, 2)].f_max == 100